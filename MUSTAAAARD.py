@@ -499,24 +499,71 @@ Click Run (no CLI args). Outputs:
  - TESTME_with_ids_clean.csv
  - ambiguous_matches.csv
 """
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+import argparse
+import csv
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
 import re
 import sys
+import time
 import traceback
+import zlib
 
+_IMPORT_START = time.perf_counter()
 import pandas as pd
 import numpy as np
 from rapidfuzz import process, fuzz
-
-# optional semantic imports
-USE_EMBEDDINGS = True
+from openpyxl import Workbook, load_workbook
+
+from embedding_cache import EmbeddingCache
+from table_cache import TableCache
+from vector_index import VectorIndex
+import lookup_index
+import case_state
+import upsert_export
+import auto_case_filter
+import label_model
+import excel_io
+import email_text
+
+# optional semantic backend: only looked up here; sentence_transformers (and torch) are imported
+# by get_model() the first time something actually has to be encoded
+USE_EMBEDDINGS = importlib.util.find_spec("sentence_transformers") is not None
+
+# optional C Aho-Corasick automaton for keyword rules (pip install pyahocorasick)
 try:
-    from sentence_transformers import SentenceTransformer, util
+    import ahocorasick
 except Exception:
-    USE_EMBEDDINGS = False
-    SentenceTransformer = None
-    util = None
+    ahocorasick = None
+
+STARTUP_TIMINGS: Dict[str, float] = {"imports": time.perf_counter() - _IMPORT_START}
+
+# wall time per pipeline stage (load, index build, exact, rules, fuzzy, semantic, output, ...) for the run report
+STAGE_TIMINGS: Dict[str, float] = {}
+_stage_stack: List[list] = []
+
+@contextmanager
+def timed(stage: str):
+    """Add the wall time of the block to STAGE_TIMINGS[stage]; a nested stage pauses the enclosing one, so stages never overlap."""
+    now = time.perf_counter()
+    if _stage_stack:
+        outer = _stage_stack[-1]
+        STAGE_TIMINGS[outer[0]] = STAGE_TIMINGS.get(outer[0], 0.0) + now - outer[1]
+    _stage_stack.append([stage, now])
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        name, start = _stage_stack.pop()
+        STAGE_TIMINGS[name] = STAGE_TIMINGS.get(name, 0.0) + end - start
+        if _stage_stack:
+            _stage_stack[-1][1] = end
 
 # ---------------- Paths ----------------
 BASE_DIR = Path(__file__).parent
@@ -529,6 +576,55 @@ OUTPUT_XLSX = BASE_DIR / "TESTME_with_ids.xlsx"
 CLEAN_OUTPUT_XLSX = BASE_DIR / "TESTME_with_ids_clean.xlsx"
 CLEAN_OUTPUT_CSV = BASE_DIR / "TESTME_with_ids_clean.csv"
 AMBIGUOUS_CSV = BASE_DIR / "ambiguous_matches.csv"
+AUTO_CASES_CSV = BASE_DIR / "auto_cases_to_delete.csv"
+RUN_REPORT_JSON = BASE_DIR / "run_report.json"
+
+# ---------------- Embeddings ----------------
+MODEL_NAME = "all-MiniLM-L6-v2"
+USE_EMBEDDING_CACHE = True                      # reuse embeddings from earlier runs (see embedding_cache.py)
+EMBEDDING_CACHE_DIR = BASE_DIR / "embedding_cache"
+EMBEDDING_CACHE_MAX_MB = 512                    # LRU-evicted above this many MB of vectors
+
+# ---------------- Lookup index (Accounts / Contacts) ----------------
+USE_LOOKUP_INDEX = True                         # reuse the compiled exports from earlier runs (see lookup_index.py)
+LOOKUP_INDEX_DIR = BASE_DIR / "lookup_index"
+
+# ---------------- Vector index (semantic account / contact tier) ----------------
+VECTOR_INDEX_DTYPE = "float32"                  # "float16" / "int8": name embeddings in 1/2 / 1/4 of the memory (see vector_index.py)
+VECTOR_INDEX_IVF_MIN = 500_000                  # names from which the approximate coarse (IVF) tier is used; 0 = always exact
+VECTOR_INDEX_NPROBE = 16                        # IVF lists scored per query
+
+# ---------------- Input table cache (exports and case sheet) ----------------
+USE_TABLE_CACHE = True                          # reuse parsed input tables from earlier runs (see table_cache.py)
+TABLE_CACHE_DIR = BASE_DIR / "table_cache"
+
+# ---------------- Incremental mode (case state store) ----------------
+INCREMENTAL = True                              # reuse stored results of cases whose inputs are unchanged (see case_state.py); --full re-processes all
+CASE_STATE_DB = BASE_DIR / "case_state.sqlite"
+
+# ---------------- Upsert export (Bulk API 2.0) ----------------
+UPSERT_EXPORT = True                            # also write only the changed cases / fields as upsert CSVs (see upsert_export.py)
+UPSERT_DIR = BASE_DIR / "upsert"
+UPSERT_MAX_MB = 100                             # per file (Bulk API 2.0 takes up to 150 MB per job upload)
+UPSERT_MAX_ROWS = 0                             # cases per file, 0 = bounded by size only
+# Case API field -> columns of the sheet that hold it (the engine writes the labels to both Sub_Type__c and Sub-Type)
+UPSERT_FIELDS = {
+    "AccountId": ["AccountId", "Account Id", "Account_Id"],
+    "ContactId": ["ContactId", "Contact Id", "Contact_Id"],
+    "Type": ["Type"],
+    "Sub_Type__c": ["Sub_Type__c"],
+    "Category__c": ["Category__c"],
+}
+
+# ---------------- Auto-generated cases (deleteAutoCases queries) ----------------
+AUTO_CASE_FILTER = True                         # find cases the delete queries would remove before any matching work
+AUTO_CASE_QUERIES = [BASE_DIR / "deleteAutoCases.txt", BASE_DIR / "deleteAutoCasesPart2"]
+AUTO_CASE_ACTION = "tag"                        # "tag": matched as usual + Auto_Generated column, "skip": left unmatched, "drop": left out of the outputs
+
+# ---------------- Case text preparation (email threads) ----------------
+# both change matching / labelling results; off by default, pick values with scripts/sweep_thresholds.py --text-preps
+STRIP_EMAIL_TEXT = False                        # match / classify on the newest message only: no quoted replies, signatures or footers (see email_text.py)
+TEXT_WINDOW_CHARS = 0                           # characters of each summary / description used for matching; 0 = whole text
 
 # ---------------- Thresholds ----------------
 NAME_FUZZY_STRICT = 90
@@ -536,6 +632,32 @@ NAME_FUZZY_FROM_TEXT = 85
 SIMILARITY_THRESHOLD_ACCOUNT_CONTACT = 0.80
 SIMILARITY_THRESHOLD_LABEL = 0.55
 FUZZY_THRESHOLD_LABEL = 75
+NAME_FUZZY_SCORER = "partial_token_set_ratio"  # rapidfuzz.fuzz scorer of the fuzzy-name tier (scripts/sweep_thresholds.py compares them)
+TEXT_FUZZY_SCORER = "partial_token_set_ratio"  # ... and of the fuzzy-text tier (names found in the case text)
+SEMANTIC_BATCH_SIZE = 256      # texts per model.encode call in the batched semantic label pass
+
+# ---------------- Trained label model (scripts/train_label_model.py) ----------------
+USE_LABEL_MODEL = True                          # use LABEL_MODEL_PATH when it exists
+LABEL_MODEL_PATH = BASE_DIR / "label_model.npz"
+LABEL_MODEL_MIN_CONFIDENCE = 0.80               # posterior needed to take the model's label before the semantic / fuzzy tiers
+
+# ---------------- Candidate blocking (fuzzy account/contact matching) ----------------
+BLOCKING_TOP_K = 50            # choices scored by RapidFuzz per query; higher = better recall, 0 = scan every choice
+BLOCKING_MAX_POSTING = 0.05    # n-grams shared by more than this fraction of choices are too common to rank by
+
+# ---------------- Near-duplicate clustering ----------------
+CLUSTER_CASES = False          # classify near-identical case texts (templated notifications) once per cluster (opt-in)
+CLUSTER_THRESHOLD = 0.85       # estimated Jaccard similarity (word shingles, digits masked) to join a cluster
+MINHASH_PERMS = 64
+LSH_BANDS = 16                 # MINHASH_PERMS / LSH_BANDS signature rows per band
+LSH_MIN_BANDS = 2              # LSH bands a representative must share with a text before their signatures are compared
+LSH_BUCKET_MAX = 50            # representatives kept per LSH bucket (the earliest): bounds the comparisons per text
+
+# ---------------- Parallelism ----------------
+WORKERS = 1                    # processes for fuzzy matching / rule scoring (--workers); 1 = serial
+MATCH_CHUNK_ROWS = 500         # case rows per worker task
+FUZZY_CHUNK_QUERIES = 200      # distinct names / texts per worker task in the blocked fuzzy stage
+FUZZY_CDIST_CELLS = 4_000_000  # queries x choices scored per process.cdist call when blocking is off
 
 # ---------------- Allowed lists ----------------
 # ALLOWED_TYPES = [
@@ -625,6 +747,24 @@ def normalize_person(name: object) -> str:
             s = parts[1] + " " + parts[0]
     return normalize_text(s)
 
+# Column-at-once versions of the normalizers above (same output for every value), used by the
+# exact-match pre-pass so whole name columns are normalized without a Python loop per row.
+_COMPANY_SUFFIX_RE = r"(?<!\S)(?:" + "|".join(re.escape(x) for x in sorted(COMMON_COMPANY_SUFFIXES, key=len, reverse=True)) + r")(?!\S)"
+
+def normalize_text_series(s: pd.Series) -> pd.Series:
+    s = s.astype(str).str.replace("_x000D_", " ", regex=False).str.replace(r"[\r\n\t]", " ", regex=True).str.lower()
+    return s.str.replace(r"[^a-z0-9\s\-\+]", " ", regex=True).str.replace(r"\s+", " ", regex=True).str.strip()
+
+def normalize_company_series(s: pd.Series) -> pd.Series:
+    s = normalize_text_series(s).str.replace(_COMPANY_SUFFIX_RE, "", regex=True)
+    return s.str.replace(r" +", " ", regex=True).str.strip()
+
+def normalize_person_series(s: pd.Series) -> pd.Series:
+    s = s.astype(str).str.strip()
+    parts = s.str.extract(r"^([^,]*),([^,]*)", expand=True)  # "Last, First" -> "First Last"
+    swapped = parts[1].str.strip() + " " + parts[0].str.strip()
+    return normalize_text_series(s.where(parts[0].isna(), swapped))
+
 def find_first_col(df_cols: List[str], candidates: List[str]) -> Optional[str]:
     for c in candidates:
         if c in df_cols:
@@ -635,13 +775,40 @@ def find_first_col(df_cols: List[str], candidates: List[str]) -> Optional[str]:
             return lower_map[c.lower()]
     return None
 
-def load_table(path: Path) -> pd.DataFrame:
-    if not path.exists():
-        return pd.DataFrame()
+table_cache: Optional[TableCache] = None
+
+def get_table_cache() -> Optional[TableCache]:
+    global table_cache
+    if USE_TABLE_CACHE and table_cache is None:
+        table_cache = TableCache(TABLE_CACHE_DIR)
+    return table_cache
+
+def read_table(path: Path) -> pd.DataFrame:
     if path.suffix.lower() == ".csv":
         return pd.read_csv(path, dtype=str).fillna("")
     return pd.read_excel(path, dtype=str, engine="openpyxl").fillna("")
 
+def load_table(path: Path) -> pd.DataFrame:
+    if not path.exists():
+        return pd.DataFrame()
+    with timed("load"):
+        cache = get_table_cache()
+        if cache is None:
+            return read_table(path)
+        return cache.get(path, "table", lambda: (read_table(path), {}))[0]
+
+def load_case_sheet(path: Path, sheet_name: Optional[str] = None) -> Tuple[str, pd.DataFrame]:
+    """excel_io.read_sheet through the table cache: (sheet name, case sheet as a string DataFrame)."""
+    with timed("load"):
+        cache = get_table_cache()
+        if cache is None:
+            return excel_io.read_sheet(path, sheet_name)
+        def read():
+            name, df = excel_io.read_sheet(path, sheet_name)
+            return df, {"sheet": name}
+        df, meta = cache.get(path, f"sheet-{sheet_name or ''}", read)
+        return meta["sheet"], df
+
 # ---------------- Rules (keyword lists) ----------------
 # TYPE_RULES: Dict[str, List[str]] = {
 #     "CPQ Issues": ["cpq","sbqq","quote line","quote object"],
@@ -777,37 +944,236 @@ def rule_score_weighted(summary: str, subject: str, description: str, rules: Dic
                 scores[label] += weights[2] * max(1, len(kw_l)//4)
     return scores
 
+# ---------------- Compiled keyword rules ----------------
+def compile_rule_sets(rule_sets: List[Dict[str,List[str]]]) -> Dict[str, object]:
+    """
+    Compile several rule dictionaries into one keyword table so a single scan of a field
+    yields hits for every label of every rule set.
+
+    Each distinct keyword is stored once with the list of (rule set index, label, points) it feeds;
+    duplicated keywords keep one entry per occurrence so scores stay identical to rule_score_weighted.
+    When pyahocorasick is installed the keywords are also loaded into an Aho-Corasick automaton.
+    """
+    keywords: List[str] = []
+    targets: List[List[Tuple[int,str,int]]] = []
+    index: Dict[str,int] = {}
+    for set_idx, rules in enumerate(rule_sets):
+        for label, kws in rules.items():
+            for kw in kws:
+                kw_l = kw.lower()
+                if kw_l not in index:
+                    index[kw_l] = len(keywords)
+                    keywords.append(kw_l)
+                    targets.append([])
+                targets[index[kw_l]].append((set_idx, label, max(1, len(kw_l)//4)))
+    automaton = None
+    if ahocorasick is not None and keywords:
+        automaton = ahocorasick.Automaton()
+        for i, kw_l in enumerate(keywords):
+            automaton.add_word(kw_l, i)
+        automaton.make_automaton()
+    return {"rule_sets": rule_sets, "keywords": keywords, "targets": targets, "automaton": automaton}
+
+def keyword_hits(text_norm: str, compiled: Dict[str, object]) -> set:
+    """Indices of the compiled keywords that occur (as substrings) in text_norm."""
+    if not text_norm:
+        return set()
+    automaton = compiled["automaton"]
+    if automaton is not None:
+        return {i for _end, i in automaton.iter(text_norm)}
+    return {i for i, kw_l in enumerate(compiled["keywords"]) if kw_l in text_norm}
+
+def rule_scores_compiled(summary_norm: str, subject_norm: str, desc_norm: str, compiled: Dict[str, object], weights=(3,2,1)) -> List[Dict[str,int]]:
+    """
+    Weighted scores for every rule set in one pass per (already normalized) field.
+    Returns one {label: score} dict per compiled rule set, same values as rule_score_weighted.
+    """
+    all_scores = [{k:0 for k in rules.keys()} for rules in compiled["rule_sets"]]
+    targets = compiled["targets"]
+    for text_norm, weight in zip((summary_norm, subject_norm, desc_norm), weights):
+        for i in keyword_hits(text_norm, compiled):
+            for set_idx, label, points in targets[i]:
+                all_scores[set_idx][label] += weight * points
+    return all_scores
+
+LABEL_RULES = compile_rule_sets([TYPE_RULES, SUBTYPE_RULES, CATEGORY_RULES])
+
+# ---------------- Per-case text record ----------------
+def matching_texts(values: List[str], counts: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Summary / description cells as matched and classified: email_text.matching_text per value
+    (STRIP_EMAIL_TEXT, TEXT_WINDOW_CHARS), once per distinct value. counts, when given, gets the
+    UTF-8 bytes in / kept and the number of values that were shortened.
+    """
+    if not STRIP_EMAIL_TEXT and not TEXT_WINDOW_CHARS:
+        return values
+    prepared: Dict[str, str] = {}
+    out = []
+    for v in values:
+        p = prepared.get(v)
+        if p is None:
+            p = prepared[v] = email_text.matching_text(v, STRIP_EMAIL_TEXT, TEXT_WINDOW_CHARS)
+        out.append(p)
+    if counts is not None:
+        n_in = n_kept = trimmed = 0
+        for v, p in zip(values, out):
+            b_in, b_kept = len(v.encode("utf-8")), len(p.encode("utf-8"))
+            n_in += b_in
+            n_kept += b_kept
+            trimmed += b_kept < b_in
+        counts["input_bytes"] = counts.get("input_bytes", 0) + n_in
+        counts["kept_bytes"] = counts.get("kept_bytes", 0) + n_kept
+        counts["values_trimmed"] = counts.get("values_trimmed", 0) + trimmed
+    return out
+
+def prepare_case_text(summary: str, subject: str, description: str) -> Dict[str, object]:
+    """
+    Normalize a case's summary / subject / description once and derive everything the
+    matching and classification passes need from them:
+      summary, subject, description -> normalized fields (rule scoring)
+      combined -> normalized "summary subject description" (account/contact matching from text)
+      weighted -> normalized summary x3 + subject x2 + description (semantic / fuzzy label fallback)
+    normalize_text works character by character and collapses whitespace, so joining the
+    normalized parts gives the same strings as normalizing the joined raw text.
+    """
+    s_summary = normalize_text(summary)
+    s_subject = normalize_text(subject)
+    s_desc = normalize_text(description)
+    combined = " ".join(p for p in (s_summary, s_subject, s_desc) if p)
+    weighted = " ".join(p for p in [s_summary]*3 + [s_subject]*2 + [s_desc] if p)
+    return {
+        "summary": s_summary,
+        "subject": s_subject,
+        "description": s_desc,
+        "combined": combined,
+        "weighted": weighted,
+    }
+
 # ---------------- Semantic helpers (optional) ----------------
+# model / util stay None until get_model() is first called, i.e. until a semantic lookup has a text
+# that is not in the embedding cache. Runs where every row resolves by exact / fuzzy match or
+# keyword rules never import torch.
 model = None
-if USE_EMBEDDINGS:
+util = None
+
+def get_model():
+    """Import sentence-transformers and load MODEL_NAME on first use; None if unavailable (fuzzy-only mode)."""
+    global model, util, USE_EMBEDDINGS
+    if model is not None or not USE_EMBEDDINGS:
+        return model
     try:
+        t0 = time.perf_counter()
+        from sentence_transformers import SentenceTransformer, util as st_util
+        t1 = time.perf_counter()
         print("Loading sentence-transformers model (this may take a minute)...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        model = SentenceTransformer(MODEL_NAME)
+        util = st_util
+        STARTUP_TIMINGS["model import"] = t1 - t0
+        STARTUP_TIMINGS["model load"] = time.perf_counter() - t1
+        print(f"Model ready: import {STARTUP_TIMINGS['model import']:.1f}s, load {STARTUP_TIMINGS['model load']:.1f}s")
     except Exception:
         print("Warning: failed to load sentence-transformers; continuing with fuzzy-only mode.")
         USE_EMBEDDINGS = False
         model = None
+    return model
+
+def startup_report() -> str:
+    parts = [f"imports {STARTUP_TIMINGS['imports']:.2f}s"]
+    if "model load" in STARTUP_TIMINGS:
+        parts.append(f"model import {STARTUP_TIMINGS['model import']:.2f}s")
+        parts.append(f"model load {STARTUP_TIMINGS['model load']:.2f}s")
+    else:
+        parts.append("model not loaded")
+    return "Startup: " + ", ".join(parts)
 
 def embed_texts(texts: List[str]):
-    if not USE_EMBEDDINGS or model is None:
+    if get_model() is None:
         return None
     return model.encode(texts, convert_to_tensor=True)
 
+embedding_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global embedding_cache
+    if USE_EMBEDDING_CACHE and embedding_cache is None:
+        embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, MODEL_NAME, EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+    return embedding_cache
+
+def embed_texts_normalized(texts: List[str], batch_size: int = SEMANTIC_BATCH_SIZE) -> Optional[np.ndarray]:
+    """
+    Encode texts into an L2-normalized float32 matrix (row i = texts[i]), so cosine similarity
+    is a plain matrix product. Texts already in the on-disk embedding cache are not re-encoded
+    (and do not load the model).
+    """
+    if not USE_EMBEDDINGS:
+        return None
+    cache = get_embedding_cache()
+    if cache is not None:
+        return cache.get_or_encode(texts, lambda missing: _encode_normalized(missing, batch_size))
+    return _encode_normalized(texts, batch_size)
+
+def _encode_normalized(texts: List[str], batch_size: int) -> Optional[np.ndarray]:
+    """Longest-first chunks of batch_size so each batch pads to similar lengths."""
+    if not texts or get_model() is None:
+        return None
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    out: Optional[np.ndarray] = None
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        emb = model.encode([texts[i] for i in chunk], batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        emb = np.asarray(emb, dtype=np.float32)
+        if out is None:
+            out = np.zeros((len(texts), emb.shape[1]), dtype=np.float32)
+        out[chunk] = emb
+    return out
+
+def semantic_label_batch(texts: List[str], label_sets: List[Tuple[List[str], Optional[np.ndarray]]], semantic_thresh: float = SIMILARITY_THRESHOLD_LABEL) -> List[Dict[str, Optional[str]]]:
+    """
+    Batched semantic stage for label inference.
+    texts: unique weighted texts of the rows whose keyword rules scored zero.
+    label_sets: (allowed labels, normalized label embeddings) per field.
+    Every text is encoded once; each field is then one matrix product against its label matrix.
+    Returns one {text: best label or None (below threshold)} dict per label set.
+    """
+    results: List[Dict[str, Optional[str]]] = [{} for _ in label_sets]
+    if not texts or not USE_EMBEDDINGS:
+        return results
+    try:
+        text_emb = embed_texts_normalized(texts)
+    except Exception as e:
+        print("Warning: batched semantic label encoding failed; using fuzzy fallback only:", e)
+        return results
+    for k, (allowed, label_emb) in enumerate(label_sets):
+        if text_emb is None or label_emb is None or not allowed:
+            continue
+        sims = text_emb @ label_emb.T
+        best = sims.argmax(axis=1)
+        best_score = sims[np.arange(len(texts)), best]
+        results[k] = {t: (allowed[b] if s >= semantic_thresh else None) for t, b, s in zip(texts, best.tolist(), best_score.tolist())}
+    return results
+
 # ---------------- Label inference with weighted text importance ----------------
-def infer_label_weighted(summary: str, subject: str, description: str, rules: Dict[str,List[str]], allowed: List[str], semantic_emb=None, semantic_thresh=SIMILARITY_THRESHOLD_LABEL) -> str:
+def infer_label_weighted(case_text: Dict[str, object], rules: Dict[str,List[str]], allowed: List[str], semantic_emb=None, semantic_thresh=SIMILARITY_THRESHOLD_LABEL, scores: Optional[Dict[str,int]] = None, semantic_labels: Optional[Dict[str, Optional[str]]] = None) -> str:
     """
     Priority: rules (weighted by summary/subject/desc) -> semantic on weighted combined text -> fuzzy fallback
+    case_text comes from prepare_case_text; pass precomputed rule scores (from rule_scores_compiled)
+    to skip the per-rule-set keyword scan, and semantic_labels (from semantic_label_batch) to look the
+    semantic result up instead of encoding this row on its own.
     """
     # 1) rules weighted
-    scores = rule_score_weighted(summary, subject, description, rules)
+    if scores is None:
+        scores = rule_score_weighted(case_text["summary"], case_text["subject"], case_text["description"], rules)
     best_label = max(scores, key=lambda k: scores[k])
     if scores[best_label] > 0:
         return best_label
 
     # 2) semantic on weighted combined text (weight summary higher by repeating)
-    combined_weighted = " ".join([summary]*3 + [subject]*2 + [description])
-    t_norm = normalize_text(combined_weighted)
-    if semantic_emb is not None and USE_EMBEDDINGS and model is not None:
+    t_norm = case_text["weighted"]
+    if semantic_labels is not None:
+        sem = semantic_labels.get(t_norm)
+        if sem:
+            return sem
+    elif semantic_emb is not None and get_model() is not None:
         try:
             emb = model.encode(t_norm, convert_to_tensor=True)
             sims = util.cos_sim(emb, semantic_emb)[0].cpu().numpy()
@@ -818,17 +1184,19 @@ def infer_label_weighted(summary: str, subject: str, description: str, rules: Di
         except Exception:
             pass
 
-    # 3) fuzzy fallback on weighted combined
+    # 3) fuzzy fallback on weighted combined, 4) default label
+    return fallback_label(t_norm, allowed)[1]
+
+def fallback_label(t_norm: str, allowed: List[str]) -> Tuple[str, str]:
+    """Last label tiers: ("fuzzy", label) on the weighted text, else ("default", Miscellaneous/first label)."""
     fuzzy = fuzzy_label_match(t_norm, allowed, FUZZY_THRESHOLD_LABEL)
     if fuzzy:
-        return fuzzy
-
-    # 4) final fallback
+        return "fuzzy", fuzzy
     # Try to pick a reasonable "Miscellaneous" / default label
     for fallback in ["Miscellaneous Type","Miscellaneous SubType","Case Management"]:
         if fallback in allowed:
-            return fallback
-    return allowed[0] if allowed else ""
+            return "default", fallback
+    return "default", allowed[0] if allowed else ""
 
 # ---------------- fuzzy helper for labels ----------------
 def fuzzy_label_match(text: str, allowed: List[str], threshold: int = FUZZY_THRESHOLD_LABEL) -> Optional[str]:
@@ -846,17 +1214,14 @@ def build_account_maps(df: pd.DataFrame) -> Tuple[Dict[str, List[Tuple[str,str]]
     id_col = find_first_col(df.columns.tolist(), ["Id","ID","AccountId","Account Id","accountid"]) or df.columns[0]
     name_col = find_first_col(df.columns.tolist(), ["Name","Account Name","AccountName","name"]) or (df.columns[1] if len(df.columns)>1 else df.columns[0])
     norm_map: Dict[str, List[Tuple[str,str]]] = {}
-    choices: List[str] = []
-    for _, r in df.iterrows():
-        raw = str(r.get(name_col,"")).strip()
-        aid = str(r.get(id_col,"")).strip()
-        norm = normalize_company(raw)
+    raws = df[name_col].astype(str).str.strip()
+    ids = df[id_col].astype(str).str.strip()
+    for norm, aid, raw in zip(normalize_company_series(raws), ids, raws):
         if not norm:
             continue
         norm_map.setdefault(norm, []).append((aid, raw))
-        if norm not in choices:
-            choices.append(norm)
-    return norm_map, choices
+    # dicts keep insertion order: choices are the distinct names in first-seen order
+    return norm_map, list(norm_map)
 
 def build_contact_maps(df: pd.DataFrame) -> Tuple[Dict[str, List[Tuple[str,str,str]]], List[str]]:
     if df.empty:
@@ -867,232 +1232,1034 @@ def build_contact_maps(df: pd.DataFrame) -> Tuple[Dict[str, List[Tuple[str,str,s
     last_c = find_first_col(df.columns.tolist(), ["LastName","Last Name","Last"])
     accid_c = find_first_col(df.columns.tolist(), ["AccountId","Account Id","Account_Id","AccountID"])
     norm_map: Dict[str, List[Tuple[str,str,str]]] = {}
-    choices: List[str] = []
-    for _, r in df.iterrows():
-        cid = str(r.get(id_col,"")).strip()
-        if full_col:
-            raw_full = str(r.get(full_col,"")).strip()
-        else:
-            raw_full = (str(r.get(first_c,"")).strip() + " " + str(r.get(last_c,"")).strip()).strip()
-        accid = str(r.get(accid_c,"")).strip() if accid_c else ""
-        norm = normalize_person(raw_full)
+    def col(c: Optional[str]) -> pd.Series:
+        return df[c].astype(str).str.strip() if c else pd.Series("", index=df.index)
+    ids = col(id_col)
+    if full_col:
+        raw_full = col(full_col)
+    else:
+        raw_full = (col(first_c) + " " + col(last_c)).str.strip()
+    accids = col(accid_c)
+    for norm, cid, raw, accid in zip(normalize_person_series(raw_full), ids, raw_full, accids):
         if not norm:
             continue
-        norm_map.setdefault(norm, []).append((cid, raw_full, accid))
-        if norm not in choices:
-            choices.append(norm)
-    return norm_map, choices
-
-def fuzzy_choice_from_text(text: str, choices: List[str], threshold: int) -> Optional[str]:
+        norm_map.setdefault(norm, []).append((cid, raw, accid))
+    return norm_map, list(norm_map)
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """Character n-grams of each lowercased token, padded with spaces so word starts/ends count."""
+    grams = set()
+    for tok in text.lower().split():
+        t = f" {tok} "
+        grams.update(t[i:i + n] for i in range(len(t) - n + 1))
+    return grams
+
+def build_candidate_index(choices: List[str]) -> Dict[str, object]:
+    """
+    Inverted index over normalized choices (account_choices / contact_choices) used to shortlist
+    fuzzy candidates: whole token -> choice positions, and character 3-gram -> choice positions.
+    Posting arrays are in ascending choice order.
+    """
+    token_post: Dict[str, List[int]] = {}
+    gram_post: Dict[str, List[int]] = {}
+    for i, c in enumerate(choices):
+        for tok in set(c.split()):
+            token_post.setdefault(tok, []).append(i)
+        for g in char_ngrams(c):
+            gram_post.setdefault(g, []).append(i)
+    return {
+        "size": len(choices),
+        "tokens": {k: np.asarray(v, dtype=np.int32) for k, v in token_post.items()},
+        "grams": {k: np.asarray(v, dtype=np.int32) for k, v in gram_post.items()},
+        "max_posting": max(1, int(len(choices) * BLOCKING_MAX_POSTING)),
+    }
+
+def candidate_shortlist(text: str, index: Dict[str, object], top_k: int = BLOCKING_TOP_K) -> List[int]:
+    """
+    Up to ~2 * top_k choice positions worth scoring for text, in ascending choice order.
+    partial_token_set_ratio scores 100 whenever a whole token is shared, so the earliest choices
+    sharing a token always make the list (that keeps extractOne's first-best tie-break); the rest
+    are the choices sharing the most character 3-grams with text. text is looked up normalized like
+    the choices (raw account / contact names come in as typed on the case).
+    """
+    size = index["size"]
+    picked = set()
+    text = normalize_text(text)
+    token_hits = [p[:top_k] for tok in set(text.split()) if (p := index["tokens"].get(tok)) is not None]
+    if token_hits:
+        picked.update(np.unique(np.concatenate(token_hits))[:top_k].tolist())
+    postings = [p for g in char_ngrams(text) if (p := index["grams"].get(g)) is not None]
+    rare = [p for p in postings if len(p) <= index["max_posting"]]
+    postings = rare or postings
+    if postings:
+        counts = np.bincount(np.concatenate(postings), minlength=size).astype(np.int64)
+        # equal overlap -> earlier choice first, like extractOne
+        rank = counts * size + (size - 1 - np.arange(size))
+        k = min(top_k, size)
+        top = np.argpartition(-rank, k - 1)[:k]
+        picked.update(top[counts[top] > 0].tolist())
+    return sorted(picked)
+
+def fuzzy_best_from_text(text: str, choices: List[str], index: Optional[Dict[str, object]] = None,
+                         scorer=fuzz.partial_token_set_ratio) -> Optional[Tuple[str, float]]:
+    """(best choice, score) by scorer, the earliest choice on ties; with an index only its shortlist is scored."""
     if not text or not choices:
         return None
-    best = process.extractOne(text, choices, scorer=fuzz.partial_token_set_ratio)
+    if index is not None and BLOCKING_TOP_K and len(choices) > BLOCKING_TOP_K:
+        choices = [choices[i] for i in candidate_shortlist(text, index, BLOCKING_TOP_K)]
+        if not choices:
+            return None
+    best = process.extractOne(text, choices, scorer=scorer)
+    return (best[0], best[1]) if best else None
+
+def fuzzy_choice_from_text(text: str, choices: List[str], threshold: int, index: Optional[Dict[str, object]] = None,
+                           scorer=fuzz.partial_token_set_ratio) -> Optional[str]:
+    """Best choice >= threshold (partial_token_set_ratio unless another scorer is given)."""
+    best = fuzzy_best_from_text(text, choices, index, scorer)
     if best and best[1] >= threshold:
         return best[0]
     return None
 
-def semantic_choice_from_text(text: str, choices: List[str], choices_embeddings, threshold: float) -> Optional[str]:
-    if not USE_EMBEDDINGS or model is None or choices_embeddings is None:
-        return None
+def semantic_choice_from_text(text: str, choices: List[str], index: Optional[VectorIndex], threshold: float) -> Optional[str]:
+    return semantic_choices_batch([text], choices, index, threshold).get(text)
+
+def semantic_choices_batch(texts: List[str], choices: List[str], index: Optional[VectorIndex], threshold: float) -> Dict[str, Optional[str]]:
+    """
+    Batched semantic_choice_from_text: every text is encoded once and all of them are looked up in
+    the choice index in one top-1 search. Returns {text: best choice or None}.
+    """
+    out: Dict[str, Optional[str]] = {}
+    if not texts or not USE_EMBEDDINGS or index is None:
+        return out
     try:
-        emb = model.encode(text, convert_to_tensor=True)
-        sims = util.cos_sim(emb, choices_embeddings)[0].cpu().numpy()
-        idx = int(np.argmax(sims))
-        score = float(sims[idx])
-        if score >= threshold:
-            return choices[idx]
-    except Exception:
+        emb = embed_texts_normalized(texts)
+    except Exception as e:
+        print("Warning: batched semantic account/contact encoding failed:", e)
+        return out
+    if emb is None:
+        return out
+    best, best_score = index.search(emb, k=1, nprobe=VECTOR_INDEX_NPROBE)
+    for t, b, sc in zip(texts, best[:, 0].tolist(), best_score[:, 0].tolist()):
+        out[t] = choices[b] if b >= 0 and sc >= threshold else None
+    return out
+
+# choice index per choice list for this run: id(choices) -> (choices, index)
+vector_indexes: Dict[int, Tuple[object, VectorIndex]] = {}
+
+def get_vector_index(choices: List[str], store_dir: Optional[Path] = None) -> Optional[VectorIndex]:
+    """
+    Index of the normalized choice embeddings. Built once per run, and kept in store_dir (next to
+    the export's lookup index) for later runs while the model, the choices and the
+    VECTOR_INDEX_* settings are the same. None without a semantic backend.
+    """
+    cached = vector_indexes.get(id(choices))
+    if cached is not None and cached[0] is choices:
+        return cached[1]
+    if not USE_EMBEDDINGS or not len(choices):
         return None
-    return None
+    with timed("index build"):
+        ivf = bool(VECTOR_INDEX_IVF_MIN) and len(choices) >= VECTOR_INDEX_IVF_MIN
+        h = hashlib.sha1()
+        for c in choices:
+            h.update(c.encode("utf-8") + b"\n")
+        key = f"{MODEL_NAME}|{VECTOR_INDEX_DTYPE}|{'ivf' if ivf else 'exact'}|{h.hexdigest()}"
+        index = VectorIndex.load(store_dir, key) if store_dir is not None else None
+        if index is None:
+            emb = embed_texts_normalized(list(choices))
+            if emb is None:
+                return None
+            index = VectorIndex.build(emb, VECTOR_INDEX_DTYPE, ivf, key)
+            if store_dir is not None:
+                try:
+                    index.save(store_dir)
+                except Exception as e:
+                    print(f"Warning: could not write vector index to {store_dir}: {e}")
+    vector_indexes[id(choices)] = (choices, index)
+    return index
+
+def lazy_semantic_choices(choices: List[str], threshold: float, store_dir: Optional[Path] = None):
+    """
+    semantic_batch callable for resolve_tier_chains. The choice index is only loaded or built when
+    the first query arrives, so sheets that never reach a semantic tier never encode the choices.
+    """
+    def batch(texts: List[str]) -> Dict[str, Optional[str]]:
+        return semantic_choices_batch(texts, choices, get_vector_index(choices, store_dir), threshold)
+    return batch
+
+# ---------------- Exact-match pre-pass ----------------
+def exact_match_prepass(cases_df: pd.DataFrame, acct_name_col: Optional[str], contact_name_col: Optional[str],
+                        account_norm_map: Dict[str, List[Tuple[str,str]]],
+                        contact_norm_map: Dict[str, List[Tuple[str,str,str]]]) -> pd.DataFrame:
+    """
+    Resolve exact normalized account/contact names for the whole sheet at once: normalize both
+    name columns and hash-join them against the first entry of each lookup map.
+    Returns a frame aligned to cases_df with acc_id, con_id and con_acc ("" where no exact hit).
+    """
+    out = pd.DataFrame({"acc_id": "", "con_id": "", "con_acc": ""}, index=cases_df.index)
+
+    def first_records(norms: pd.Series, norm_map) -> Dict[str, tuple]:
+        # only the distinct names on the sheet are looked up, never the whole map
+        return {n: cands[0] for n in norms.unique() if n and (cands := norm_map.get(n))}
+
+    if acct_name_col and account_norm_map:
+        names = cases_df[acct_name_col].astype(str).str.strip()
+        norms = normalize_company_series(names)
+        acc_first = {n: rec[0] for n, rec in first_records(norms, account_norm_map).items()}
+        out["acc_id"] = norms.map(acc_first).fillna("").where(names != "", "")
+    if contact_name_col and contact_norm_map:
+        names = cases_df[contact_name_col].astype(str).str.strip()
+        norms = normalize_person_series(names)
+        con_first = first_records(norms, contact_norm_map)
+        out["con_id"] = norms.map({n: rec[0] for n, rec in con_first.items()}).fillna("").where(names != "", "")
+        out["con_acc"] = norms.map({n: rec[2] for n, rec in con_first.items()}).fillna("").where(names != "", "")
+    return out
+
+# ---------------- Near-duplicate clustering ----------------
+# Templated notifications ("Your Daily Digest", "Claim Status", ...) differ only in dates, numbers
+# or a word or two. Texts are clustered with MinHash signatures over word shingles and LSH banding;
+# only the first text of each cluster (its representative) is classified, members reuse its result.
+_MINHASH_PRIME = (1 << 31) - 1
+_minhash_rng = np.random.RandomState(20240601)
+MINHASH_A = _minhash_rng.randint(1, _MINHASH_PRIME, size=MINHASH_PERMS).astype(np.int64)
+MINHASH_B = _minhash_rng.randint(0, _MINHASH_PRIME, size=MINHASH_PERMS).astype(np.int64)
+
+def shingle_hashes(fields: Tuple[str, ...], weights=(3,2,1)) -> np.ndarray:
+    """
+    crc32 of the word unigrams and bigrams of each normalized field (summary, subject, description),
+    digit runs masked to "0". Shingles are tagged with their field and repeated per field weight, the
+    same 3/2/1 weighting the keyword rules use, so cases only cluster when summary and subject agree.
+    """
+    shingles = set()
+    for f, (text, w) in enumerate(zip(fields, weights)):
+        toks = re.sub(r"\d+", "0", text).split()
+        grams = set(toks)
+        grams.update(f"{a} {b}" for a, b in zip(toks, toks[1:]))
+        shingles.update(f"{f}.{k}:{g}" for g in grams for k in range(w))
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.int64, count=len(shingles))
+
+def minhash_signature(hashes: np.ndarray) -> np.ndarray:
+    x = hashes % _MINHASH_PRIME
+    return ((MINHASH_A[:, None] * x[None, :] + MINHASH_B[:, None]) % _MINHASH_PRIME).min(axis=1)
+
+def cluster_near_duplicates(texts: List[Tuple[str, ...]], threshold: float = CLUSTER_THRESHOLD) -> List[int]:
+    """
+    Representative position for every case, given its normalized (summary, subject, description),
+    itself for representatives. Identical texts are grouped
+    exactly; distinct texts join the earliest representative that shares at least LSH_MIN_BANDS LSH
+    bands with them and whose signature agreement (estimated Jaccard) is >= threshold. Members are only
+    compared with representatives, so clusters cannot drift. Buckets keep at most LSH_BUCKET_MAX
+    representatives, so each text is compared with at most LSH_BANDS * LSH_BUCKET_MAX of them (in one
+    vectorized comparison) and the whole pass is linear in the number of texts.
+    """
+    rep_of = list(range(len(texts)))
+    first_pos: Dict[Tuple[str, ...], int] = {}
+    for pos, t in enumerate(texts):
+        if t in first_pos:
+            rep_of[pos] = first_pos[t]
+        else:
+            first_pos[t] = pos
+    rows = MINHASH_PERMS // LSH_BANDS
+    min_bands = min(LSH_MIN_BANDS, LSH_BANDS)
+    # buckets hold representative numbers: rows of sigs, in position order, so the smallest is the earliest
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    sigs = np.empty((len(first_pos), MINHASH_PERMS), dtype=np.int64)
+    rep_pos: List[int] = []
+    for t, pos in first_pos.items():
+        hashes = shingle_hashes(t)
+        if not len(hashes):
+            continue
+        sig = minhash_signature(hashes)
+        keys = [(b, sig[b * rows:(b + 1) * rows].tobytes()) for b in range(LSH_BANDS)]
+        shared: Dict[int, int] = {}
+        for key in keys:
+            for r in buckets.get(key, ()):
+                shared[r] = shared.get(r, 0) + 1
+        cands = np.fromiter((r for r, n in shared.items() if n >= min_bands), dtype=np.int64)
+        hits = cands[(sigs[cands] == sig).mean(axis=1) >= threshold] if len(cands) else cands
+        if len(hits):
+            rep_of[pos] = rep_pos[int(hits.min())]
+            continue
+        r = len(rep_pos)
+        sigs[r] = sig
+        rep_pos.append(pos)
+        for key in keys:
+            bucket = buckets.setdefault(key, [])
+            if len(bucket) < LSH_BUCKET_MAX:
+                bucket.append(r)
+    # exact duplicates of a text that joined a cluster follow it to the representative
+    return [rep_of[r] for r in rep_of]
+
+def cluster_size_histogram(rep_of: List[int]) -> Dict[str, int]:
+    """Number of clusters per size bucket."""
+    sizes: Dict[int, int] = {}
+    for r in rep_of:
+        sizes[r] = sizes.get(r, 0) + 1
+    hist = {label: 0 for label in ("1", "2", "3-5", "6-10", "11-50", "51-100", "101+")}
+    for n in sizes.values():
+        label = ("1" if n == 1 else "2" if n == 2 else "3-5" if n <= 5 else "6-10" if n <= 10
+                 else "11-50" if n <= 50 else "51-100" if n <= 100 else "101+")
+        hist[label] += 1
+    return hist
+
+# ---------------- Row matching (parallel-safe) ----------------
+# Each row is turned into "tier chains": the match tiers still worth trying, in priority order.
+# Rule scoring runs per row (match_case_chunk) and fuzzy matching once per distinct name / text
+# (fuzzy_match_batch), both CPU-bound and spread over worker processes; semantic steps only carry
+# their query and are resolved afterwards in the parent, batched across all rows, by
+# resolve_tier_chains. Workers therefore never load or call the sentence-transformers model.
+
+# Read-only lookup state for the worker functions. main() fills it before any pool starts:
+# forked workers inherit it, spawned workers (Windows) receive it once through _init_worker.
+MATCH_STATE: Dict[str, object] = {}
+
+def _init_worker(state: Dict[str, object]) -> None:
+    MATCH_STATE.update(state)
+
+def pool_map(fn, chunks: List[list], workers: int = WORKERS) -> List[list]:
+    """[fn(chunk) for chunk in chunks], in a process pool when workers > 1; results keep chunk order."""
+    if workers <= 1 or len(chunks) <= 1:
+        return [fn(chunk) for chunk in chunks]
+    if "fork" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("fork")
+        pool_kwargs = {}
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        pool_kwargs = {"initializer": _init_worker, "initargs": (dict(MATCH_STATE),)}
+    with ctx.Pool(processes=min(workers, len(chunks)), **pool_kwargs) as pool:
+        return pool.map(fn, chunks, chunksize=1)
+
+def _fuzzy_query_chunk(job: Tuple[str, List[str], int, str]) -> List[Optional[str]]:
+    kind, queries, threshold, scorer = job
+    choices, index = MATCH_STATE[f"{kind}_choices"], MATCH_STATE[f"{kind}_index"]
+    return [fuzzy_choice_from_text(q, choices, threshold, index, getattr(fuzz, scorer)) for q in queries]
+
+def fuzzy_match_batch(kind: str, queries: List[str], threshold: int, workers: int = WORKERS,
+                      scorer: str = "partial_token_set_ratio") -> Dict[str, Optional[str]]:
+    """
+    fuzzy_choice_from_text for every distinct query against MATCH_STATE["<kind>_choices"]
+    (kind = "account" / "contact"), scored by the rapidfuzz.fuzz function named scorer.
+    Each distinct query is scored once; returns {query: choice or None}.
+    With candidate blocking the per-query shortlists are scored in chunks across worker processes;
+    without it, blocks of queries go through one multi-threaded process.cdist call each
+    (first best column wins, like extractOne).
+    """
+    uniq = list(dict.fromkeys(q for q in queries if q))
+    choices = MATCH_STATE[f"{kind}_choices"]
+    if not uniq or not choices:
+        return {}
+    if BLOCKING_TOP_K and len(choices) > BLOCKING_TOP_K:
+        chunks = [(kind, uniq[i:i + FUZZY_CHUNK_QUERIES], threshold, scorer) for i in range(0, len(uniq), FUZZY_CHUNK_QUERIES)]
+        hits = [h for part in pool_map(_fuzzy_query_chunk, chunks, workers) for h in part]
+        return dict(zip(uniq, hits))
+    out: Dict[str, Optional[str]] = {}
+    choices = list(choices)
+    block = max(1, FUZZY_CDIST_CELLS // len(choices))
+    for start in range(0, len(uniq), block):
+        part = uniq[start:start + block]
+        scores = process.cdist(part, choices, scorer=getattr(fuzz, scorer), score_cutoff=threshold,
+                               dtype=np.float64, workers=max(1, workers))
+        best = scores.argmax(axis=1)
+        for q, b, sc in zip(part, best.tolist(), scores[np.arange(len(best)), best].tolist()):
+            out[q] = choices[b] if sc >= threshold else None
+    return out
+
+def name_tier_chain(name_val: str, name_exact: bool, text_norm: str, fuzzy_name: Dict[str, Optional[str]], fuzzy_text: Dict[str, Optional[str]], norm_map: Dict[str, list], semantic_ok: bool) -> List[Tuple[str, str]]:
+    """
+    Account/contact tiers after the exact pre-pass: fuzzy-name -> semantic-name -> fuzzy-text -> semantic-text.
+    fuzzy_name / fuzzy_text hold the batched fuzzy results (fuzzy_match_batch). Fuzzy steps hold the
+    matched choice and end the chain; a fuzzy-text match is looked up even when semantic-name is still
+    pending, so the parent never has to come back for it. A matched choice whose first record has
+    no Id falls through exactly like the old row loop did.
+    """
+    chain: List[Tuple[str, str]] = []
+    if name_val and not name_exact:  # exact name without an Id: straight to the text tiers
+        approx = fuzzy_name.get(name_val)
+        if approx:
+            if norm_map[approx][0][0]:
+                return [("fuzzy-name", approx)]
+        elif semantic_ok:
+            chain.append(("semantic-name", name_val))
+    if text_norm:
+        approx2 = fuzzy_text.get(text_norm)
+        if approx2:
+            if norm_map[approx2][0][0]:
+                chain.append(("fuzzy-text", approx2))
+        elif semantic_ok:
+            chain.append(("semantic-text", text_norm))
+    return chain
+
+def name_tier_chains(kind: str, rows: List[Tuple], norm_fn, norm_map: Dict[str, list], semantic_ok: bool, workers: int = WORKERS) -> Dict[object, List[Tuple[str, str]]]:
+    """
+    Tier chains for every row still missing an account / contact Id. rows: (idx, name, combined_norm).
+    Fuzzy matching is batched: first every distinct non-exact name, then the case text of each row
+    the name did not settle.
+    """
+    exact = [bool(name) and bool(n := norm_fn(name)) and n in norm_map for _, name, _ in rows]
+    fuzzy_name = fuzzy_match_batch(kind, [name for (_, name, _), ex in zip(rows, exact) if name and not ex],
+                                   NAME_FUZZY_STRICT, workers, NAME_FUZZY_SCORER)
 
-# ---------------- Main ----------------
-def main():
-    try:
-        if not TESTME_XLSX.exists():
-            print(f"ERROR: TESTME.xlsx not found at {TESTME_XLSX}")
-            return
+    def settled(name: str, ex: bool) -> bool:
+        hit = None if ex else fuzzy_name.get(name)
+        return bool(hit and norm_map[hit][0][0])
+
+    fuzzy_text = fuzzy_match_batch(kind, [text for (_, name, text), ex in zip(rows, exact) if not settled(name, ex)],
+                                   NAME_FUZZY_FROM_TEXT, workers, TEXT_FUZZY_SCORER)
+    return {idx: name_tier_chain(name, ex, text, fuzzy_name, fuzzy_text, norm_map, semantic_ok)
+            for (idx, name, text), ex in zip(rows, exact)}
 
-        accounts_df = load_table(ACCOUNTS_CSV) if ACCOUNTS_CSV.exists() else pd.DataFrame()
-        contacts_df = load_table(CONTACTS_CSV) if CONTACTS_CSV.exists() else pd.DataFrame()
+def label_tier_chain(case_text: Dict[str, object], scores: Dict[str,int], allowed: List[str]) -> List[Tuple[str, str]]:
+    """Label tiers for one field: ("rules", label), or semantic on the weighted text then the fuzzy/default fallback."""
+    best_label = max(scores, key=lambda k: scores[k])
+    if scores[best_label] > 0:
+        return [("rules", best_label)]
+    t_norm = case_text["weighted"]
+    return [("semantic", t_norm), fallback_label(t_norm, allowed)]
 
-        account_norm_map, account_choices = build_account_maps(accounts_df)
-        contact_norm_map, contact_choices = build_contact_maps(contacts_df)
+def match_case_chunk(rows: List[Tuple]) -> List[Tuple]:
+    """
+    rows: (idx, summary, subject, description).
+    Returns (idx, combined_norm, [type, sub-type, category chains] or None) per row, in order.
+    """
+    out = []
+    for idx, summary_val, subject_val, desc_val in rows:
+        case_text = prepare_case_text(summary_val, subject_val, desc_val)
+        label_chains = None
+        # PRIORITIZE Email Summary > Subject > Description (weighted rules, summary repeated in the weighted text)
+        if any([summary_val.strip(), subject_val.strip(), desc_val.strip()]):
+            all_scores = rule_scores_compiled(case_text["summary"], case_text["subject"], case_text["description"], LABEL_RULES)
+            label_chains = [label_tier_chain(case_text, sc, allowed)
+                            for sc, allowed in zip(all_scores, (ALLOWED_TYPES, ALLOWED_SUBTYPES, ALLOWED_CATEGORIES))]
+        out.append((idx, case_text["combined"], label_chains))
+    return out
+
+_label_model: Optional[label_model.LabelModel] = None
+_label_model_loaded = False
+
+def get_label_model() -> Optional[label_model.LabelModel]:
+    """The trained label model, loaded on first use (None when there is none or USE_LABEL_MODEL is off)."""
+    global _label_model, _label_model_loaded
+    if not _label_model_loaded:
+        _label_model = label_model.load_model(LABEL_MODEL_PATH) if USE_LABEL_MODEL else None
+        _label_model_loaded = True
+    return _label_model
+
+def add_model_label_tiers(rows: List[Tuple], results: List[Tuple]) -> int:
+    """
+    Put a ("model", label) tier after the keyword rules for every field the rules left open, when the
+    trained model is confident enough. rows / results are aligned match_case_chunk inputs / outputs;
+    all rows are featurized and scored for the three fields in one pass. Returns the tiers added.
+    """
+    lm = get_label_model()
+    pending = [pos for pos, (_, _, chains) in enumerate(results) if chains and any(ch[0][0] != "rules" for ch in chains)]
+    if lm is None or not pending:
+        return 0
+    X = label_model.featurize([tuple(normalize_text(v) for v in rows[pos][1:4]) for pos in pending], lm.bits)
+    predictions = lm.predict(X)
+    added = 0
+    for k, (out_col, allowed) in enumerate(zip(["Type", "Sub_Type__c", "Category__c"], (ALLOWED_TYPES, ALLOWED_SUBTYPES, ALLOWED_CATEGORIES))):
+        if out_col not in lm.fields:
+            continue
+        labels, conf = predictions[lm.fields.index(out_col)]
+        allowed_set = set(allowed)
+        for pos, label, c in zip(pending, labels, conf):
+            chains = results[pos][2]
+            if chains[k][0][0] != "rules" and c >= LABEL_MODEL_MIN_CONFIDENCE and label in allowed_set:
+                chains[k] = [("model", label)] + chains[k]
+                added += 1
+    return added
+
+def run_match_chunks(rows: List[Tuple], workers: int = WORKERS, chunk_rows: int = MATCH_CHUNK_ROWS) -> List[Tuple]:
+    """match_case_chunk over all rows, split across a process pool when workers > 1; results keep row order."""
+    chunks = [rows[i:i + chunk_rows] for i in range(0, len(rows), chunk_rows)]
+    return [r for part in pool_map(match_case_chunk, chunks, workers) for r in part]
+
+def resolve_tier_chains(chains: Dict[object, List[Tuple[str, str]]], semantic_batch, accept=None) -> Dict[object, Tuple[str, str]]:
+    """
+    Walk every row's chain in priority order and return {idx: (tier, value)} for rows that resolved.
+    Rows waiting on a semantic step are answered together: semantic_batch(list of queries) ->
+    {query: choice or None}. accept(choice) can reject a semantic hit (e.g. a record without an Id),
+    which moves that row on to its next tier.
+    """
+    resolved: Dict[object, Tuple[str, str]] = {}
+    pos = dict.fromkeys(chains, 0)
+    waiting = list(chains)
+    while waiting:
+        asks: Dict[object, str] = {}
+        for idx in waiting:
+            chain = chains[idx]
+            if pos[idx] >= len(chain):
+                continue
+            tier, value = chain[pos[idx]]
+            if tier.startswith("semantic"):
+                asks[idx] = value
+            else:
+                resolved[idx] = (tier, value)
+        answers = semantic_batch(list(dict.fromkeys(asks.values()))) if asks else {}
+        waiting = []
+        for idx, query in asks.items():
+            hit = answers.get(query)
+            if hit and (accept is None or accept(hit)):
+                resolved[idx] = (chains[idx][pos[idx]][0], hit)
+            else:
+                pos[idx] += 1
+                waiting.append(idx)
+    return resolved
+
+# ---------------- Auto-generated case pre-filter ----------------
+AUTO_CASE_FIELD_COLUMNS = {
+    "id": ["Id", "Case Id", "CaseId"],
+    "subject": ["Subject", "Case Subject", "Email_Subject__c"],
+    "suppliedemail": ["SuppliedEmail", "Supplied Email", "Web Email"],
+    "suppliedname": ["SuppliedName", "Supplied Name", "Web Name"],
+}
+_auto_case_queries: Optional[List[auto_case_filter.AutoCaseQuery]] = None
 
-        # optional embeddings for account/contact names
-        account_embeddings = embed_texts(account_choices) if USE_EMBEDDINGS and model is not None and account_choices else None
-        contact_embeddings = embed_texts(contact_choices) if USE_EMBEDDINGS and model is not None and contact_choices else None
+def get_auto_case_queries() -> List[auto_case_filter.AutoCaseQuery]:
+    """The delete queries, parsed and compiled on first use (empty when AUTO_CASE_FILTER is off)."""
+    global _auto_case_queries
+    if _auto_case_queries is None:
+        _auto_case_queries = auto_case_filter.load_queries(AUTO_CASE_QUERIES) if AUTO_CASE_FILTER else []
+    return _auto_case_queries
 
-        # label embeddings
-        types_emb = embed_texts(ALLOWED_TYPES) if USE_EMBEDDINGS and model is not None else None
-        subtypes_emb = embed_texts(ALLOWED_SUBTYPES) if USE_EMBEDDINGS and model is not None else None
-        cats_emb = embed_texts(ALLOWED_CATEGORIES) if USE_EMBEDDINGS and model is not None else None
+def split_auto_cases(cases_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (cases to match, auto-generated cases) in one pass over the sheet. The second frame keeps the
+    original rows plus an "Auto_Reason" column naming the query file and predicate that matched.
+    With AUTO_CASE_ACTION "tag" the auto-generated cases are matched too, so the first frame is the whole sheet.
+    """
+    queries = get_auto_case_queries()
+    if not queries or cases_df.empty:
+        return cases_df, cases_df.iloc[0:0].assign(Auto_Reason="")
+    cols = cases_df.columns.tolist()
+    columns: Dict[str, List[str]] = {}
+    for field in dict.fromkeys(f for q in queries for f in q.fields):
+        col = find_first_col(cols, AUTO_CASE_FIELD_COLUMNS.get(field, [field]))
+        if col:
+            columns[field] = cases_df[col].astype(str).tolist()
+    id_col = find_first_col(cols, AUTO_CASE_FIELD_COLUMNS["id"])
+    ids = cases_df[id_col].astype(str).str.strip().tolist() if id_col else [""] * len(cases_df)
+    reasons = pd.Series(auto_case_filter.scan(queries, columns, ids), index=cases_df.index)
+    auto = reasons != ""
+    to_match = cases_df if AUTO_CASE_ACTION == "tag" else cases_df[~auto].copy()
+    return to_match, cases_df[auto].assign(Auto_Reason=reasons[auto])
+
+def merge_auto_cases(cases_df: pd.DataFrame, auto_df: pd.DataFrame, order: pd.Index) -> pd.DataFrame:
+    """
+    Put the auto-generated rows back (unless AUTO_CASE_ACTION is "drop") in their original order; with
+    "tag" they were matched with the rest and only get their reason in an Auto_Generated column.
+    """
+    if auto_df.empty or AUTO_CASE_ACTION == "drop":
+        return cases_df
+    if AUTO_CASE_ACTION == "tag":
+        return cases_df.assign(Auto_Generated=auto_df["Auto_Reason"].reindex(cases_df.index).fillna(""))
+    merged = pd.concat([cases_df, auto_df.drop(columns="Auto_Reason")])
+    return merged.loc[order, cases_df.columns].fillna("")
+
+def auto_case_deletions(auto_df: pd.DataFrame) -> pd.DataFrame:
+    """Id / Subject / Reason rows for the deletion CSV (paste into Data Import with Action = Delete)."""
+    cols = auto_df.columns.tolist()
+    id_col = find_first_col(cols, AUTO_CASE_FIELD_COLUMNS["id"])
+    subject_col = find_first_col(cols, AUTO_CASE_FIELD_COLUMNS["subject"])
+    return pd.DataFrame({
+        "Id": auto_df[id_col].astype(str).str.strip() if id_col else "",
+        "Subject": auto_df[subject_col].astype(str) if subject_col else "",
+        "Reason": auto_df["Auto_Reason"],
+    })
+
+# ---------------- Case processing ----------------
+def build_lookups(accounts_df: pd.DataFrame, contacts_df: pd.DataFrame) -> Dict[str, object]:
+    """Account / contact lookup maps, fuzzy choices and candidate indexes, built once per run."""
+    account_norm_map, account_choices = build_account_maps(accounts_df)
+    contact_norm_map, contact_choices = build_contact_maps(contacts_df)
+    # account/contact name and label embeddings are built on demand by the semantic tiers
+    return {
+        "account_norm_map": account_norm_map, "account_choices": account_choices,
+        "account_index": build_candidate_index(account_choices),
+        "contact_norm_map": contact_norm_map, "contact_choices": contact_choices,
+        "contact_index": build_candidate_index(contact_choices),
+        "account_vector_dir": None, "contact_vector_dir": None,
+    }
+
+def load_lookup(path: Path, kind: str) -> Tuple[Dict[str, list], List[str], Dict[str, object]]:
+    """
+    (norm_map, choices, candidate index) for one export (kind = "account" / "contact").
+    Served memory-mapped from LOOKUP_INDEX_DIR while the export is unchanged; otherwise the
+    export is read, compiled and the index rewritten.
+    """
+    store_dir = LOOKUP_INDEX_DIR / f"{kind}_{path.stem}"
+    with timed("index build"):
+        loaded = lookup_index.load(store_dir, path) if USE_LOOKUP_INDEX else None
+        if loaded is not None:
+            norm_map, choices, index = loaded
+            index["max_posting"] = max(1, int(len(choices) * BLOCKING_MAX_POSTING))
+            return norm_map, choices, index
+        df = load_table(path) if path.exists() else pd.DataFrame()
+        norm_map, choices = build_account_maps(df) if kind == "account" else build_contact_maps(df)
+        index = build_candidate_index(choices)
+        if USE_LOOKUP_INDEX and choices:
+            try:
+                lookup_index.save(store_dir, path, norm_map, choices, index)
+            except Exception as e:
+                print(f"Warning: could not write lookup index to {store_dir}: {e}")
+        return norm_map, choices, index
+
+def load_lookups(accounts_path: Path, contacts_path: Path) -> Dict[str, object]:
+    """build_lookups for the export files, through the on-disk lookup index."""
+    account_norm_map, account_choices, account_index = load_lookup(accounts_path, "account")
+    contact_norm_map, contact_choices, contact_index = load_lookup(contacts_path, "contact")
+    return {
+        "account_norm_map": account_norm_map, "account_choices": account_choices, "account_index": account_index,
+        "contact_norm_map": contact_norm_map, "contact_choices": contact_choices, "contact_index": contact_index,
+        # semantic tier: embeddings of the names, indexed next to the lookup index (get_vector_index)
+        "account_vector_dir": LOOKUP_INDEX_DIR / f"account_{accounts_path.stem}" / "vectors" if USE_LOOKUP_INDEX else None,
+        "contact_vector_dir": LOOKUP_INDEX_DIR / f"contact_{contacts_path.stem}" / "vectors" if USE_LOOKUP_INDEX else None,
+    }
+
+def add_output_columns(cases_df: pd.DataFrame) -> Tuple[str, str]:
+    """Add the columns process_cases fills (empty) where missing; returns the (AccountId, ContactId) columns."""
+    cols = cases_df.columns.tolist()
+    acct_id_out_col = find_first_col(cols, ["AccountId","Account Id","Account_Id"]) or "AccountId"
+    con_id_out_col = find_first_col(cols, ["ContactId","Contact Id","Contact_Id"]) or "ContactId"
+    for c in [acct_id_out_col, con_id_out_col, "Type", "Sub_Type__c", "Category__c", "Sub-Type", "Category"]:
+        if c not in cases_df.columns:
+            cases_df[c] = ""
+    return acct_id_out_col, con_id_out_col
+
+def process_cases(cases_df: pd.DataFrame, lookups: Dict[str, object], workers: int = WORKERS) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Fill AccountId / ContactId and Type / Sub-Type / Category on a frame of cases (one sheet, or
+    one chunk of a streamed file). Rows are independent, so chunks can be processed one at a time.
+    Returns the updated frame and {processed, filled_acc, filled_con, model_labels, cluster_members, cluster_sizes,
+    tiers, text}; tiers counts the rows each tier resolved: {"account" / "contact" / "labels": {tier: rows}}, text the
+    summary / description bytes before and after matching_texts.
+    """
+    account_norm_map, account_choices = lookups["account_norm_map"], lookups["account_choices"]
+    contact_norm_map, contact_choices = lookups["contact_norm_map"], lookups["contact_choices"]
+    account_index, contact_index = lookups["account_index"], lookups["contact_index"]
+
+    cols = cases_df.columns.tolist()
+    acct_name_col = find_first_col(cols, ["Account Name","AccountName","Account","_Account_Name__c","Account_Name__c"])
+    contact_name_col = find_first_col(cols, ["Contact Name","ContactName","Contact","Contact FullName","_Contact_Name__c"])
+    summary_col = find_first_col(cols, ["Email Summary","_Email_Summary__c","Email_Summary__c","Email Summary","Summary","Email Subject"])
+    subject_col = find_first_col(cols, ["Subject","Case Subject","Email_Subject__c"])
+    desc_col = find_first_col(cols, ["Description","_Description","Description__c","Body","Email Body"])
+
+    acct_id_out_col, con_id_out_col = add_output_columns(cases_df)
+
+    filled_acc = filled_con = 0
+    tiers: Dict[str, Dict[str, int]] = {"account": {}, "contact": {}, "labels": {}}   # rows resolved per tier
+
+    # ---------- Exact matches for the whole sheet (columnar) ----------
+    # rows resolved here skip the fuzzy / semantic tiers below
+    with timed("exact"):
+        exact = exact_match_prepass(cases_df, acct_name_col, contact_name_col, account_norm_map, contact_norm_map)
+        existing_acc_col = cases_df[acct_id_out_col].astype(str).str.strip()
+        existing_con_col = cases_df[con_id_out_col].astype(str).str.strip()
+        fill = (exact["acc_id"] != "") & (existing_acc_col == "")
+        cases_df.loc[fill, acct_id_out_col] = exact.loc[fill, "acc_id"]
+        filled_acc += int(fill.sum())
+        tiers["account"]["exact"] = int(fill.sum())
+        acc_done = fill | (existing_acc_col != "")
+        fill = (exact["con_id"] != "") & (existing_con_col == "")
+        cases_df.loc[fill, con_id_out_col] = exact.loc[fill, "con_id"]
+        filled_con += int(fill.sum())
+        tiers["contact"]["exact"] = int(fill.sum())
+        con_done = fill | (existing_con_col != "")
+        # AccountId of every contact written this run; backfills empty AccountIds once matching is done
+        backfill_acc = exact["con_acc"].where(fill, "")
+
+    # ---------- Keyword rules per row, then fuzzy tiers per distinct name / text (optionally in worker processes) ----------
+    def column_values(col: Optional[str], strip: bool = False) -> List[str]:
+        if not col:
+            return [""] * len(cases_df)
+        vals = cases_df[col].astype(str)
+        return (vals.str.strip() if strip else vals).tolist()
+
+    # email threads: matching and rules only see the newest message, capped to TEXT_WINDOW_CHARS (cells stay as they are)
+    with timed("text prep"):
+        text_counts: Dict[str, int] = {"input_bytes": 0, "kept_bytes": 0, "values_trimmed": 0}
+        summaries = matching_texts(column_values(summary_col), text_counts)
+        descriptions = matching_texts(column_values(desc_col), text_counts)
+
+    with timed("rules"):
+        rows = list(zip(cases_df.index, summaries, column_values(subject_col), descriptions))
+        # near-duplicate texts: only cluster representatives are rule-scored and members take over their
+        # label chains. For the text-based account / contact tiers a member reuses the representative's
+        # text only when the two are the same template (equal once digits are masked); otherwise the
+        # differing words may name another company, so the member keeps its own text.
+        rep_of = list(range(len(rows)))
+        own_texts: List[str] = []
+        if CLUSTER_CASES:
+            parts = [normalize_text_series(pd.Series([row[k] for row in rows], dtype=str)).tolist() for k in (1, 2, 3)]
+            rep_of = cluster_near_duplicates(list(zip(*parts)))
+            own_texts = [" ".join(p for p in t if p) for t in zip(*parts)]
+        MATCH_STATE.update({
+            "account_choices": account_choices, "account_index": account_index,
+            "contact_choices": contact_choices, "contact_index": contact_index,
+        })
+        rep_rows = [row for pos, row in enumerate(rows) if rep_of[pos] == pos]
+        rep_results = run_match_chunks(rep_rows, workers)
+        model_tiers = add_model_label_tiers(rep_rows, rep_results)
+        by_rep = dict(zip((pos for pos in range(len(rows)) if rep_of[pos] == pos), rep_results))
+        results = []
+        for pos, ((idx, *_), r) in enumerate(zip(rows, rep_of)):
+            _, combined, label_chains = by_rep[r]
+            if r != pos and re.sub(r"\d+", "0", own_texts[pos]) != re.sub(r"\d+", "0", combined):
+                combined = own_texts[pos]
+            results.append((idx, combined, label_chains))
+        processed = len(results)
+        combined_texts = [combined for _, combined, _ in results]
+
+    with timed("fuzzy"):
+        acc_chains = name_tier_chains(
+            "account",
+            [r for r, done in zip(zip(cases_df.index, column_values(acct_name_col, strip=True), combined_texts), acc_done) if not done],
+            normalize_company, account_norm_map, bool(USE_EMBEDDINGS and account_choices), workers)
+        con_chains = name_tier_chains(
+            "contact",
+            [r for r, done in zip(zip(cases_df.index, column_values(contact_name_col, strip=True), combined_texts), con_done) if not done],
+            normalize_person, contact_norm_map, bool(USE_EMBEDDINGS and contact_choices), workers)
+
+    # clean visible fields
+    with timed("output"):
+        for col in dict.fromkeys(c for c in (summary_col, subject_col, desc_col) if c):
+            cases_df[col] = cases_df[col].astype(str).str.replace(r"_x000D_|\n", " ", regex=True).str.strip()
+
+    # ---------- Semantic tiers (batched) and account/contact fills ----------
+    with timed("semantic"):
+        acc_resolved = resolve_tier_chains(
+            {idx: ch for idx, ch in acc_chains.items() if ch},
+            lazy_semantic_choices(account_choices, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT, lookups.get("account_vector_dir")),
+            accept=lambda choice: bool(account_norm_map[choice][0][0]))
+        for idx, (tier, choice) in acc_resolved.items():
+            cases_df.at[idx, acct_id_out_col] = account_norm_map[choice][0][0]
+            tiers["account"][tier] = tiers["account"].get(tier, 0) + 1
+        filled_acc += len(acc_resolved)
+
+        con_resolved = resolve_tier_chains(
+            {idx: ch for idx, ch in con_chains.items() if ch},
+            lazy_semantic_choices(contact_choices, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT, lookups.get("contact_vector_dir")),
+            accept=lambda choice: bool(contact_norm_map[choice][0][0]))
+        for idx, (tier, choice) in con_resolved.items():
+            matched_con_id, _raw, matched_con_acc = contact_norm_map[choice][0]
+            cases_df.at[idx, con_id_out_col] = matched_con_id
+            backfill_acc.at[idx] = matched_con_acc or ""
+            tiers["contact"][tier] = tiers["contact"].get(tier, 0) + 1
+        filled_con += len(con_resolved)
+
+    # ---------- Contact -> AccountId backfill (columnar) ----------
+    with timed("exact"):
+        backfill = (backfill_acc != "") & (cases_df[acct_id_out_col] == "")
+        cases_df.loc[backfill, acct_id_out_col] = backfill_acc[backfill]
+        filled_acc += int(backfill.sum())
+        tiers["account"]["contact-backfill"] = int(backfill.sum())
+
+    # ---------- Labels: batched semantic tier for rows the rules could not label ----------
+    with timed("semantic"):
+        label_rows = [(idx, chains) for idx, _, chains in results if chains]
+        fallthrough_texts = list(dict.fromkeys(
+            ch[0][1] for _, chains in label_rows for ch in chains if ch[0][0] == "semantic"))
+        semantic_labels: List[Dict[str, Optional[str]]] = [{}, {}, {}]
+        if USE_EMBEDDINGS and fallthrough_texts:
+            semantic_labels = semantic_label_batch(
+                fallthrough_texts,
+                [(labels, embed_texts_normalized(labels)) for labels in (ALLOWED_TYPES, ALLOWED_SUBTYPES, ALLOWED_CATEGORIES)],
+                SIMILARITY_THRESHOLD_LABEL)
+
+        # override the fields
+        for k, out_cols in enumerate([["Type"], ["Sub_Type__c", "Sub-Type"], ["Category__c", "Category"]]):
+            lookup = semantic_labels[k]
+            chosen = resolve_tier_chains({idx: chains[k] for idx, chains in label_rows},
+                                         lambda qs, lookup=lookup: {q: lookup.get(q) for q in qs})
+            for tier, _label in chosen.values():
+                tiers["labels"][tier] = tiers["labels"].get(tier, 0) + 1
+            for col in out_cols:
+                if col in cases_df.columns:
+                    for idx, (_tier, label) in chosen.items():
+                        cases_df.at[idx, col] = label
+
+    return cases_df, {"processed": processed, "filled_acc": filled_acc, "filled_con": filled_con, "model_labels": model_tiers,
+                      "cluster_members": len(rows) - len(rep_results), "cluster_sizes": cluster_size_histogram(rep_of),
+                      "tiers": tiers, "text": text_counts}
+
+# ---------------- Incremental mode ----------------
+# the helper modules imported above: a change to any of them can change a case's result
+ENGINE_MODULES = [sys.modules[n] for n in ("embedding_cache", "table_cache", "vector_index", "lookup_index", "case_state",
+                                           "upsert_export", "auto_case_filter", "label_model", "excel_io", "email_text")]
+
+def run_config(accounts_path: Path, contacts_path: Path) -> Dict[str, object]:
+    """Everything besides a case's own row that its result depends on; stored results are reused only while this is unchanged."""
+    lm_path = LABEL_MODEL_PATH if get_label_model() is not None else None
+    return {
+        "engine": lookup_index.file_sha1(Path(__file__)),     # rules, allowed labels and code
+        "modules": {m.__name__: lookup_index.file_sha1(Path(m.__file__)) for m in ENGINE_MODULES},
+        "accounts": lookup_index.file_sha1(accounts_path) if accounts_path.exists() else "",
+        "contacts": lookup_index.file_sha1(contacts_path) if contacts_path.exists() else "",
+        "label_model": lookup_index.file_sha1(lm_path) if lm_path else "",
+        "label_model_min_confidence": LABEL_MODEL_MIN_CONFIDENCE,
+        "embeddings": MODEL_NAME if USE_EMBEDDINGS else "",
+        "vector_index": [VECTOR_INDEX_DTYPE, VECTOR_INDEX_IVF_MIN, VECTOR_INDEX_NPROBE],
+        "thresholds": [NAME_FUZZY_STRICT, NAME_FUZZY_FROM_TEXT, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT,
+                       SIMILARITY_THRESHOLD_LABEL, FUZZY_THRESHOLD_LABEL],
+        "scorers": [NAME_FUZZY_SCORER, TEXT_FUZZY_SCORER],
+        "text_prep": [STRIP_EMAIL_TEXT, TEXT_WINDOW_CHARS],
+        "blocking": [BLOCKING_TOP_K, BLOCKING_MAX_POSTING],
+        "clustering": [CLUSTER_CASES, CLUSTER_THRESHOLD, MINHASH_PERMS, LSH_BANDS, LSH_MIN_BANDS, LSH_BUCKET_MAX],
+    }
+
+def process_cases_incremental(cases_df: pd.DataFrame, lookups: Dict[str, object], store: case_state.CaseStateStore,
+                              cfg_hash: str, workers: int = WORKERS, force: bool = False) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    process_cases for the cases that are new, or whose row or run_config changed since they were
+    stored; the others take their stored output cells. Rows without an Id are always processed.
+    Counts are those of process_cases for the processed rows, plus "reused".
+    Near-duplicate clustering only sees the processed rows, so --full can still differ slightly.
+    """
+    with timed("state"):
+        id_col = find_first_col(cases_df.columns.tolist(), ["Id", "Case Id", "CaseId"])
+        ids = cases_df[id_col].astype(str).str.strip().tolist() if id_col else [""] * len(cases_df)
+        hashes = case_state.row_hashes(cases_df.columns.tolist(), cases_df.itertuples(index=False, name=None))
+        stored = [None] * len(ids) if force else store.lookup(ids, hashes, cfg_hash)
+        reuse = np.array([s is not None and bool(i) for s, i in zip(stored, ids)], dtype=bool)
+
+        result = cases_df.copy()
+        add_output_columns(result)
+        counts: Dict[str, object] = {"processed": 0, "filled_acc": 0, "filled_con": 0, "model_labels": 0,
+                                     "cluster_members": 0, "cluster_sizes": cluster_size_histogram([]),
+                                     "tiers": {"account": {}, "contact": {}, "labels": {}},
+                                     "text": {"input_bytes": 0, "kept_bytes": 0, "values_trimmed": 0}}
+        todo = np.flatnonzero(~reuse)
+        if len(todo):
+            before = cases_df.iloc[todo]
+            processed, counts = process_cases(before.copy(), lookups, workers)
+            # output cells = every cell processing changed (or added)
+            outputs: List[Dict[str, str]] = [{} for _ in todo]
+            for col in processed.columns:
+                new = processed[col]
+                changed = np.ones(len(todo), dtype=bool) if col not in before.columns else (new != before[col]).to_numpy()
+                for pos in np.flatnonzero(changed):
+                    outputs[pos][col] = new.iat[pos]
+                if col not in result.columns:
+                    result[col] = ""
+            result.loc[processed.index, processed.columns] = processed
+            keep = [pos for pos, i in enumerate(todo) if ids[i]]
+            store.store([ids[todo[p]] for p in keep], [hashes[todo[p]] for p in keep], cfg_hash, [outputs[p] for p in keep])
+
+        by_col: Dict[str, Tuple[list, list]] = {}
+        for i in np.flatnonzero(reuse):
+            for col, val in stored[i].items():
+                idxs, vals = by_col.setdefault(col, ([], []))
+                idxs.append(result.index[i])
+                vals.append(val)
+        for col, (idxs, vals) in by_col.items():
+            if col not in result.columns:
+                result[col] = ""
+            result.loc[idxs, col] = vals
+        counts["reused"] = int(reuse.sum())
+        return result, counts
+
+# ---------------- Run report ----------------
+def add_counts(total: Dict[str, object], counts: Dict[str, object]) -> Dict[str, object]:
+    """Sum process_cases counts (numbers and nested {name: number} dicts) into total, e.g. over streamed chunks."""
+    for k, v in counts.items():
+        if isinstance(v, dict):
+            add_counts(total.setdefault(k, {}), v)
+        else:
+            total[k] = total.get(k, 0) + v
+    return total
+
+def run_report(counts: Dict[str, object], rows: int, auto_cases: int, seconds: float) -> Dict[str, object]:
+    """Machine-readable summary of a run: row counts, rows resolved per tier, text trimmed, wall time per stage and throughput."""
+    text = counts.get("text", {})
+    return {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": {"input": rows, "auto_generated": auto_cases, "processed": counts.get("processed", 0),
+                 "reused": counts.get("reused", 0)},
+        "filled": {"AccountId": counts.get("filled_acc", 0), "ContactId": counts.get("filled_con", 0)},
+        "tiers": counts.get("tiers", {}),
+        "model_labels": counts.get("model_labels", 0),
+        "clusters": {"members": counts.get("cluster_members", 0), "sizes": counts.get("cluster_sizes", {})},
+        "text": dict(text, saved_bytes=text.get("input_bytes", 0) - text.get("kept_bytes", 0)),
+        "seconds": {
+            "total": round(seconds, 4),
+            "stages": {k: round(v, 4) for k, v in STAGE_TIMINGS.items()},
+            "other": round(seconds - sum(STAGE_TIMINGS.values()), 4),
+            "startup": {k: round(v, 4) for k, v in STARTUP_TIMINGS.items()},
+        },
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+    }
+
+def report_summary(report: Dict[str, object]) -> str:
+    """Stage times, then resolved-by tiers for account / contact and the case text left out of matching."""
+    secs = report["seconds"]
+    line = ("Stages: " + ", ".join(f"{k} {v:.2f}s" for k, v in secs["stages"].items())
+            + f"; total {secs['total']:.2f}s ({report['rows_per_second']} rows/s)")
+    for kind in ("account", "contact"):
+        hits = report["tiers"].get(kind, {})
+        if hits:
+            line += f"\n{kind.capitalize()} Ids by tier: " + ", ".join(f"{k} {v}" for k, v in hits.items() if v)
+    text = report.get("text", {})
+    if text.get("input_bytes"):
+        line += (f"\nCase text: {text['input_bytes'] / 1e6:.1f} MB of summaries / descriptions, {text['saved_bytes'] / 1e6:.1f} MB "
+                 f"({text['saved_bytes'] / text['input_bytes']:.0%}) left out of matching in {text['values_trimmed']} trimmed values")
+    return line
+
+# ---------------- Output ----------------
+# _x000D_ / \r / \n / \t -> " " in one regex pass, then strip (none of the replacements can form another match)
+_SALESFORCE_DIRTY = r"_x000D_|[\r\n\t]"
+_SALESFORCE_DIRTY_RE = re.compile(_SALESFORCE_DIRTY)
+
+def clean_for_salesforce(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of df with stripped headers and _x000D_ / line breaks / tabs flattened in text cells."""
+    df2 = df.rename(columns=lambda c: str(c).strip())
+    for col in df2.columns:
+        # dtype=str reads as "object" before pandas 3 and as the string dtype from pandas 3 on
+        if df2[col].dtype == "object" or pd.api.types.is_string_dtype(df2[col].dtype):
+            df2[col] = df2[col].astype(str).str.replace(_SALESFORCE_DIRTY, " ", regex=True).str.strip()
+    return df2
+
+def clean_cell(v):
+    return _SALESFORCE_DIRTY_RE.sub(" ", v).strip() if isinstance(v, str) else v
+
+def upsert_changes(source_df: pd.DataFrame, cases_df: pd.DataFrame, keep_all_fields: bool = False) -> pd.DataFrame:
+    """
+    Id + UPSERT_FIELDS (API names) for the cases whose values processing changed; source_df is the
+    sheet as read, cases_df the processed frame (same index, rows may be missing). Unchanged cells are "".
+    """
+    source_df = source_df.loc[cases_df.index]
+    id_col = find_first_col(cases_df.columns.tolist(), ["Id", "Case Id", "CaseId"])
+    if id_col is None:
+        return pd.DataFrame(columns=["Id"])
+    fields: Dict[str, pd.Series] = {}
+    for api, candidates in UPSERT_FIELDS.items():
+        col = find_first_col(cases_df.columns.tolist(), candidates)
+        if col is None:
+            continue
+        before = source_df[col] if col in source_df.columns else pd.Series("", index=cases_df.index)
+        fields[api] = upsert_export.changed_cells(before, cases_df[col])
+    return upsert_export.upsert_frame(cases_df[id_col], fields, keep_all_fields)
 
-        # load TESTME workbook
-        all_sheets = pd.read_excel(TESTME_XLSX, sheet_name=None, dtype=str, engine="openpyxl")
-        sheet_name = "Full Acc and Contact" if "Full Acc and Contact" in all_sheets else list(all_sheets.keys())[0]
-        cases_df = all_sheets[sheet_name].fillna("")
+def write_outputs(cases_df: pd.DataFrame, source_xlsx: Path, sheet_name: str,
+                  raw_xlsx: Path, clean_xlsx: Path, clean_csv: Path) -> None:
+    """
+    Write the raw workbook, the cleaned workbook and the cleaned CSV of the processed sheet together.
+    Each column is cleaned once; rows then go to both write-only (streaming) workbooks and the CSV in
+    one pass. The other sheets of source_xlsx are streamed across cell by cell without pandas:
+    unchanged into the raw workbook, with text cells cleaned into the clean one.
+    """
+    cleaned = clean_for_salesforce(cases_df)
+    raw_wb, clean_wb = Workbook(write_only=True), Workbook(write_only=True)
+    source = load_workbook(source_xlsx, read_only=True, data_only=True)
+    try:
+        with open(clean_csv, "w", encoding="utf-8", newline="") as fh:
+            for sname in source.sheetnames:
+                raw_ws, clean_ws = raw_wb.create_sheet(sname), clean_wb.create_sheet(sname)
+                if sname != sheet_name:
+                    for row in source[sname].iter_rows(values_only=True):
+                        raw_ws.append(row)
+                        clean_ws.append([clean_cell(v) for v in row])
+                    continue
+                csv_out = csv.writer(fh, lineterminator=os.linesep)
+                raw_ws.append(excel_io.header_cells(raw_ws, cases_df.columns))
+                clean_ws.append(excel_io.header_cells(clean_ws, cleaned.columns))
+                csv_out.writerow(cleaned.columns)
+                for raw_row, clean_row in zip(cases_df.itertuples(index=False, name=None),
+                                              cleaned.itertuples(index=False, name=None)):
+                    raw_ws.append(raw_row)
+                    clean_ws.append(clean_row)
+                    csv_out.writerow(clean_row)
+    finally:
+        source.close()
+    raw_wb.save(raw_xlsx)
+    print("Raw Excel written to:", raw_xlsx)
+    clean_wb.save(clean_xlsx)
+    print("Clean Excel written to:", clean_xlsx)
+    print("Clean CSV written to:", clean_csv)
 
-        cols = cases_df.columns.tolist()
-        acct_name_col = find_first_col(cols, ["Account Name","AccountName","Account","_Account_Name__c","Account_Name__c"])
-        contact_name_col = find_first_col(cols, ["Contact Name","ContactName","Contact","Contact FullName","_Contact_Name__c"])
-        summary_col = find_first_col(cols, ["Email Summary","_Email_Summary__c","Email_Summary__c","Email Summary","Summary","Email Subject"])
-        subject_col = find_first_col(cols, ["Subject","Case Subject","Email_Subject__c"])
-        desc_col = find_first_col(cols, ["Description","_Description","Description__c","Body","Email Body"])
+# ---------------- Main ----------------
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Map AccountId / ContactId and classify Type / Sub-Type / Category in the TESTME workbook.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"processes for fuzzy matching and rule scoring (default {WORKERS} = serial)")
+    parser.add_argument("--full", action="store_true", help="re-process every case instead of reusing stored results of unchanged ones")
+    args = parser.parse_args(argv)
+    run_start = time.perf_counter()
+    print(f"Startup: imports {STARTUP_TIMINGS['imports']:.2f}s; "
+          + ("semantic model loads on first use" if USE_EMBEDDINGS else "sentence-transformers not installed, fuzzy-only mode"))
+    try:
+        if not TESTME_XLSX.exists():
+            print(f"ERROR: TESTME.xlsx not found at {TESTME_XLSX}")
+            return
 
-        acct_id_out_col = find_first_col(cols, ["AccountId","Account Id","Account_Id"]) or "AccountId"
-        con_id_out_col = find_first_col(cols, ["ContactId","Contact Id","Contact_Id"]) or "ContactId"
+        t0 = time.perf_counter()
+        lookups = load_lookups(ACCOUNTS_CSV, CONTACTS_CSV)
+        print(f"Lookups ready in {time.perf_counter() - t0:.2f}s: {len(lookups['account_choices'])} account names, "
+              f"{len(lookups['contact_choices'])} contact names")
 
-        for c in [acct_id_out_col, con_id_out_col, "Type", "Sub_Type__c", "Category__c", "Sub-Type", "Category"]:
-            if c not in cases_df.columns:
-                cases_df[c] = ""
+        # load the case sheet of the TESTME workbook (other sheets are copied to the outputs unparsed)
+        sheet_name, cases_df = load_case_sheet(TESTME_XLSX)
 
         ambiguous_rows: List[Dict[str,str]] = []
-        processed = 0
-        filled_acc = filled_con = 0
-
+        source_df, sheet_index = cases_df, cases_df.index
+        with timed("auto-case filter"):
+            cases_df, auto_df = split_auto_cases(cases_df)
+            if AUTO_CASE_FILTER:
+                auto_case_deletions(auto_df).to_csv(AUTO_CASES_CSV, index=False, encoding="utf-8")
+        if AUTO_CASE_FILTER:
+            print(f"Auto-generated cases: {len(auto_df)} ({AUTO_CASE_ACTION}); Ids for deletion written to: {AUTO_CASES_CSV}")
         print(f"Processing {len(cases_df)} rows...")
-
-        # iterate rows
-        for idx, row in cases_df.iterrows():
-            processed += 1
-
-            summary_val = str(row.get(summary_col, "")) if summary_col else ""
-            subject_val = str(row.get(subject_col, "")) if subject_col else ""
-            desc_val = str(row.get(desc_col, "")) if desc_col else ""
-            combined_text = f"{summary_val} {subject_val} {desc_val}".strip()
-
-            # clean visible fields
-            if summary_col:
-                cases_df.at[idx, summary_col] = summary_val.replace("_x000D_", " ").replace("\n", " ").strip()
-            if subject_col:
-                cases_df.at[idx, subject_col] = subject_val.replace("_x000D_", " ").replace("\n", " ").strip()
-            if desc_col:
-                cases_df.at[idx, desc_col] = desc_val.replace("_x000D_", " ").replace("\n", " ").strip()
-
-            combined_norm = normalize_text(combined_text)
-
-            # ---------- Account matching ----------
-            existing_acc = str(row.get(acct_id_out_col, "")).strip()
-            matched_acc_id: Optional[str] = None
-
-            acct_name_val = str(row.get(acct_name_col, "")).strip() if acct_name_col else ""
-            if acct_name_val:
-                acct_norm = normalize_company(acct_name_val)
-                if acct_norm and acct_norm in account_norm_map:
-                    matched_acc_id = account_norm_map[acct_norm][0][0]
-                else:
-                    approx = fuzzy_choice_from_text(acct_name_val, account_choices, NAME_FUZZY_STRICT)
-                    if approx:
-                        matched_acc_id = account_norm_map.get(approx)[0][0]
-                    else:
-                        if USE_EMBEDDINGS and account_embeddings is not None:
-                            sem = semantic_choice_from_text(acct_name_val, account_choices, account_embeddings, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT)
-                            if sem:
-                                matched_acc_id = account_norm_map.get(sem)[0][0]
-
-            if not matched_acc_id and combined_norm:
-                approx2 = fuzzy_choice_from_text(combined_norm, account_choices, NAME_FUZZY_FROM_TEXT)
-                if approx2:
-                    matched_acc_id = account_norm_map.get(approx2)[0][0]
-                else:
-                    if USE_EMBEDDINGS and account_embeddings is not None:
-                        sem2 = semantic_choice_from_text(combined_norm, account_choices, account_embeddings, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT)
-                        if sem2:
-                            matched_acc_id = account_norm_map.get(sem2)[0][0]
-
-            if matched_acc_id and not existing_acc:
-                cases_df.at[idx, acct_id_out_col] = matched_acc_id
-                filled_acc += 1
-
-            # ---------- Contact matching ----------
-            existing_con = str(row.get(con_id_out_col, "")).strip()
-            matched_con_id: Optional[str] = None
-            matched_con_acc: Optional[str] = None
-
-            contact_name_val = str(row.get(contact_name_col, "")).strip() if contact_name_col else ""
-            if contact_name_val:
-                c_norm = normalize_person(contact_name_val)
-                if c_norm and c_norm in contact_norm_map:
-                    matched_con_id, _raw, matched_con_acc = contact_norm_map[c_norm][0]
-                else:
-                    approxc = fuzzy_choice_from_text(contact_name_val, contact_choices, NAME_FUZZY_STRICT)
-                    if approxc:
-                        matched_con_id, _raw, matched_con_acc = contact_norm_map.get(approxc)[0]
-                    else:
-                        if USE_EMBEDDINGS and contact_embeddings is not None:
-                            semc = semantic_choice_from_text(contact_name_val, contact_choices, contact_embeddings, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT)
-                            if semc:
-                                matched_con_id, _raw, matched_con_acc = contact_norm_map.get(semc)[0]
-
-            if not matched_con_id and combined_norm:
-                approxc2 = fuzzy_choice_from_text(combined_norm, contact_choices, NAME_FUZZY_FROM_TEXT)
-                if approxc2:
-                    matched_con_id, _raw, matched_con_acc = contact_norm_map.get(approxc2)[0]
-                else:
-                    if USE_EMBEDDINGS and contact_embeddings is not None:
-                        semc2 = semantic_choice_from_text(combined_norm, contact_choices, contact_embeddings, SIMILARITY_THRESHOLD_ACCOUNT_CONTACT)
-                        if semc2:
-                            matched_con_id, _raw, matched_con_acc = contact_norm_map.get(semc2)[0]
-
-            if matched_con_id and not existing_con:
-                cases_df.at[idx, con_id_out_col] = matched_con_id
-                filled_con += 1
-                if not cases_df.at[idx, acct_id_out_col] and matched_con_acc:
-                    cases_df.at[idx, acct_id_out_col] = matched_con_acc
-                    filled_acc += 1
-
-            # ---------- Classification: PRIORITIZE Email Summary > Subject > Description ----------
-            # use weighted rules and weighted combined text (summary repeated)
-            if any([summary_val.strip(), subject_val.strip(), desc_val.strip()]):
-                chosen_type = infer_label_weighted(summary_val, subject_val, desc_val, TYPE_RULES, ALLOWED_TYPES, semantic_emb=types_emb if USE_EMBEDDINGS else None, semantic_thresh=SIMILARITY_THRESHOLD_LABEL)
-                chosen_sub  = infer_label_weighted(summary_val, subject_val, desc_val, SUBTYPE_RULES, ALLOWED_SUBTYPES, semantic_emb=subtypes_emb if USE_EMBEDDINGS else None, semantic_thresh=SIMILARITY_THRESHOLD_LABEL)
-                chosen_cat  = infer_label_weighted(summary_val, subject_val, desc_val, CATEGORY_RULES, ALLOWED_CATEGORIES, semantic_emb=cats_emb if USE_EMBEDDINGS else None, semantic_thresh=SIMILARITY_THRESHOLD_LABEL)
-
-                # override the fields
-                cases_df.at[idx, "Type"] = chosen_type
-                cases_df.at[idx, "Sub_Type__c"] = chosen_sub
-                cases_df.at[idx, "Category__c"] = chosen_cat
-                if "Sub-Type" in cases_df.columns:
-                    cases_df.at[idx, "Sub-Type"] = chosen_sub
-                if "Category" in cases_df.columns:
-                    cases_df.at[idx, "Category"] = chosen_cat
-
-        # end loop rows
-
-        # save outputs
-        all_sheets[sheet_name] = cases_df
-        with pd.ExcelWriter(OUTPUT_XLSX, engine="openpyxl") as writer:
-            for sname, df in all_sheets.items():
-                df.to_excel(writer, sheet_name=sname, index=False)
-        print("Raw Excel written to:", OUTPUT_XLSX)
-
-        # cleaned version
-        cleaned = {}
-        for sname, df in all_sheets.items():
-            df2 = df.copy()
-            df2.rename(columns=lambda c: str(c).strip(), inplace=True)
-            for col in df2.columns:
-                if df2[col].dtype == "object":
-                    df2[col] = (df2[col].astype(str)
-                                .str.replace("_x000D_", " ", regex=False)
-                                .str.replace("\r", " ", regex=False)
-                                .str.replace("\n", " ", regex=False)
-                                .str.replace("\t", " ", regex=False)
-                                .str.strip())
-            cleaned[sname] = df2
-        with pd.ExcelWriter(CLEAN_OUTPUT_XLSX, engine="openpyxl") as writer:
-            for sname, df2 in cleaned.items():
-                df2.to_excel(writer, sheet_name=sname, index=False)
-        print("Clean Excel written to:", CLEAN_OUTPUT_XLSX)
-
-        # CSV for Salesforce
-        cleaned[sheet_name].to_csv(CLEAN_OUTPUT_CSV, index=False, encoding="utf-8")
-        print("Clean CSV written to:", CLEAN_OUTPUT_CSV)
-
-        # ambiguous log (if any)
-        if ambiguous_rows:
-            pd.DataFrame(ambiguous_rows).to_csv(AMBIGUOUS_CSV, index=False)
-            print("Ambiguous matches written to:", AMBIGUOUS_CSV)
+        if INCREMENTAL:
+            store = case_state.CaseStateStore(CASE_STATE_DB)
+            try:
+                with timed("state"):
+                    cfg_hash = case_state.config_hash(run_config(ACCOUNTS_CSV, CONTACTS_CSV))
+                cases_df, counts = process_cases_incremental(cases_df, lookups, store, cfg_hash, args.workers, args.full)
+            finally:
+                store.close()
+            print(f"Incremental: {counts['reused']} unchanged rows reused from {CASE_STATE_DB.name}")
+        else:
+            cases_df, counts = process_cases(cases_df, lookups, args.workers)
+        with timed("output"):
+            cases_df = merge_auto_cases(cases_df, auto_df, sheet_index)
+        print(f"Rows processed: {counts['processed']}, AccountId filled: {counts['filled_acc']}, ContactId filled: {counts['filled_con']}")
+        if get_label_model() is not None:
+            print(f"Label model ({LABEL_MODEL_PATH.name}): {counts['model_labels']} labels above {LABEL_MODEL_MIN_CONFIDENCE:.2f} confidence")
+        if CLUSTER_CASES:
+            print(f"Near-duplicate clusters: {counts['processed'] - counts['cluster_members']} classified for {counts['processed']} rows; "
+                  "clusters by size: " + ", ".join(f"{k}: {v}" for k, v in counts["cluster_sizes"].items() if v))
+
+        # save outputs: raw workbook, cleaned workbook and CSV for Salesforce in one pass
+        with timed("output"):
+            write_outputs(cases_df, TESTME_XLSX, sheet_name, OUTPUT_XLSX, CLEAN_OUTPUT_XLSX, CLEAN_OUTPUT_CSV)
+
+            # changed cases only, ready for a Bulk API 2.0 / Data Import upsert
+            if UPSERT_EXPORT:
+                changes = upsert_changes(source_df, cases_df)
+                files = upsert_export.write_upsert_files(changes, UPSERT_DIR, UPSERT_MAX_MB * 1024 * 1024, UPSERT_MAX_ROWS)
+                print(f"Upsert: {len(changes)} changed cases ({', '.join(changes.columns[1:]) or 'no fields'}) "
+                      f"in {len(files)} file(s) under {UPSERT_DIR}")
+
+            # ambiguous log (if any)
+            if ambiguous_rows:
+                pd.DataFrame(ambiguous_rows).to_csv(AMBIGUOUS_CSV, index=False)
+                print("Ambiguous matches written to:", AMBIGUOUS_CSV)
+
+        if embedding_cache is not None:
+            embedding_cache.save()
+            st = embedding_cache.stats()
+            print(f"Embedding cache: {st['entries']} vectors ({st['bytes_used'] / 1e6:.1f} MB), "
+                  f"{st['hits']} hits, {st['misses']} encoded, {st['evicted']} evicted")
+        if table_cache is not None:
+            print(f"Table cache: {table_cache.hits} tables reused, {table_cache.misses} parsed")
+        print(startup_report())
+
+        report = run_report(counts, len(sheet_index), len(auto_df), time.perf_counter() - run_start)
+        if embedding_cache is not None:
+            report["embedding_cache"] = embedding_cache.stats()
+        if table_cache is not None:
+            report["table_cache"] = {"hits": table_cache.hits, "misses": table_cache.misses}
+        RUN_REPORT_JSON.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(report_summary(report))
+        print("Run report written to:", RUN_REPORT_JSON)
 
     except Exception as e:
         print("Fatal error:", e)
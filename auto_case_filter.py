@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+auto_case_filter.py
+
+Local version of the deleteAutoCases.txt / deleteAutoCasesPart2 SOQL queries, so auto-generated
+cases (digests, calendar replies, notifications, ...) can be found in the case sheet itself
+instead of being deleted in Salesforce first.
+
+Each query file is read as
+    WHERE (<field> LIKE '...' OR <field> = '...' OR ...) AND (NOT <field> LIKE '...') ... AND Id != '...'
+i.e. one OR group of predicates that flag a case, plus exclusions that rescue it. A case is
+auto-generated when any query flags it and none of that query's exclusions apply.
+
+Matching follows SOQL: LIKE and = are case-insensitive, % matches any run of characters, _ one
+character, and a backslash escapes the next one. Every field's predicates are compiled once:
+ - no wildcards           -> hash set
+ - 'abc%' / '%abc'        -> one str.startswith / str.endswith tuple
+ - '%abc%'                -> one combined regex of the literals
+ - anything else          -> one combined, anchored regex
+so a case costs a handful of C-level calls however many patterns the files hold.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import re
+
+_PREDICATE_RE = re.compile(r"(NOT\s+)?(\w+)\s*(LIKE|!=|<>|=)\s*'((?:[^'\\]|\\.)*)'", re.IGNORECASE)
+_TAIL_RE = re.compile(r"\b(?:ORDER\s+BY|LIMIT|OFFSET)\b", re.IGNORECASE)
+
+
+# ---------------- LIKE patterns ----------------
+def like_tokens(pattern: str) -> List[str]:
+    """Split a LIKE pattern into literal characters and the wildcards "%" / "_" (escaped ones become literals)."""
+    tokens: List[str] = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            tokens.append("\\" + pattern[i + 1])
+            i += 2
+            continue
+        tokens.append(ch)
+        i += 1
+    return tokens
+
+def like_to_regex(pattern: str) -> str:
+    out = []
+    for tok in like_tokens(pattern.lower()):
+        if tok == "%":
+            out.append(".*")
+        elif tok == "_":
+            out.append(".")
+        else:
+            out.append(re.escape(tok[-1]))
+    return "".join(out)
+
+class LikeMatcher:
+    """Any-of matcher for a list of LIKE patterns (and = values) on one field; values must be lowercased."""
+
+    def __init__(self, likes: Sequence[str] = (), equals: Sequence[str] = ()):
+        self.predicates: List[Tuple[str, str]] = [("LIKE", p) for p in likes] + [("=", v) for v in equals]
+        exact = {v.lower() for v in equals}
+        prefixes: List[str] = []
+        suffixes: List[str] = []
+        contains: List[str] = []
+        regexes: List[str] = []
+        for p in likes:
+            p = p.lower()
+            if "_" in p or "\\" in p:
+                regexes.append(like_to_regex(p))
+                continue
+            parts = p.split("%")
+            if len(parts) == 1:
+                exact.add(p)
+            elif len(parts) == 2 and not parts[1]:
+                prefixes.append(parts[0])
+            elif len(parts) == 2 and not parts[0]:
+                suffixes.append(parts[1])
+            elif len(parts) == 3 and not parts[0] and not parts[2]:
+                contains.append(parts[1])
+            else:
+                regexes.append(like_to_regex(p))
+        self.exact = exact
+        self.prefixes = tuple(prefixes)
+        self.suffixes = tuple(suffixes)
+        self.contains = re.compile("|".join(re.escape(c) for c in sorted(set(contains), key=len, reverse=True)), re.DOTALL) if contains else None
+        self.regex = re.compile("|".join(f"(?:{r})" for r in regexes), re.DOTALL) if regexes else None
+
+    def matches(self, value: str) -> bool:
+        return (value in self.exact
+                or value.startswith(self.prefixes)
+                or value.endswith(self.suffixes)
+                or (self.contains is not None and self.contains.search(value) is not None)
+                or (self.regex is not None and self.regex.fullmatch(value) is not None))
+
+    def which(self, value: str) -> Optional[str]:
+        """First predicate (as written in the query) that matches value; only used for reporting."""
+        for op, p in self.predicates:
+            hit = value == p.lower() if op == "=" else re.fullmatch(like_to_regex(p), value, re.DOTALL) is not None
+            if hit:
+                return f"{op} '{p}'"
+        return None
+
+
+# ---------------- queries ----------------
+class AutoCaseQuery:
+    """One delete query: OR-ed include predicates per field, AND-ed NOT LIKE / != exclusions."""
+
+    def __init__(self, name: str, include: Dict[str, LikeMatcher], exclude: Dict[str, LikeMatcher], excluded_ids: set):
+        self.name = name
+        self.include = include
+        self.exclude = exclude
+        self.excluded_ids = excluded_ids
+
+    @property
+    def fields(self) -> List[str]:
+        return list(dict.fromkeys(list(self.include) + list(self.exclude)))
+
+    def match(self, values: Dict[str, str], case_id: str) -> Optional[str]:
+        """
+        Field whose predicates flag one case, or None. values holds the lowercased values keyed by
+        lowercased field; a field missing from values is NULL, which no LIKE / = matches.
+        """
+        hit_field = next((f for f, m in self.include.items() if f in values and m.matches(values[f])), None)
+        if hit_field is None or case_id in self.excluded_ids:
+            return None
+        if any(f in values and m.matches(values[f]) for f, m in self.exclude.items()):
+            return None
+        return hit_field
+
+def parse_query(text: str, name: str = "") -> AutoCaseQuery:
+    """Parse the WHERE clause of one delete query (see the module docstring for the accepted shape)."""
+    m = re.search(r"\bWHERE\b", text, re.IGNORECASE)
+    if not m:
+        raise ValueError(f"{name or 'query'}: no WHERE clause")
+    where = text[m.end():]
+    tail = _TAIL_RE.search(where)
+    if tail:
+        where = where[:tail.start()]
+    include: Dict[str, Tuple[List[str], List[str]]] = {}
+    exclude: Dict[str, List[str]] = {}
+    excluded_ids = set()
+    for neg, field, op, value in _PREDICATE_RE.findall(where):
+        field, op = field.lower(), op.upper()
+        value = value.replace("\\'", "'")
+        if neg or op in ("!=", "<>"):
+            if field == "id" and op in ("!=", "<>"):
+                excluded_ids.add(value)
+            elif op == "LIKE":
+                exclude.setdefault(field, []).append(value)
+            else:
+                raise ValueError(f"{name or 'query'}: unsupported exclusion {field} {op} '{value}'")
+        else:
+            likes, equals = include.setdefault(field, ([], []))
+            (likes if op == "LIKE" else equals).append(value)
+    if not include:
+        raise ValueError(f"{name or 'query'}: no LIKE / = predicates found")
+    return AutoCaseQuery(
+        name,
+        {f: LikeMatcher(likes, equals) for f, (likes, equals) in include.items()},
+        {f: LikeMatcher(likes) for f, likes in exclude.items()},
+        excluded_ids)
+
+def load_queries(paths: Sequence[Path]) -> List[AutoCaseQuery]:
+    """Parsed queries for the files that exist (missing files are skipped)."""
+    return [parse_query(Path(p).read_text(encoding="utf-8"), Path(p).name) for p in paths if Path(p).exists()]
+
+
+# ---------------- scan ----------------
+def scan(queries: Sequence[AutoCaseQuery], columns: Dict[str, List[str]], ids: List[str]) -> List[str]:
+    """
+    One pass over the cases: columns maps a lowercased SOQL field name (subject, suppliedemail, ...)
+    to that column's values, ids holds the case Ids. Returns, per case, "" or the reason it is
+    auto-generated ("<query file>: <field> <predicate>").
+    """
+    fields = [f for f in dict.fromkeys(f for q in queries for f in q.fields) if f in columns]
+    lowered = [[str(v).lower() for v in columns[f]] for f in fields]
+    reasons: List[str] = []
+    for i, case_id in enumerate(ids):
+        values = {f: col[i] for f, col in zip(fields, lowered)}
+        reason = ""
+        for q in queries:
+            hit_field = q.match(values, case_id)
+            if hit_field is not None:
+                reason = f"{q.name}: {hit_field} {q.include[hit_field].which(values[hit_field])}"
+                break
+        reasons.append(reason)
+    return reasons
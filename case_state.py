@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+case_state.py
+
+SQLite store of per-case results, so a run only re-processes cases that are new or changed since
+the last one (incremental mode of MUSTAAAARD.py).
+
+One row per case Id: a hash of the case's input row, the fingerprint of everything else its
+result depends on (rules, thresholds, allowed labels, lookup exports, label model, ...) and the
+output cells that processing changed, as JSON {column: value}. A stored result is reused when
+both hashes match; applying its cells to the unchanged input row reproduces the processed row.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import sqlite3
+import time
+
+SCHEMA_VERSION = 1
+QUERY_BATCH = 900          # ids per SELECT ... IN (...) (SQLite's default variable limit is 999)
+
+
+def row_hashes(columns: Sequence[str], rows: Iterable[Sequence[object]]) -> List[str]:
+    """sha1 per row over the column names and the row's values as strings."""
+    header = "\x1f".join(map(str, columns)) + "\x1e"
+    return [hashlib.sha1((header + "\x1f".join(map(str, vals))).encode("utf-8")).hexdigest() for vals in rows]
+
+def config_hash(config: Dict[str, object]) -> str:
+    """sha1 of a JSON-able description of the settings a case result depends on."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CaseStateStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is not None and int(row[0]) != SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS cases")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS cases (
+                                 id TEXT PRIMARY KEY,
+                                 input_hash TEXT NOT NULL,
+                                 config_hash TEXT NOT NULL,
+                                 outputs TEXT NOT NULL,
+                                 updated REAL NOT NULL)""")
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def lookup(self, ids: Sequence[str], input_hashes: Sequence[str], cfg_hash: str) -> List[Optional[Dict[str, str]]]:
+        """Stored output cells per case, or None where the case is unknown or its inputs / config changed."""
+        stored: Dict[str, Tuple[str, str, str]] = {}
+        distinct = list(dict.fromkeys(ids))
+        for start in range(0, len(distinct), QUERY_BATCH):
+            batch = distinct[start:start + QUERY_BATCH]
+            cur = self.conn.execute(
+                f"SELECT id, input_hash, config_hash, outputs FROM cases WHERE id IN ({','.join('?' * len(batch))})", batch)
+            for case_id, in_hash, c_hash, outputs in cur:
+                stored[case_id] = (in_hash, c_hash, outputs)
+        out: List[Optional[Dict[str, str]]] = []
+        for case_id, in_hash in zip(ids, input_hashes):
+            hit = stored.get(case_id)
+            out.append(json.loads(hit[2]) if hit and hit[0] == in_hash and hit[1] == cfg_hash else None)
+        return out
+
+    def store(self, ids: Sequence[str], input_hashes: Sequence[str], cfg_hash: str, outputs: Sequence[Dict[str, str]]) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO cases (id, input_hash, config_hash, outputs, updated) VALUES (?, ?, ?, ?, ?)",
+                ((case_id, h, cfg_hash, json.dumps(o, ensure_ascii=False), now)
+                 for case_id, h, o in zip(ids, input_hashes, outputs)))
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+email_text.py
+
+Matching text from email-shaped case fields (Description, Email Summary): the newest message only,
+without quoted replies / forwarded history, signature blocks, "Sent from my ..." lines and legal
+or unsubscribe footers, capped to a window of characters. Matching names in the case text
+(partial_token_set_ratio against the account / contact candidates, sentence-transformers, which
+truncates long inputs anyway) and the keyword rules then cost at most the window per field,
+however long the thread is.
+
+Only the text MUSTAAAARD.py matches and classifies on is trimmed; the case cells are written out
+as they were.
+"""
+from typing import Optional
+import re
+
+WINDOW_CHARS = 1000            # characters kept per field (0 = no cap)
+SIGNATURE_KEEP_LINES = 2       # lines kept after a sign-off ("Thanks,", "Best regards," ...): usually name and company
+
+# a line that starts an earlier message: everything from it on is history
+_HISTORY_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"-{2,}[ \t]*(?:Original Message|Forwarded message)[ \t]*-{2,}"
+    r"|Begin forwarded message:"
+    r"|_{10,}[ \t]*$"                                           # Outlook separator
+    r"|On\b[^\n]{0,200}(?:\n[^\n]{0,200})?\bwrote:[ \t]*$"     # Gmail / Apple Mail, may wrap
+    r"|From:[ \t][^\n]+(?:\n[^\n]*){0,3}\n[ \t]*(?:Sent|Date):[ \t]"   # Outlook header block
+    r")",
+    re.IGNORECASE | re.MULTILINE)
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>[^\n]*\n?", re.MULTILINE)
+_MOBILE_LINE_RE = re.compile(r"^[ \t]*(?:Sent from my\b|Sent from (?:Mail|Outlook)\b|Get Outlook for\b)[^\n]*\n?",
+                             re.IGNORECASE | re.MULTILINE)
+_SIG_DELIMITER_RE = re.compile(r"^-- ?$", re.MULTILINE)
+_SIGN_OFF_RE = re.compile(
+    r"^[ \t]*(?:thanks|thank you|many thanks|thanks again|thx|best|best regards|kind regards|warm regards|"
+    r"regards|sincerely|cheers|respectfully|all the best)[ \t,.!-]*$",
+    re.IGNORECASE | re.MULTILINE)
+_FOOTER_RE = re.compile(
+    r"^[ \t*]*(?:CONFIDENTIALITY NOTICE|DISCLAIMER\b"
+    r"|This (?:e-?mail|message|communication)\b[^\n]{0,80}\b(?:confidential|privileged|intended (?:solely|only))"
+    r"|If you (?:are not the intended recipient|have received this (?:e-?mail|message|communication) in error)"
+    r"|Please consider the environment|To unsubscribe|Unsubscribe\b)",
+    re.IGNORECASE | re.MULTILINE)
+_WORD_RE = re.compile(r"[A-Za-z0-9]")
+
+
+def _cut(text: str, pattern: re.Pattern) -> str:
+    """text up to the first match with words between it and the previous match (a bare forward keeps the forwarded message)."""
+    floor = 0
+    for m in pattern.finditer(text):
+        if _WORD_RE.search(text, floor, m.start()):
+            return text[:m.start()]
+        floor = m.end()
+    return text
+
+def strip_email(text: str) -> str:
+    """The newest message of an email body: no quoted history, signature block beyond the name lines or footer."""
+    if not text:
+        return ""
+    text = text.replace("_x000D_", "").replace("\r\n", "\n").replace("\r", "\n")
+    text = _cut(text, _HISTORY_RE)
+    text = _QUOTED_LINE_RE.sub("", text)
+    text = _MOBILE_LINE_RE.sub("", text)
+    text = _cut(text, _SIG_DELIMITER_RE)
+    text = _cut(text, _FOOTER_RE)
+    sign_off: Optional[re.Match] = None
+    for sign_off in _SIGN_OFF_RE.finditer(text):
+        pass
+    if sign_off is not None and _WORD_RE.search(text, 0, sign_off.start()):
+        tail = [ln for ln in text[sign_off.end():].split("\n") if ln.strip()]
+        text = text[:sign_off.start()] + "\n".join(tail[:SIGNATURE_KEEP_LINES])
+    return text.strip()
+
+def window(text: str, max_chars: int = WINDOW_CHARS) -> str:
+    """The first max_chars characters, cut back to the last word boundary when there is one nearby."""
+    if not max_chars or len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    space = max(head.rfind(" ", max_chars * 4 // 5), head.rfind("\n", max_chars * 4 // 5))
+    return head[:space] if space > 0 else head
+
+def matching_text(text: str, strip: bool = True, max_chars: int = WINDOW_CHARS) -> str:
+    return window(strip_email(text) if strip else text, max_chars)
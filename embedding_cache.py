@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+embedding_cache.py
+
+Persistent on-disk store for sentence-transformers embeddings so repeat runs only encode new strings.
+
+Layout (one folder per model, under the cache dir):
+ - vectors.f32  -> memory-mapped float32 matrix, one L2-normalized embedding per row
+ - index.json   -> {"dim", "clock", "entries": {key: [row, last_used]}}
+
+Keys are sha1(model name + text), where text is exactly what was encoded (case texts and
+account/contact names are already normalized before they get here).
+The store is capped at max_bytes of vectors; when it is full the least recently used rows are
+evicted and their slots reused. Rows used by the batch being looked up are never evicted for it.
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+MIN_ROWS = 1024  # initial allocation; the file doubles from here up to the byte cap
+
+
+def text_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: Path, model_name: str, max_bytes: int = 512 * 1024 * 1024):
+        self.model_name = model_name
+        self.max_bytes = int(max_bytes)
+        self.dir = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.dim: Optional[int] = None
+        self.clock = 0
+        self.entries: Dict[str, List[int]] = {}   # key -> [row, last_used]
+        self.free_rows: List[int] = []
+        self.vectors: Optional[np.memmap] = None
+        self.hits = self.misses = self.evicted = 0
+        self._load()
+
+    # ---------------- persistence ----------------
+    def _load(self) -> None:
+        index_path = self.dir / INDEX_FILE
+        vec_path = self.dir / VECTORS_FILE
+        if not index_path.exists() or not vec_path.exists():
+            return
+        try:
+            meta = json.loads(index_path.read_text(encoding="utf-8"))
+            dim = int(meta["dim"])
+            rows = vec_path.stat().st_size // (dim * 4)
+            entries = {k: [int(v[0]), int(v[1])] for k, v in meta["entries"].items()}
+            if any(r >= rows for r, _ in entries.values()):
+                raise ValueError("index points past the end of vectors.f32")
+        except Exception as e:
+            print(f"Warning: embedding cache at {self.dir} is unreadable ({e}); starting empty.")
+            return
+        self.dim = dim
+        self.clock = int(meta.get("clock", 0))
+        self.entries = entries
+        self.vectors = np.memmap(vec_path, dtype=np.float32, mode="r+", shape=(rows, dim))
+        used = {r for r, _ in entries.values()}
+        self.free_rows = [r for r in range(rows - 1, -1, -1) if r not in used]
+
+    def save(self) -> None:
+        if self.vectors is None:
+            return
+        self.vectors.flush()
+        tmp = self.dir / (INDEX_FILE + ".tmp")
+        tmp.write_text(json.dumps({"dim": self.dim, "clock": self.clock, "model": self.model_name,
+                                   "entries": self.entries}), encoding="utf-8")
+        os.replace(tmp, self.dir / INDEX_FILE)
+
+    # ---------------- size accounting ----------------
+    @property
+    def capacity(self) -> int:
+        if not self.dim:
+            return 0
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def stats(self) -> Dict[str, int]:
+        row_bytes = (self.dim or 0) * 4
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "bytes_used": len(self.entries) * row_bytes,
+            "file_bytes": 0 if self.vectors is None else self.vectors.shape[0] * row_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+    def _grow(self, needed_rows: int) -> int:
+        """
+        Make room for needed_rows more vectors: enlarge the file (up to the cap), then evict LRU rows.
+        Rows read or written since the last lookup are never evicted; returns the rows now free, which
+        can be fewer than needed_rows when the rest of the cache is in use by the current batch.
+        """
+        rows = 0 if self.vectors is None else self.vectors.shape[0]
+        if len(self.free_rows) < needed_rows and rows < self.capacity:
+            new_rows = min(self.capacity, max(MIN_ROWS, rows * 2, rows + needed_rows))
+            self.dir.mkdir(parents=True, exist_ok=True)
+            vec_path = self.dir / VECTORS_FILE
+            if self.vectors is not None:
+                self.vectors.flush()
+                del self.vectors
+            with open(vec_path, "ab") as fh:
+                fh.truncate(new_rows * self.dim * 4)
+            self.vectors = np.memmap(vec_path, dtype=np.float32, mode="r+", shape=(new_rows, self.dim))
+            self.free_rows.extend(range(new_rows - 1, rows - 1, -1))
+        short = needed_rows - len(self.free_rows)
+        if short > 0:
+            # least recently used first; rows touched in this batch carry the current clock and stay
+            stale = [kv for kv in self.entries.items() if kv[1][1] < self.clock]
+            victims = sorted(stale, key=lambda kv: kv[1][1])[:short]
+            for key, (row, _) in victims:
+                del self.entries[key]
+                self.free_rows.append(row)
+            self.evicted += len(victims)
+        return min(needed_rows, len(self.free_rows))
+
+    # ---------------- lookup / store ----------------
+    def lookup(self, texts: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """Return ({position: vector} for cached texts, [positions of texts that are not cached])."""
+        self.clock += 1
+        found: Dict[int, np.ndarray] = {}
+        missing: List[int] = []
+        for i, t in enumerate(texts):
+            ent = self.entries.get(text_key(self.model_name, t))
+            if ent is None or self.vectors is None:
+                missing.append(i)
+                continue
+            ent[1] = self.clock
+            # a copy: the row may be evicted and overwritten by a store() before the caller reads it
+            found[i] = np.array(self.vectors[ent[0]])
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def store(self, texts: List[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"embedding dim {vectors.shape[1]} does not match cache dim {self.dim}")
+        pending = {}
+        for t, v in zip(texts, vectors):
+            key = text_key(self.model_name, t)
+            if key not in self.entries:
+                pending[key] = v
+        # a batch larger than the whole cache only keeps what fits
+        keys = list(pending)[: self.capacity]
+        if not keys:
+            return
+        for key in keys[: self._grow(len(keys))]:
+            row = self.free_rows.pop()
+            self.vectors[row] = pending[key]
+            self.entries[key] = [row, self.clock]
+
+    def get_or_encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Matrix of embeddings for texts (row i = texts[i]). Only texts missing from the cache are
+        passed (deduplicated) to encode_fn, which must return L2-normalized float32 rows.
+        """
+        found, missing = self.lookup(texts)
+        new_vecs: Dict[str, np.ndarray] = {}
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            enc = encode_fn(unique)
+            if enc is None:
+                return None
+            enc = np.asarray(enc, dtype=np.float32)
+            self.store(unique, enc)
+            new_vecs = dict(zip(unique, enc))
+        if not texts:
+            return None
+        dim = self.dim or next(iter(new_vecs.values())).shape[0]
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, v in found.items():
+            out[i] = v
+        for i in missing:
+            out[i] = new_vecs[texts[i]]
+        return out
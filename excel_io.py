@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+excel_io.py
+
+Case workbook access through openpyxl's read-only (streaming) mode. Only the sheet being processed
+is turned into DataFrames, a chunk of rows at a time; every other sheet is left unparsed and
+copied cell by cell into the output workbooks (write-only mode), so large side sheets cost
+neither pandas parsing nor memory.
+
+Cells come out as the same strings as pd.read_excel(dtype=str).fillna(""): empty and error cells
+as "", pandas' default NA strings ("NA", "N/A", "null", ...) in data cells as "", whole-number
+floats without ".0", header gaps as "Unnamed: <i>", repeated headers as "<name>.1", ... and
+trailing empty rows dropped.
+"""
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.styles import Alignment, Border, Font, Side
+
+DEFAULT_SHEET = "Full Acc and Contact"
+CHUNK_ROWS = 5000
+# pandas' default na_values, which read_excel blanks in data cells (exact match, headers untouched)
+NA_STRINGS = frozenset({"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                        "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"})
+
+
+# ---------------- reading ----------------
+def pick_sheet(sheetnames: Sequence[str], sheet_name: Optional[str] = None) -> str:
+    """sheet_name if given, else "Full Acc and Contact" if present, else the first sheet."""
+    if sheet_name is not None:
+        if sheet_name not in sheetnames:
+            raise ValueError(f"sheet {sheet_name!r} not found; sheets: {list(sheetnames)}")
+        return sheet_name
+    return DEFAULT_SHEET if DEFAULT_SHEET in sheetnames else sheetnames[0]
+
+def _plain_str(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    if isinstance(v, str) and v in ERROR_CODES:
+        return ""
+    return str(v)
+
+def cell_str(v) -> str:
+    """A data cell as read_excel's string; text equal to one of pandas' default NA strings is blank."""
+    if isinstance(v, str) and v in NA_STRINGS:
+        return ""
+    return _plain_str(v)
+
+def header_names(row: Sequence[object]) -> List[str]:
+    names: List[str] = []
+    seen: dict = {}
+    for i, v in enumerate(row):
+        name = _plain_str(v) or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def iter_sheet_chunks(path: Path, sheet_name: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    The sheet as string DataFrames of up to chunk_rows rows; the index continues across chunks
+    (0, 1, 2, ... over the whole sheet). A row wider than the header adds "Unnamed: <i>" columns
+    from that chunk on.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from _sheet_chunks(wb[pick_sheet(wb.sheetnames, sheet_name)], chunk_rows)
+    finally:
+        wb.close()
+
+def _sheet_chunks(ws, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    rows = ws.iter_rows(values_only=True)
+    header_row = list(next(rows, ()))
+    while header_row and header_row[-1] is None:
+        header_row.pop()
+    header = header_names(header_row)
+    chunk: List[List[str]] = []
+    blank_run = 0     # empty rows are only kept once a non-empty row follows them
+    start = 0
+    for row in rows:
+        vals = [cell_str(v) for v in row]
+        while vals and not vals[-1]:
+            vals.pop()
+        if not vals:
+            blank_run += 1
+            continue
+        if len(vals) > len(header):
+            header = header + [f"Unnamed: {i}" for i in range(len(header), len(vals))]
+        chunk.extend([[]] * blank_run)
+        blank_run = 0
+        chunk.append(vals)
+        if len(chunk) >= chunk_rows:
+            yield _frame(chunk, header, start)
+            start += len(chunk)
+            chunk = []
+    if chunk or start == 0:
+        yield _frame(chunk, header, start)
+
+def _frame(rows: List[List[str]], header: List[str], start: int) -> pd.DataFrame:
+    width = len(header)
+    padded = [r + [""] * (width - len(r)) for r in rows]
+    return pd.DataFrame(padded, columns=header, index=pd.RangeIndex(start, start + len(rows)), dtype=str)
+
+def read_sheet(path: Path, sheet_name: Optional[str] = None) -> Tuple[str, pd.DataFrame]:
+    """(sheet name, whole sheet as one string DataFrame) for the chosen sheet only."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        name = pick_sheet(wb.sheetnames, sheet_name)
+        chunks = list(_sheet_chunks(wb[name], CHUNK_ROWS))
+    finally:
+        wb.close()
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks).fillna("")
+    return name, df
+
+
+# ---------------- writing ----------------
+# same header look as DataFrame.to_excel
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin"))
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+def header_cells(ws, names: Sequence[object]) -> List[WriteOnlyCell]:
+    cells = []
+    for name in names:
+        cell = WriteOnlyCell(ws, value=str(name))
+        cell.font, cell.border, cell.alignment = _HEADER_FONT, _HEADER_BORDER, _HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+def write_workbook(out_path: Path, source: Path, sheet_name: str, df: pd.DataFrame) -> None:
+    """Copy of the source workbook with sheet_name replaced by df; the other sheets are streamed across unparsed."""
+    out_wb = Workbook(write_only=True)
+    src = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sname in src.sheetnames:
+            ws = out_wb.create_sheet(sname)
+            if sname != sheet_name:
+                for row in src[sname].iter_rows(values_only=True):
+                    ws.append(row)
+                continue
+            ws.append(header_cells(ws, df.columns))
+            for row in df.itertuples(index=False, name=None):
+                ws.append(row)
+    finally:
+        src.close()
+    out_wb.save(out_path)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+label_model.py
+
+Hashed-feature multinomial Naive Bayes for Type / Sub-Type / Category, trained on cases whose
+labels were set by hand (scripts/train_label_model.py) and used by MUSTAAAARD.py as a label tier
+between the keyword rules and the semantic / fuzzy fallback.
+
+Features are word unigrams and bigrams of the normalized summary / subject / description, hashed
+(crc32) into 2**bits buckets and counted 3 / 2 / 1 times like the keyword rules. A sheet becomes one
+CSR matrix (indptr, indices, data) and is scored for all three fields at once against a single
+weight matrix whose columns are the labels of every field side by side.
+
+Only buckets seen in training get a weight row. In multinomial NB a bucket with no training counts
+scores log(alpha / (N_c + alpha * V)) for class c, so the score is split as
+    prior_c + total_count * unseen_c + sum(count_f * w_fc),   w_fc = log((n_fc + alpha) / alpha)
+and unseen buckets only enter through the row's total count.
+
+Stored as one .npz: fields, labels_<k>, feature_ids, weights, unseen, prior, bits.
+"""
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import zlib
+
+import numpy as np
+
+FEATURE_BITS = 20
+FIELD_WEIGHTS = (3, 2, 1)      # summary, subject, description (same as the keyword rules)
+PREDICT_BLOCK_ROWS = 8192      # rows scored per block; bounds the (nonzeros x labels) temporary
+
+SparseRows = Tuple[np.ndarray, np.ndarray, np.ndarray]  # CSR: indptr, indices (sorted per row), data
+
+
+# ---------------- features ----------------
+def text_features(fields: Sequence[str], bits: int = FEATURE_BITS, weights: Sequence[int] = FIELD_WEIGHTS) -> dict:
+    """{bucket: weighted count} for one case; fields are already normalized (normalize_text)."""
+    mask = (1 << bits) - 1
+    counts: dict = {}
+    for text, w in zip(fields, weights):
+        toks = text.split()
+        for gram in toks + [a + " " + b for a, b in zip(toks, toks[1:])]:
+            h = zlib.crc32(gram.encode("utf-8")) & mask
+            counts[h] = counts.get(h, 0) + w
+    return counts
+
+def featurize(rows: Sequence[Sequence[str]], bits: int = FEATURE_BITS) -> SparseRows:
+    """CSR matrix of text_features for (summary, subject, description) rows."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indices: List[int] = []
+    data: List[float] = []
+    for i, fields in enumerate(rows):
+        counts = text_features(fields, bits)
+        keys = sorted(counts)
+        indices.extend(keys)
+        data.extend(counts[k] for k in keys)
+        indptr[i + 1] = len(indices)
+    return indptr, np.asarray(indices, dtype=np.int64), np.asarray(data, dtype=np.float32)
+
+def _row_sums(indptr: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Per-row sums of CSR-aligned values (values may be 1-D or rows x k); empty rows give 0."""
+    out = np.zeros((len(indptr) - 1,) + values.shape[1:], dtype=np.float64)
+    nonempty = np.flatnonzero(np.diff(indptr))
+    if len(nonempty):
+        out[nonempty] = np.add.reduceat(values, indptr[nonempty], axis=0)
+    return out
+
+
+# ---------------- model ----------------
+class LabelModel:
+    def __init__(self, fields: List[str], labels: List[List[str]], feature_ids: np.ndarray, weights: np.ndarray,
+                 unseen: np.ndarray, prior: np.ndarray, bits: int = FEATURE_BITS):
+        self.fields = fields
+        self.labels = labels
+        self.feature_ids = feature_ids
+        self.weights = weights
+        self.unseen = unseen
+        self.prior = prior
+        self.bits = bits
+        self.offsets = np.concatenate([[0], np.cumsum([len(l) for l in labels])]).astype(np.int64)
+
+    @classmethod
+    def fit(cls, X: SparseRows, targets: List[List[str]], fields: List[str], alpha: float = 1.0, bits: int = FEATURE_BITS) -> "LabelModel":
+        """
+        targets[k][i] is the label of row i for fields[k] ("" = unlabelled, row skipped for that field).
+        alpha is the additive (Laplace) smoothing.
+        """
+        indptr, indices, data = X
+        if not len(indices):
+            raise ValueError("no case text to train on")
+        feature_ids = np.unique(indices)
+        col = np.searchsorted(feature_ids, indices)
+        row_of_nz = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        vocab = float(1 << bits)
+        labels, weights, unseen, prior = [], [], [], []
+        for k, field in enumerate(fields):
+            classes = sorted({t for t in targets[k] if t})
+            if not classes:
+                raise ValueError(f"no labelled rows for {field}")
+            class_idx = {c: j for j, c in enumerate(classes)}
+            y = np.array([class_idx.get(t, -1) for t in targets[k]], dtype=np.int64)
+            nz = y[row_of_nz] >= 0
+            counts = np.zeros((len(feature_ids), len(classes)), dtype=np.float64)
+            np.add.at(counts, (col[nz], y[row_of_nz[nz]]), data[nz])
+            denom = np.log(counts.sum(axis=0) + alpha * vocab)
+            labels.append(classes)
+            weights.append(np.log1p(counts / alpha))
+            unseen.append(np.log(alpha) - denom)
+            prior.append(np.log(np.bincount(y[y >= 0], minlength=len(classes)) / float((y >= 0).sum())))
+        return cls(list(fields), labels, feature_ids, np.hstack(weights).astype(np.float32),
+                   np.concatenate(unseen), np.concatenate(prior), bits)
+
+    def decision_scores(self, X: SparseRows) -> np.ndarray:
+        """Joint log-likelihood scores, rows x (labels of every field)."""
+        indptr, indices, data = X
+        n = len(indptr) - 1
+        scores = np.empty((n, len(self.prior)), dtype=np.float64)
+        for start in range(0, n, PREDICT_BLOCK_ROWS):
+            stop = min(n, start + PREDICT_BLOCK_ROWS)
+            lo, hi = indptr[start], indptr[stop]
+            block_ptr = indptr[start:stop + 1] - lo
+            idx, val = indices[lo:hi], data[lo:hi]
+            col = np.minimum(np.searchsorted(self.feature_ids, idx), len(self.feature_ids) - 1)
+            seen = self.feature_ids[col] == idx
+            # unseen buckets contribute nothing to the sparse product, only to the total count
+            contrib = self.weights[col] * (val * seen)[:, None]
+            scores[start:stop] = (self.prior + _row_sums(block_ptr, val)[:, None] * self.unseen
+                                  + _row_sums(block_ptr, contrib))
+        return scores
+
+    def predict(self, X: SparseRows) -> List[Tuple[List[str], np.ndarray]]:
+        """Per field: (label per row, posterior probability of that label per row)."""
+        scores = self.decision_scores(X)
+        out = []
+        for k, labels in enumerate(self.labels):
+            s = scores[:, self.offsets[k]:self.offsets[k + 1]]
+            best = np.argmax(s, axis=1)
+            # softmax at the argmax: 1 / sum(exp(s - max))
+            conf = 1.0 / np.exp(s - s[np.arange(len(s)), best][:, None]).sum(axis=1)
+            out.append(([labels[j] for j in best], conf))
+        return out
+
+    # ---------------- persistence ----------------
+    def save(self, path: Path) -> None:
+        arrays = {f"labels_{k}": np.array(l) for k, l in enumerate(self.labels)}
+        with open(path, "wb") as fh:
+            np.savez(fh, fields=np.array(self.fields), feature_ids=self.feature_ids, weights=self.weights,
+                     unseen=self.unseen, prior=self.prior, bits=np.array(self.bits), **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "LabelModel":
+        with np.load(path, allow_pickle=False) as z:
+            fields = z["fields"].tolist()
+            return cls(fields, [z[f"labels_{k}"].tolist() for k in range(len(fields))], z["feature_ids"],
+                       z["weights"], z["unseen"], z["prior"], int(z["bits"]))
+
+def load_model(path: Path) -> Optional[LabelModel]:
+    """The model at path, or None if there is none (or it cannot be read)."""
+    if not Path(path).exists():
+        return None
+    try:
+        return LabelModel.load(path)
+    except Exception as e:
+        print(f"Warning: label model at {path} is unreadable ({e}); not used.")
+        return None
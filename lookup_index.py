@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+lookup_index.py
+
+Compiled, memory-mapped form of the Accounts / Contacts lookups used by MUSTAAAARD.py, so a large
+export is parsed and normalized once and later runs start in constant time.
+
+Layout (one folder per export, under the index dir):
+ - meta.json            -> {"version", "fields", "size", "source": {"size", "mtime_ns", "sha1"}}
+ - choices_*.npy        -> normalized names in first-seen order (the fuzzy choices) + sorted copy for lookups
+ - rec_*.npy            -> records per name: Id, raw name (and AccountId for contacts), CSR by name
+ - tokens_*.npy / grams_*.npy -> candidate-blocking postings (build_candidate_index), CSR by sorted key
+
+Strings are stored as one UTF-8 blob plus int64 offsets. Key lookups binary-search a sorted
+fixed-width bytes array (np.searchsorted), so nothing is decoded until it is asked for.
+The index is reused while the export's size and mtime are unchanged; if they differ, the file's
+sha1 decides (a touched but identical export keeps its index). meta.json is written last, so a
+half-written folder is never loaded.
+"""
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+# ---------------- fingerprint ----------------
+def file_sha1(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_fingerprint(path: Path, with_hash: bool = True) -> Dict[str, object]:
+    st = Path(path).stat()
+    fp: Dict[str, object] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        fp["sha1"] = file_sha1(path)
+    return fp
+
+
+# ---------------- memory-mapped views ----------------
+class StringTable(Sequence):
+    """Read-only list of strings backed by a UTF-8 blob and an offsets array."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+class SortedKeys:
+    """Binary search over a sorted fixed-width bytes array; find() returns the sorted position or None."""
+
+    def __init__(self, keys: np.ndarray):
+        self.keys = keys
+        self.width = keys.dtype.itemsize
+
+    def find(self, key: str) -> Optional[int]:
+        b = key.encode("utf-8")
+        if not b or len(b) > self.width or not len(self.keys):
+            return None
+        i = int(np.searchsorted(self.keys, b))
+        if i < len(self.keys) and self.keys[i] == b:
+            return i
+        return None
+
+class NormMapView(Mapping):
+    """norm -> [(Id, raw name[, AccountId]), ...], like the dicts built by build_account_maps / build_contact_maps."""
+
+    def __init__(self, choices: StringTable, keys: SortedKeys, order: np.ndarray, rec_start: np.ndarray, fields: List[StringTable]):
+        self.choices = choices
+        self.keys = keys
+        self.order = order
+        self.rec_start = rec_start
+        self.fields = fields
+
+    def _slot(self, key) -> Optional[int]:
+        if not isinstance(key, str):
+            return None
+        pos = self.keys.find(key)
+        return None if pos is None else int(self.order[pos])
+
+    def __contains__(self, key) -> bool:
+        return self._slot(key) is not None
+
+    def __getitem__(self, key):
+        slot = self._slot(key)
+        if slot is None:
+            raise KeyError(key)
+        return [tuple(f[j] for f in self.fields) for j in range(int(self.rec_start[slot]), int(self.rec_start[slot + 1]))]
+
+    def __iter__(self):
+        return iter(self.choices)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+class PostingView(Mapping):
+    """
+    token / n-gram -> ascending int32 array of choice positions.
+    Blocking looks up the same grams for every query, so resolved slices are memoized
+    (bounded by the index vocabulary plus the distinct misses seen).
+    """
+    MEMO_MAX = 1_000_000
+
+    def __init__(self, keys: SortedKeys, post_start: np.ndarray, postings: np.ndarray):
+        self.keys = keys
+        self.post_start = post_start
+        self.postings = postings
+        self._memo: Dict[str, Optional[np.ndarray]] = {}
+
+    def get(self, key, default=None):
+        try:
+            hit = self._memo[key]
+        except KeyError:
+            pos = self.keys.find(key) if isinstance(key, str) else None
+            hit = None if pos is None else np.asarray(self.postings[self.post_start[pos]:self.post_start[pos + 1]])
+            if len(self._memo) >= self.MEMO_MAX:
+                self._memo.clear()
+            self._memo[key] = hit
+        return default if hit is None else hit
+
+    def __getitem__(self, key):
+        hit = self.get(key)
+        if hit is None:
+            raise KeyError(key)
+        return hit
+
+    def __iter__(self):
+        for k in self.keys.keys:
+            yield k.decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.keys.keys)
+
+
+# ---------------- build / save ----------------
+def _string_arrays(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    enc = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(enc) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in enc], dtype=np.int64, out=offsets[1:])
+    return np.frombuffer(b"".join(enc), dtype=np.uint8), offsets
+
+def _sorted_keys(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    enc = [s.encode("utf-8") for s in strings]
+    width = max((len(b) for b in enc), default=1) or 1
+    arr = np.array(enc, dtype=f"S{width}")
+    order = np.argsort(arr, kind="stable")
+    return arr[order], order.astype(np.int32)
+
+def _postings_arrays(postings: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    keys = list(postings)
+    sorted_keys, order = _sorted_keys(keys)
+    lists = [np.asarray(postings[keys[i]], dtype=np.int32) for i in order.tolist()]
+    post_start = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in lists], dtype=np.int64, out=post_start[1:])
+    flat = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int32)
+    return sorted_keys, post_start, flat
+
+def save(store_dir: Path, source: Path, norm_map: Dict[str, List[tuple]], choices: List[str], candidate_index: Dict[str, object]) -> None:
+    """Write the index for source; norm_map / choices / candidate_index are the in-memory structures."""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    meta_path = store_dir / META_FILE
+    if meta_path.exists():
+        meta_path.unlink()
+    fields = len(norm_map[choices[0]][0]) if choices else 0
+    arrays: Dict[str, np.ndarray] = {}
+    arrays["choices_blob"], arrays["choices_off"] = _string_arrays(choices)
+    arrays["choices_sorted"], arrays["choices_order"] = _sorted_keys(choices)
+    records = [rec for norm in choices for rec in norm_map[norm]]
+    rec_start = np.zeros(len(choices) + 1, dtype=np.int64)
+    np.cumsum([len(norm_map[norm]) for norm in choices], dtype=np.int64, out=rec_start[1:])
+    arrays["rec_start"] = rec_start
+    for f in range(fields):
+        arrays[f"rec_{f}_blob"], arrays[f"rec_{f}_off"] = _string_arrays([r[f] for r in records])
+    for name in ("tokens", "grams"):
+        arrays[f"{name}_sorted"], arrays[f"{name}_start"], arrays[f"{name}_post"] = _postings_arrays(candidate_index[name])
+    for name, arr in arrays.items():
+        np.save(store_dir / f"{name}.npy", arr)
+    meta = {"version": FORMAT_VERSION, "fields": fields, "size": len(choices), "source": file_fingerprint(source)}
+    tmp = store_dir / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, meta_path)
+
+
+# ---------------- load ----------------
+def _is_current(store_dir: Path, source: Path, meta: Dict[str, object]) -> bool:
+    if meta.get("version") != FORMAT_VERSION:
+        return False
+    src = meta.get("source", {})
+    now = file_fingerprint(source, with_hash=False)
+    if src.get("size") != now["size"]:
+        return False
+    if src.get("mtime_ns") == now["mtime_ns"]:
+        return True
+    # same size, new mtime: only the content hash can tell
+    if src.get("sha1") != file_sha1(source):
+        return False
+    meta["source"] = dict(src, mtime_ns=now["mtime_ns"])
+    tmp = store_dir / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, store_dir / META_FILE)
+    return True
+
+def load(store_dir: Path, source: Path) -> Optional[Tuple[NormMapView, StringTable, Dict[str, object]]]:
+    """(norm_map, choices, candidate index without max_posting) for source, or None if missing / stale."""
+    store_dir = Path(store_dir)
+    meta_path = store_dir / META_FILE
+    if not meta_path.exists() or not Path(source).exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if not _is_current(store_dir, Path(source), meta):
+            return None
+
+        def arr(name: str) -> np.ndarray:
+            return np.load(store_dir / f"{name}.npy", mmap_mode="r")
+
+        choices = StringTable(arr("choices_blob"), arr("choices_off"))
+        fields = [StringTable(arr(f"rec_{f}_blob"), arr(f"rec_{f}_off")) for f in range(int(meta["fields"]))]
+        norm_map = NormMapView(choices, SortedKeys(arr("choices_sorted")), arr("choices_order"), arr("rec_start"), fields)
+        index = {"size": len(choices)}
+        for name in ("tokens", "grams"):
+            index[name] = PostingView(SortedKeys(arr(f"{name}_sorted")), arr(f"{name}_start"), arr(f"{name}_post"))
+    except Exception as e:
+        print(f"Warning: lookup index at {store_dir} is unreadable ({e}); rebuilding.")
+        return None
+    return norm_map, choices, index
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Synthetic performance benchmark for MUSTAAAARD.py and scripts/map_ids_for_TESTME.py. Generates
+realistic Accounts / Contacts exports and a TESTME case workbook at each scale, runs both
+pipelines on them and compares the wall time of every stage with the stored baseline. Runs
+offline: no Salesforce org and no model downloads (the semantic tier is off unless --semantic).
+
+Example:
+  python scripts/benchmark.py                                  # 10k and 100k cases
+  python scripts/benchmark.py --scales 10k,100k,1M --update-baseline
+
+The generated data mimics what the exports hold: company names with and without the suffixes of
+COMMON_COMPANY_SUFFIXES, misspelt and blank account names (named in the description instead),
+"Last, First" contacts, keyword-bearing subjects and templated auto-generated cases built from
+the deleteAutoCases queries. It is generated once per scale / seed into --data-dir and reused.
+
+Every pipeline runs cold in its own process (no embedding cache, lookup index, table cache or
+case state from an earlier run). MUSTAAAARD.py's stages come from its run report;
+map_ids_for_TESTME.py has no timing of its own, so its stages are cut at its progress messages
+(load, index build) and around its workbook write (match, output).
+
+Baselines are per machine: after a deliberate change (or on a new machine) re-record them with
+--update-baseline. Each stored result carries the settings it was recorded with (CLUSTER_CASES,
+STRIP_EMAIL_TEXT, TEXT_WINDOW_CHARS, AUTO_CASE_ACTION, BLOCKING_TOP_K, BLOCKING_MAX_POSTING,
+--workers, --semantic); a result recorded with other settings is shown but not compared. A stage counts as a regression when it takes more than --tolerance longer
+than its baseline and at least MIN_SLOWDOWN_SECONDS more (short stages are too noisy to compare);
+the exit code is then 1.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse
+import builtins
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import runpy
+import subprocess
+import sys
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import MUSTAAAARD as engine  # noqa: E402
+import excel_io  # noqa: E402
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+TESTME_SCRIPT = SCRIPTS_DIR / "map_ids_for_TESTME.py"
+BASELINE_JSON = SCRIPTS_DIR / "benchmark_baseline.json"
+DATA_DIR = engine.BASE_DIR / "benchmark_data"
+
+DEFAULT_SCALES = "10k,100k"
+TARGETS = ("engine", "testme")
+DEFAULT_TOLERANCE = 0.25       # fraction slower than the baseline that counts as a regression
+MIN_STAGE_SECONDS = 0.5        # stages faster than this in the baseline are not compared
+MIN_SLOWDOWN_SECONDS = 1.0     # nor slowdowns smaller than this (timer noise on short stages)
+GENERATOR_VERSION = 1          # bump when the generated data changes, so cached data sets are rebuilt
+
+CASES_PER_ACCOUNT = 20
+CASES_PER_CONTACT = 4
+AUTO_CASE_SHARE = 0.10         # templated auto-generated cases
+PREFILLED_SHARE = 0.05         # cases that already have AccountId / ContactId / labels
+
+# ---------------- Synthetic data ----------------
+COMPANY_WORDS_A = [
+    "Summit", "Harbor", "Granite", "Pioneer", "Cedar", "Atlas", "Beacon", "Sterling", "Evergreen", "Redwood",
+    "Northern", "Coastal", "Liberty", "Silver", "Golden", "Prairie", "Riverside", "Lakeside", "Keystone", "Frontier",
+    "Blue Ridge", "Ironwood", "Oakmont", "Westfield", "Highland", "Maple", "Crescent", "Bright", "Union", "Pacific",
+]
+COMPANY_WORDS_B = [
+    "Motors", "Logistics", "Dental", "Realty", "Foods", "Builders", "Capital", "Health", "Legal", "Auto Group",
+    "Insurance", "Roofing", "Supply", "Partners", "Energy", "Farms", "Imaging", "Labs", "Media", "Plumbing",
+    "Transport", "Electric", "Holdings", "Ventures", "Outfitters", "Pharmacy", "Marine", "Textiles", "Analytics", "Design",
+]
+COMPANY_WORDS_C = ["", "of Texas", "West", "East", "Services", "Solutions", "Systems", "International", "Associates", "Group"]
+UNKNOWN_COMPANY_WORDS = ["Nimbus", "Quartzline", "Vortexa", "Zephyrine", "Obsidian", "Tandem", "Kestrel", "Halcyon"]
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+    "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Sandra", "Mark", "Ashley", "Steven", "Emily",
+    "Andrew", "Maria", "Kevin", "Michelle", "Brian", "Amanda", "Jose", "Melissa", "Wei", "Priya",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "O'Brien",
+    "Patel", "Chen", "Kowalski", "Schmidt", "Rossi", "Murphy", "Cohen", "Silva", "Novak", "Fischer",
+]
+SUBJECT_TEMPLATES = [
+    "{kw} not working since this morning", "Question about {kw}", "RE: {kw} follow-up", "Need help with {kw}",
+    "{kw} - urgent", "Request: {kw} for {company}", "Issue with {kw} on our account", "{kw}", "Following up",
+    "Quick question", "Call back requested",
+]
+SUMMARY_TEMPLATES = [
+    "Customer reports a problem with {kw}.", "Client asked about {kw} and {kw2}.", "Caller wants an update on {kw}.",
+    "Follow-up on {kw}; waiting on the customer.", "",
+]
+DESCRIPTION_TEMPLATES = [
+    "Hi team,\n\nWe are having trouble with {kw} again. Can someone look into it?\n\nThanks,\n{person}\n{company}",
+    "Hello,\nPlease see below regarding {kw}.\n\n{person} | {company}\nSent from my iPhone",
+    "{company} called about {kw}. {person} asked for a call back about {kw2}.",
+    "Good morning, following up on the {kw} request from last week.\n\nBest regards,\n{person}",
+]
+AUTO_FILLER = ["Weekly", "Case 10442", "Smith", "John Doe", "2024-06-01", "Intake 7781", "Toyota Camry", "Q3"]
+
+CASE_COLUMNS = ["Id", "Subject", "Email Summary", "Description", "Account Name", "Contact Name",
+                "AccountId", "ContactId", "Type", "Sub_Type__c", "Category__c"]
+
+
+def parse_scale(text: str) -> int:
+    """10000, 10k, 1M, 1.5m, ..."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*", text)
+    if not m:
+        raise argparse.ArgumentTypeError(f"not a case count: {text!r}")
+    return int(float(m.group(1)) * {"": 1, "k": 1_000, "m": 1_000_000}[m.group(2).lower()])
+
+def scale_label(n: int) -> str:
+    for unit, size in (("M", 1_000_000), ("k", 1_000)):
+        if n >= size and n % size == 0:
+            return f"{n // size}{unit}"
+    return str(n)
+
+def sf_id(prefix: str, i: int) -> str:
+    """18-character Salesforce-looking Id (prefix 001 Account, 003 Contact, 500 Case)."""
+    return f"{prefix}{i:015d}"
+
+def company_names(n: int, rng: random.Random) -> List[str]:
+    """n distinct account names (distinct after normalize_company too), about half with a company suffix."""
+    suffixes = ["Inc", "Inc.", "LLC", "Ltd", "Co.", "Corp", "Corporation", "Company", "PLC", "LLP"]
+    bases = [" ".join(filter(None, p)) for p in itertools.product(COMPANY_WORDS_A, COMPANY_WORDS_B, COMPANY_WORDS_C)]
+    rng.shuffle(bases)
+    names = []
+    for i in range(n):
+        base = bases[i % len(bases)]
+        if i >= len(bases):
+            base = f"{base} {i // len(bases) + 1}"
+        names.append(f"{base} {rng.choice(suffixes)}" if rng.random() < 0.5 else base)
+    return names
+
+def misspell(text: str, rng: random.Random) -> str:
+    """Two neighbouring letters of one longer word swapped."""
+    words = text.split()
+    long_words = [i for i, w in enumerate(words) if len(w) > 4 and w.isalpha()]
+    if not long_words:
+        return text
+    i = rng.choice(long_words)
+    w = words[i]
+    j = rng.randrange(1, len(w) - 2)
+    words[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return " ".join(words)
+
+def company_variant(name: str, rng: random.Random) -> str:
+    """How the account name was typed on the case: as exported, suffix swapped / dropped, recased, misspelt, blank or unknown."""
+    r = rng.random()
+    words = name.split()
+    stem = " ".join(words[:-1]) if words[-1].lower() in engine.COMMON_COMPANY_SUFFIXES else name
+    if r < 0.35:
+        return name
+    if r < 0.50:
+        return rng.choice([stem, f"{stem}, {rng.choice(['Inc.', 'LLC', 'l.l.c', 'Corporation', 'co'])}"])
+    if r < 0.60:
+        return rng.choice([name.upper(), name.lower(), f"  {name}."])
+    if r < 0.75:
+        return misspell(name, rng)
+    if r < 0.90:
+        return ""
+    return f"{rng.choice(UNKNOWN_COMPANY_WORDS)} {rng.choice(COMPANY_WORDS_B)} {rng.choice(['Inc', 'LLC', ''])}".strip()
+
+def contact_variant(first: str, last: str, rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.40:
+        return f"{last}, {first}"
+    if r < 0.70:
+        return f"{first} {last}"
+    if r < 0.80:
+        return misspell(f"{first} {last}", rng)
+    return ""
+
+def rule_keywords() -> List[str]:
+    return sorted({kw for rules in (engine.TYPE_RULES, engine.SUBTYPE_RULES, engine.CATEGORY_RULES)
+                   for kws in rules.values() for kw in kws})
+
+def auto_case_subjects() -> List[str]:
+    """Subjects the deleteAutoCases queries match: each Subject LIKE pattern with its wildcards filled in."""
+    patterns = []
+    for path in engine.AUTO_CASE_QUERIES:
+        if path.exists():
+            text = path.read_text(encoding="utf-8", errors="replace")
+            patterns += re.findall(r"(?<!NOT )\bSubject\s+LIKE\s+'([^']*)'", text, re.IGNORECASE)
+    return patterns or ["Out of office: %"]
+
+def fill_like(pattern: str, rng: random.Random) -> str:
+    out = re.sub("%", lambda _: rng.choice(AUTO_FILLER), pattern)
+    return re.sub("_", lambda _: rng.choice("ABCDEFGH"), out).strip()
+
+def data_files(out_dir: Path) -> Dict[str, Path]:
+    files_dir = out_dir / "Downloads"       # map_ids_for_TESTME.py reads ~/Downloads
+    return {"cases": files_dir / "TESTME.xlsx", "accounts": files_dir / "Accounts.csv", "contacts": files_dir / "contacts.csv"}
+
+def generate(out_dir: Path, cases: int, seed: int = 0) -> Dict[str, Path]:
+    """Accounts.csv, contacts.csv and TESTME.xlsx for `cases` cases under out_dir/Downloads; reused when already generated."""
+    files = data_files(out_dir)
+    files_dir = files["cases"].parent
+    meta_path = out_dir / "data.json"
+    meta = {"version": GENERATOR_VERSION, "cases": cases, "seed": seed}
+    if meta_path.exists() and json.loads(meta_path.read_text(encoding="utf-8")) == meta and all(p.exists() for p in files.values()):
+        return files
+    files_dir.mkdir(parents=True, exist_ok=True)
+    meta_path.unlink(missing_ok=True)
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+
+    accounts = [(sf_id("001", i), name) for i, name in enumerate(company_names(max(50, cases // CASES_PER_ACCOUNT), rng))]
+    with open(files["accounts"], "w", encoding="utf-8", newline="") as fh:
+        pd.DataFrame(accounts, columns=["Id", "Name"]).to_csv(fh, index=False)
+    contacts = [(sf_id("003", i), rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(accounts)[0])
+                for i in range(max(100, cases // CASES_PER_CONTACT))]
+    with open(files["contacts"], "w", encoding="utf-8", newline="") as fh:
+        pd.DataFrame(contacts, columns=["Id", "FirstName", "LastName", "AccountId"]).to_csv(fh, index=False)
+
+    account_name = dict(accounts)
+    keywords = rule_keywords()
+    auto_subjects = auto_case_subjects()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(excel_io.DEFAULT_SHEET)
+    ws.append(CASE_COLUMNS)
+    for i in range(cases):
+        case_id = sf_id("500", i)
+        if rng.random() < AUTO_CASE_SHARE:
+            ws.append([case_id, fill_like(rng.choice(auto_subjects), rng), "", "This is an automated message. Please do not reply.",
+                       "", "", "", "", "", "", ""])
+            continue
+        cid, first, last, accid = rng.choice(contacts)
+        if rng.random() < 0.3:
+            accid = rng.choice(accounts)[0]
+        company = account_name[accid]
+        kw, kw2 = rng.choice(keywords), rng.choice(keywords)
+        person = f"{first} {last}"
+        row = [
+            case_id,
+            rng.choice(SUBJECT_TEMPLATES).format(kw=kw, company=company),
+            rng.choice(SUMMARY_TEMPLATES).format(kw=kw, kw2=kw2),
+            rng.choice(DESCRIPTION_TEMPLATES).format(kw=kw, kw2=kw2, person=person, company=company),
+            company_variant(company, rng),
+            contact_variant(first, last, rng),
+            "", "", "", "", "",
+        ]
+        if rng.random() < PREFILLED_SHARE:
+            row[6:11] = [accid, cid, rng.choice(engine.ALLOWED_TYPES), rng.choice(engine.ALLOWED_SUBTYPES),
+                         rng.choice(engine.ALLOWED_CATEGORIES)]
+        ws.append(row)
+    wb.save(files["cases"])
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    print(f"  generated {cases:,} cases, {len(accounts):,} accounts, {len(contacts):,} contacts "
+          f"in {time.perf_counter() - t0:.1f}s")
+    return files
+
+
+# ---------------- Pipeline runs (one child process each) ----------------
+def run_engine(data_dir: Path, workers: int, semantic: bool) -> None:
+    """MUSTAAAARD.main on the generated files, cold; its run report lands in data_dir/engine/run_report.json."""
+    files = data_files(data_dir)
+    out = data_dir / "engine"
+    out.mkdir(exist_ok=True)
+    engine.TESTME_XLSX, engine.ACCOUNTS_CSV, engine.CONTACTS_CSV = files["cases"], files["accounts"], files["contacts"]
+    engine.OUTPUT_XLSX = out / "TESTME_with_ids.xlsx"
+    engine.CLEAN_OUTPUT_XLSX = out / "TESTME_with_ids_clean.xlsx"
+    engine.CLEAN_OUTPUT_CSV = out / "TESTME_with_ids_clean.csv"
+    engine.AMBIGUOUS_CSV = out / "ambiguous_matches.csv"
+    engine.AUTO_CASES_CSV = out / "auto_cases_to_delete.csv"
+    engine.RUN_REPORT_JSON = out / "run_report.json"
+    engine.UPSERT_DIR = out / "upsert"
+    engine.USE_EMBEDDING_CACHE = engine.USE_LOOKUP_INDEX = engine.USE_TABLE_CACHE = engine.INCREMENTAL = False
+    engine.USE_LABEL_MODEL = False
+    engine.USE_EMBEDDINGS = engine.USE_EMBEDDINGS and semantic
+    engine.main(["--workers", str(workers)])
+
+def run_testme(data_dir: Path) -> None:
+    """map_ids_for_TESTME.py with ~ pointed at data_dir; stage times go to data_dir/testme/run_report.json."""
+    out = data_dir / "testme"
+    out.mkdir(exist_ok=True)
+    os.environ["HOME"] = os.environ["USERPROFILE"] = str(data_dir)
+    marks: Dict[str, float] = {}
+    markers = (("Using sheet:", "load"), ("Detected case columns", "index build"))
+    real_print, real_write = builtins.print, excel_io.write_workbook
+
+    def marking_print(*args, **kwargs):
+        if args:
+            for prefix, stage in markers:
+                if str(args[0]).startswith(prefix):
+                    marks.setdefault(stage, time.perf_counter())
+        real_print(*args, **kwargs)
+
+    def timed_write(*args, **kwargs):
+        marks.setdefault("match", time.perf_counter())
+        real_write(*args, **kwargs)
+
+    builtins.print, excel_io.write_workbook = marking_print, timed_write
+    start = time.perf_counter()
+    try:
+        runpy.run_path(str(TESTME_SCRIPT), run_name="__main__")
+    finally:
+        builtins.print, excel_io.write_workbook = real_print, real_write
+    end = time.perf_counter()
+    stages, prev = {}, start
+    for stage in ("load", "index build", "match"):
+        if stage in marks:
+            stages[stage] = round(marks[stage] - prev, 3)
+            prev = marks[stage]
+    stages["output"] = round(end - prev, 3)
+    rows = json.loads((data_dir / "data.json").read_text(encoding="utf-8"))["cases"]
+    report = {"rows": rows, "seconds": {"total": round(end - start, 3), "stages": stages},
+              "rows_per_second": round(rows / (end - start), 1) if end > start else None}
+    (out / "run_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+def run_child(target: str, data_dir: Path, workers: int, semantic: bool, verbose: bool) -> Optional[Dict[str, object]]:
+    """Run target in a fresh interpreter and return {total, stages, rows_per_second}, or None when it failed."""
+    report_path = data_dir / target / "run_report.json"
+    report_path.unlink(missing_ok=True)
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--child", target, "--data-dir", str(data_dir), "--workers", str(workers)]
+    if semantic:
+        cmd.append("--semantic")
+    proc = subprocess.run(cmd, stdout=None if verbose else subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if proc.returncode != 0 or not report_path.exists():
+        print(f"  {target} failed (exit code {proc.returncode})" + (":\n" + proc.stdout[-2000:] if proc.stdout else ""))
+        return None
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    return {"total": report["seconds"]["total"], "stages": report["seconds"]["stages"],
+            "rows_per_second": report.get("rows_per_second")}
+
+
+# ---------------- Baseline ----------------
+def machine_info() -> Dict[str, object]:
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+def engine_config(workers: int, semantic: bool) -> Dict[str, object]:
+    """The MUSTAAAARD.py settings that change what a run does; timings are only compared under the same ones."""
+    return {"CLUSTER_CASES": engine.CLUSTER_CASES, "STRIP_EMAIL_TEXT": engine.STRIP_EMAIL_TEXT,
+            "TEXT_WINDOW_CHARS": engine.TEXT_WINDOW_CHARS, "AUTO_CASE_ACTION": engine.AUTO_CASE_ACTION,
+            "BLOCKING_TOP_K": engine.BLOCKING_TOP_K, "BLOCKING_MAX_POSTING": engine.BLOCKING_MAX_POSTING,
+            "WORKERS": workers, "semantic": semantic}
+
+def load_baseline(path: Path) -> Dict[str, object]:
+    if not path.exists():
+        return {"machine": {}, "results": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def compare(result: Dict[str, object], base: Optional[Dict[str, object]], tolerance: float) -> Tuple[List[str], List[str]]:
+    """(printable 'stage seconds (+x%)' cells, regressed stage names) of result against base."""
+    cells, regressed = [], []
+    timings = [("total", result["total"], base and base.get("total"))]
+    timings += [(stage, secs, base and base.get("stages", {}).get(stage)) for stage, secs in result["stages"].items()]
+    for stage, secs, was in timings:
+        cell = f"{stage} {secs:.2f}s"
+        if was and was >= MIN_STAGE_SECONDS:
+            change = secs / was - 1
+            cell += f" ({change:+.0%})"
+            if change > tolerance and secs - was >= MIN_SLOWDOWN_SECONDS:
+                regressed.append(stage)
+        cells.append(cell)
+    return cells, regressed
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time MUSTAAAARD.py and map_ids_for_TESTME.py on synthetic data and compare with the stored baseline.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"comma-separated case counts, e.g. 10k,100k,1M (default {DEFAULT_SCALES})")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="engine (MUSTAAAARD.py) and/or testme (map_ids_for_TESTME.py)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="where the generated data sets and outputs are kept")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_JSON)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run's timings as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"slowdown that counts as a regression (default {DEFAULT_TOLERANCE:.0%})")
+    parser.add_argument("--workers", type=int, default=engine.WORKERS, help="--workers for MUSTAAAARD.py")
+    parser.add_argument("--semantic", action="store_true", help="keep the semantic tier on (needs sentence-transformers and the model locally)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the pipelines' own output")
+    parser.add_argument("--child", choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child == "engine":
+        run_engine(args.data_dir, args.workers, args.semantic)
+        return 0
+    if args.child == "testme":
+        run_testme(args.data_dir)
+        return 0
+
+    scales = [parse_scale(s) for s in args.scales.split(",") if s.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+    baseline = load_baseline(args.baseline)
+    if baseline.get("machine") and baseline["machine"] != machine_info() and not args.update_baseline:
+        print(f"Note: baseline recorded on {baseline['machine']}; timings from another machine are not comparable.")
+
+    compared = False
+    config = engine_config(args.workers, args.semantic)
+    regressions: List[str] = []
+    for cases in scales:
+        label = scale_label(cases)
+        data_dir = args.data_dir / label
+        print(f"{label} cases:")
+        generate(data_dir, cases, args.seed)
+        for target in targets:
+            result = run_child(target, data_dir, args.workers, args.semantic, args.verbose)
+            if result is None:
+                regressions.append(f"{target} {label}: failed")
+                continue
+            result["config"] = config
+            base = baseline["results"].get(target, {}).get(label)
+            if base is not None and base.get("config") != config and not args.update_baseline:
+                print(f"  {target:<6}  baseline recorded with other settings ({base.get('config', 'not stored')}); not compared")
+                base = None
+            compared |= base is not None and not args.update_baseline
+            cells, regressed = compare(result, None if args.update_baseline else base, args.tolerance)
+            rate = f", {result['rows_per_second']:,.0f} rows/s" if result.get("rows_per_second") else ""
+            print(f"  {target:<6}  " + "; ".join(cells) + rate)
+            regressions += [f"{target} {label}: {stage}" for stage in regressed]
+            baseline["results"].setdefault(target, {})[label] = result
+
+    if args.update_baseline:
+        baseline["machine"] = machine_info()
+        baseline["updated"] = time.strftime("%Y-%m-%d")
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print("Baseline written to:", args.baseline)
+        return 0
+    if regressions:
+        print(f"Slower than the baseline by more than {args.tolerance:.0%}: " + ", ".join(regressions))
+        return 1
+    print("No regressions against the baseline." if compared else
+          "No comparable baseline yet; record one with --update-baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+convert_excel_to_ndjson.py
+
+Converts one sheet of a case workbook to NDJSON (one JSON object per row) for scripts/map_ids_to_cases.py.
+Rows are read with openpyxl in read-only mode and written as they are read, so large workbooks
+are never held in memory.
+
+Usage:
+  python scripts/convert_excel_to_ndjson.py TESTME.xlsx TESTME_ndjson.json ["Full Acc and Contact"]
+
+Without a sheet name, "Full Acc and Contact" is used if present, otherwise the first sheet.
+All values are written as strings (empty cells as ""), the same as pd.read_excel(dtype=str).fillna("").
+Completely empty rows are skipped.
+"""
+from pathlib import Path
+import json
+import sys
+
+from openpyxl import load_workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from excel_io import cell_str, header_names, pick_sheet  # noqa: E402
+
+
+def convert(xlsx_path: Path, out_path: Path, sheet_name: str = None) -> int:
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheet_name = pick_sheet(wb.sheetnames, sheet_name)
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header_row = next(rows, None)
+        header = [] if header_row is None else [h.strip() for h in header_names(header_row)]
+        written = 0
+        with open(out_path, "w", encoding="utf-8", newline="\n") as out:
+            for row in rows:
+                if all(v is None for v in row):
+                    continue
+                rec = {h: cell_str(v) for h, v in zip(header, row)}
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                written += 1
+    finally:
+        wb.close()
+    print(f"Sheet {sheet_name!r}: {written} rows written to {out_path}")
+    return written
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    src = Path(sys.argv[1])
+    if not src.exists():
+        print(f"ERROR: workbook not found at {src}")
+        sys.exit(1)
+    convert(src, Path(sys.argv[2]), sys.argv[3] if len(sys.argv) > 3 else None)
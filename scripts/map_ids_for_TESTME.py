@@ -13,6 +13,9 @@ import pandas as pd
 import json, re, sys, csv
 from rapidfuzz import process, fuzz
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import excel_io  # read-only streaming access to TESTME.xlsx
+
 # -------- CONFIG: adjust if your files are in different locations --------
 BASE_DIR = Path.home() / "Downloads"
 TESTME_XLSX = BASE_DIR / "TESTME.xlsx"
@@ -70,11 +73,9 @@ if not CONTACTS_CSV.exists():
     print(f"ERROR: contacts.csv not found at {CONTACTS_CSV}")
     sys.exit(1)
 
-# read all sheets to preserve workbook and to update the proper sheet later
-all_sheets = pd.read_excel(TESTME_XLSX, sheet_name=None, engine="openpyxl", dtype=str)
-# choose sheet: Full Acc and Contact if exists else first sheet
-sheet_name = "Full Acc and Contact" if "Full Acc and Contact" in all_sheets else list(all_sheets.keys())[0]
-cases_df = all_sheets[sheet_name].fillna("")
+# read only the case sheet (Full Acc and Contact if exists else first sheet); the other sheets
+# are copied into the output workbook unparsed
+sheet_name, cases_df = excel_io.read_sheet(TESTME_XLSX)
 
 accounts_df = pd.read_csv(ACCOUNTS_CSV, dtype=str).fillna("")
 contacts_df = pd.read_csv(CONTACTS_CSV, dtype=str).fillna("")
@@ -130,6 +131,16 @@ for _, r in contacts_df.iterrows():
     if norm not in contact_choices:
         contact_choices.append(norm)
 
+# reverse indexes, built once so preference / backfill checks don't rescan every contact per row
+account_id_by_contact_id = {}   # contact_id -> AccountId of the first record with that id that has one
+contacts_by_account_id = {}     # AccountId -> list of (contact_id, raw_fullname, accountid)
+for cands in contact_norm_map.values():
+    for cid, raw_full, accid in cands:
+        if not accid:
+            continue
+        account_id_by_contact_id.setdefault(cid, accid)
+        contacts_by_account_id.setdefault(accid, []).append((cid, raw_full, accid))
+
 # helper: find columns in cases for account/contact names & existing ids
 cases_cols = cases_df.columns.tolist()
 acct_name_col = find_first_col(cases_cols, ["Account Name","AccountName","Account","AccountName"])
@@ -177,10 +188,9 @@ def match_account_for_row(acc_name_raw, contact_name_raw):
             if contact_norm:
                 for aid, raw in cand:
                     # check if any contact has this accid
-                    for _, _, c_accid in [x for sub in contact_norm_map.values() for x in sub]:
-                        if c_accid and c_accid == aid:
-                            acc_cache[key] = (aid, raw, "exact_with_contact_preference")
-                            return acc_cache[key]
+                    if aid in contacts_by_account_id:
+                        acc_cache[key] = (aid, raw, "exact_with_contact_preference")
+                        return acc_cache[key]
             aid, raw = cand[0]
             acc_cache[key] = (aid, raw, "exact")
             return acc_cache[key]
@@ -270,24 +280,13 @@ for idx, row in cases_df.iterrows():
     # If account still missing but contact matched and contact record has accid, set account
     if (not cases_df.at[idx, acct_id_out_col]) and con_id:
         # find contact entry for this id to get its accid
-        found_accid = None
-        for cand_list in contact_norm_map.values():
-            for cid, raw_full, accid in cand_list:
-                if cid == con_id and accid:
-                    found_accid = accid
-                    break
-            if found_accid:
-                break
+        found_accid = account_id_by_contact_id.get(con_id)
         if found_accid:
             cases_df.at[idx, acct_id_out_col] = found_accid
             filled_acc += 1
 
 # -------- write outputs: preserve other sheets --------
-all_sheets[sheet_name] = cases_df  # replace updated sheet
-
-with pd.ExcelWriter(OUTPUT_XLSX, engine="openpyxl") as writer:
-    for sname, df in all_sheets.items():
-        df.to_excel(writer, sheet_name=sname, index=False)
+excel_io.write_workbook(OUTPUT_XLSX, TESTME_XLSX, sheet_name, cases_df)
 
 # write ambiguous log if anything
 if ambiguous_rows:
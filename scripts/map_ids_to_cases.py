@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+map_ids_to_cases.py
+
+Streaming version of MUSTAAAARD.py for very large case histories.
+Reads cases as NDJSON, a JSON array, CSV or one sheet of an Excel workbook in fixed-size chunks, runs every chunk through the same
+matching / classification engine (MUSTAAAARD.process_cases) and appends the result to the output
+before reading the next one. Peak memory depends on --chunk-size and the Accounts / Contacts
+exports, not on the number of cases.
+
+Example:
+  python scripts/map_ids_to_cases.py --input TESTME_ndjson.json --accounts Accounts.csv --contacts contacts.csv --output TESTME_with_ids.ndjson
+
+Output format follows --output: *.csv is written cleaned for Salesforce (same as
+TESTME_with_ids_clean.csv), anything else as NDJSON, or as one JSON array with --write-array.
+Cases unchanged since an earlier run reuse their stored results (MUSTAAAARD.INCREMENTAL);
+--full re-processes all of them.
+"""
+from pathlib import Path
+from typing import Dict, Iterator, List
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import MUSTAAAARD as engine  # noqa: E402
+import excel_io  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 5000
+JSON_BLOCK_SIZE = 1 << 20  # characters read at a time when scanning a JSON array file
+
+
+# -------- readers --------
+def detect_input_format(path: Path) -> str:
+    if path.suffix.lower() == ".csv":
+        return "csv"
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        return "xlsx"
+    with open(path, "r", encoding="utf-8-sig") as fh:
+        while True:
+            ch = fh.read(1)
+            if not ch or not ch.isspace():
+                break
+    return "array" if ch == "[" else "ndjson"
+
+def iter_ndjson(path: Path) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8-sig") as fh:
+        for line_no, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if not isinstance(rec, dict):
+                raise ValueError(f"{path} line {line_no}: expected a JSON object per line")
+            yield rec
+
+def iter_json_array(path: Path, block_size: int = JSON_BLOCK_SIZE) -> Iterator[dict]:
+    """Yield the objects of a top-level JSON array one at a time without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as fh:
+        buf, pos, started = "", 0, False
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+                pos += 1
+            if pos == len(buf):
+                buf, pos = fh.read(block_size), 0
+                if not buf:
+                    raise ValueError(f"{path}: JSON array is not closed")
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                rec, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # object cut off at the end of the buffer: read on and retry
+                block = fh.read(block_size)
+                if not block:
+                    raise
+                buf, pos = buf[pos:] + block, 0
+                continue
+            if not isinstance(rec, dict):
+                raise ValueError(f"{path}: expected an array of JSON objects")
+            yield rec
+            pos = end
+
+def records_to_frame(records: List[dict]) -> pd.DataFrame:
+    # same shape as pd.read_excel(dtype=str).fillna(""): every cell a string, missing keys ""
+    rows = [{k: "" if v is None else str(v) for k, v in rec.items()} for rec in records]
+    return pd.DataFrame(rows, dtype=str).fillna("")
+
+def iter_case_chunks(path: Path, input_format: str, chunk_size: int, sheet_name: str = None) -> Iterator[pd.DataFrame]:
+    if input_format == "csv":
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        return
+    if input_format == "xlsx":
+        # read-only streaming: only the case sheet is read, chunk_size rows at a time
+        yield from excel_io.iter_sheet_chunks(path, sheet_name, chunk_size)
+        return
+    records = iter_json_array(path) if input_format == "array" else iter_ndjson(path)
+    chunk: List[dict] = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            yield records_to_frame(chunk)
+            chunk = []
+    if chunk:
+        yield records_to_frame(chunk)
+
+
+# -------- main --------
+def timed_chunks(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """chunks, with the time spent reading each one counted as the "load" stage of the run report."""
+    while True:
+        with engine.timed("load"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream cases through the MUSTAAAARD matching / classification engine.")
+    parser.add_argument("--input", required=True, help="cases file: NDJSON, JSON array, CSV or Excel workbook")
+    parser.add_argument("--accounts", default=str(engine.ACCOUNTS_CSV), help="Accounts export (CSV or Excel)")
+    parser.add_argument("--contacts", default=str(engine.CONTACTS_CSV), help="Contacts export (CSV or Excel)")
+    parser.add_argument("--output", help="output file (default: <input>_with_ids.ndjson)")
+    parser.add_argument("--input-format", choices=["auto", "ndjson", "array", "csv", "xlsx"], default="auto")
+    parser.add_argument("--sheet", help=f"sheet of an Excel input (default {excel_io.DEFAULT_SHEET!r} if present, else the first)")
+    parser.add_argument("--write-array", action="store_true", help="write one JSON array instead of NDJSON")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help=f"cases per chunk (default {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--fuzzy-threshold", type=int, default=engine.NAME_FUZZY_FROM_TEXT,
+                        help=f"minimum fuzzy score for account / contact names found in case text (default {engine.NAME_FUZZY_FROM_TEXT})")
+    parser.add_argument("--workers", type=int, default=engine.WORKERS, help="processes for fuzzy matching and rule scoring")
+    parser.add_argument("--auto-cases", help="CSV of auto-generated case Ids to delete (default: auto_cases_to_delete.csv next to --output)")
+    parser.add_argument("--full", action="store_true", help="re-process every case instead of reusing stored results of unchanged ones")
+    parser.add_argument("--upsert-dir", help="also write the changed cases as Bulk API 2.0 upsert CSVs (Case_upsert_001.csv, ...) to this folder")
+    args = parser.parse_args(argv)
+
+    run_start = engine.time.perf_counter()
+    in_path = Path(args.input)
+    if not in_path.exists():
+        print(f"ERROR: input not found at {in_path}")
+        sys.exit(1)
+    out_path = Path(args.output) if args.output else in_path.with_name(in_path.stem + "_with_ids.ndjson")
+    input_format = detect_input_format(in_path) if args.input_format == "auto" else args.input_format
+    output_format = "csv" if out_path.suffix.lower() == ".csv" and not args.write_array else ("array" if args.write_array else "ndjson")
+    engine.NAME_FUZZY_FROM_TEXT = args.fuzzy_threshold
+    auto_path = Path(args.auto_cases) if args.auto_cases else out_path.with_name(engine.AUTO_CASES_CSV.name)
+
+    lookups = engine.load_lookups(Path(args.accounts), Path(args.contacts))
+    print(f"Account names: {len(lookups['account_choices'])}; Contact names: {len(lookups['contact_choices'])}")
+    print(f"Streaming {input_format} cases from {in_path} -> {output_format} {out_path} ({args.chunk_size} rows per chunk)")
+
+    store = engine.case_state.CaseStateStore(engine.CASE_STATE_DB) if engine.INCREMENTAL else None
+    cfg_hash = engine.case_state.config_hash(engine.run_config(Path(args.accounts), Path(args.contacts))) if store is not None else ""
+
+    totals: Dict[str, int] = {"processed": 0, "filled_acc": 0, "filled_con": 0, "cluster_members": 0, "reused": 0}
+    auto_total = 0
+    rows_total = 0
+    all_counts: Dict[str, object] = {}
+    header = None
+    first_record = True
+    upsert = None
+    if args.upsert_dir:
+        upsert = engine.upsert_export.UpsertWriter(Path(args.upsert_dir), ["Id"] + list(engine.UPSERT_FIELDS),
+                                                   engine.UPSERT_MAX_MB * 1024 * 1024, engine.UPSERT_MAX_ROWS)
+    auto_out = open(auto_path if engine.AUTO_CASE_FILTER else os.devnull, "w", encoding="utf-8", newline="")
+    with open(out_path, "w", encoding="utf-8", newline="") as out, auto_out:
+        if output_format == "array":
+            out.write("[")
+        for n, chunk in enumerate(timed_chunks(iter_case_chunks(in_path, input_format, args.chunk_size, args.sheet)), 1):
+            source, chunk_index = chunk, chunk.index
+            rows_total += len(chunk)
+            with engine.timed("auto-case filter"):
+                chunk, auto_df = engine.split_auto_cases(chunk)
+                engine.auto_case_deletions(auto_df).to_csv(auto_out, index=False, header=(n == 1))
+            auto_total += len(auto_df)
+            if store is not None:
+                chunk, counts = engine.process_cases_incremental(chunk, lookups, store, cfg_hash, args.workers, args.full)
+            else:
+                chunk, counts = engine.process_cases(chunk, lookups, args.workers)
+                counts["reused"] = 0
+            with engine.timed("output"):
+                chunk = engine.merge_auto_cases(chunk, auto_df, chunk_index)
+                if upsert is not None:
+                    upsert.write_frame(engine.upsert_changes(source, chunk, keep_all_fields=True))
+                for k in totals:
+                    totals[k] += counts[k]
+                engine.add_counts(all_counts, counts)
+                if output_format == "csv":
+                    chunk = engine.clean_for_salesforce(chunk)
+                    if header is None:
+                        header = list(chunk.columns)
+                        chunk.to_csv(out, index=False)
+                    else:
+                        extra = [c for c in chunk.columns if c not in header]
+                        if extra:
+                            print(f"Warning: chunk {n} has columns not in the CSV header, dropped: {extra}")
+                        chunk.reindex(columns=header, fill_value="").to_csv(out, index=False, header=False)
+                else:
+                    for rec in chunk.to_dict("records"):
+                        line = json.dumps(rec, ensure_ascii=False)
+                        if output_format == "array":
+                            out.write(("\n" if first_record else ",\n") + line)
+                            first_record = False
+                        else:
+                            out.write(line + "\n")
+                out.flush()
+            print(f"Chunk {n}: {totals['processed'] + totals['reused']} rows so far")
+        if output_format == "array":
+            out.write("\n]\n")
+
+    if store is not None:
+        store.close()
+    if upsert is not None:
+        files = upsert.close()
+        print(f"Upsert: {upsert.rows} changed cases in {len(files)} file(s) under {args.upsert_dir}")
+    if engine.embedding_cache is not None:
+        engine.embedding_cache.save()
+    if store is not None:
+        print(f"Incremental: {totals['reused']} unchanged rows reused from {engine.CASE_STATE_DB.name}")
+    print(f"Done. Processed rows: {totals['processed']}. AccountId filled: {totals['filled_acc']}. ContactId filled: {totals['filled_con']}")
+    if engine.AUTO_CASE_FILTER:
+        print(f"Auto-generated cases: {auto_total} ({engine.AUTO_CASE_ACTION}); Ids for deletion written to: {auto_path}")
+    if engine.CLUSTER_CASES:
+        print(f"Near-duplicate rows classified through their cluster (within each chunk): {totals['cluster_members']}")
+    print(f"Output written to: {out_path}")
+    print(engine.startup_report())
+    report = engine.run_report(all_counts, rows_total, auto_total, engine.time.perf_counter() - run_start)
+    report_path = out_path.with_name(out_path.stem + "_report.json")
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(engine.report_summary(report))
+    print(f"Run report written to: {report_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+sweep_thresholds.py
+
+Accuracy vs. throughput sweep of MUSTAAAARD.py's matching thresholds and fuzzy scorers on a golden
+set: cases whose AccountId / ContactId / Type are known to be right (e.g. a caseInfoQuery.txt
+export of reviewed cases). The known values are hidden from the matcher, every case goes through
+the same tiers as a run, and each configuration's fills are scored against them.
+
+Example:
+  python scripts/sweep_thresholds.py --input CaseInfo.csv --accounts Accounts.csv --contacts Contacts.csv
+  python scripts/sweep_thresholds.py --input golden.xlsx --min-precision 0.98 --min-recall 0.9
+
+Grid: NAME_FUZZY_STRICT x NAME_FUZZY_FROM_TEXT x SIMILARITY_THRESHOLD_ACCOUNT_CONTACT (only with
+sentence-transformers) x FUZZY_THRESHOLD_LABEL x the fuzzy scorer of the name tier and of the
+case-text tier (token_sort_ratio, partial_token_set_ratio, WRatio), for each email text
+preparation of --text-preps (STRIP_EMAIL_TEXT / TEXT_WINDOW_CHARS; the rules and candidate scores
+are computed once per preparation).
+
+Candidate scores are computed once. The tiers take the best candidate and then compare its score
+with the threshold, so per scorer every distinct name / case text keeps its best candidate and
+score (semantic: best candidate and similarity), and each grid point only re-thresholds those.
+The seconds column adds up the measured scoring time of the queries that configuration would
+actually score (a lower name threshold settles more rows before the case-text tier), i.e. the
+account / contact matching cost of the configuration on this set. Scoring runs in this process,
+one query at a time so each can be timed; --workers only spreads the keyword rule pass.
+
+The two grids are independent and reported separately:
+ - threshold_sweep.csv: one row per name / case-text / semantic configuration with precision /
+   recall of AccountId and ContactId and its seconds, fastest first (ties: higher recall, then
+   higher precision first).
+ - threshold_sweep_labels.csv (next to it): one row per FUZZY_THRESHOLD_LABEL with precision /
+   recall of Type, most accurate first. It does not change the matching cost.
+The script prints the current settings of both and the fastest name configurations / the label
+thresholds that meet --min-precision / --min-recall.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse
+import itertools
+import sys
+import time
+
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import MUSTAAAARD as engine  # noqa: E402
+import excel_io  # noqa: E402
+
+SCORERS = ["token_sort_ratio", "partial_token_set_ratio", "WRatio"]
+NAME_THRESHOLDS = "80,85,90,95"
+TEXT_THRESHOLDS = "75,80,85,90"
+SEMANTIC_THRESHOLDS = "0.70,0.75,0.80,0.85,0.90"
+LABEL_THRESHOLDS = "65,70,75,80,85"
+TEXT_PREPS = "full,strip,strip:1000,strip:2000"
+OUTPUT_CSV = engine.BASE_DIR / "threshold_sweep.csv"
+
+
+def read_sheet(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".csv":
+        return engine.load_table(path)
+    return excel_io.read_sheet(path)[1]
+
+def number_list(text: str) -> List[float]:
+    return [float(v) for v in text.split(",") if v.strip()]
+
+def text_prep_list(text: str) -> List[Tuple[bool, int]]:
+    """(STRIP_EMAIL_TEXT, TEXT_WINDOW_CHARS) per item: "full", "strip", "strip:<chars>" or "<chars>"."""
+    preps = []
+    for item in (v.strip().lower() for v in text.split(",") if v.strip()):
+        strip, _, window = item.partition(":") if item.startswith("strip") else ("", "", item)
+        preps.append((strip == "strip", int(window) if window and window != "full" else 0))
+    return preps
+
+def precision_recall(pred: pd.Series, truth: pd.Series) -> Tuple[Optional[float], Optional[float]]:
+    """Over the rows with a known value: correct / filled and correct / known (None when undefined)."""
+    known = truth != ""
+    filled = known & (pred != "")
+    correct = filled & (pred == truth)
+    return (round(float(correct.sum() / filled.sum()), 4) if filled.any() else None,
+            round(float(correct.sum() / known.sum()), 4) if known.any() else None)
+
+
+# ---------------- Candidate scores (computed once) ----------------
+def best_fuzzy(queries: List[str], kind: str, lookups: Dict[str, object], scorer: str) -> Dict[str, Tuple[Optional[str], float, float]]:
+    """{query: (best choice, score, seconds spent scoring it)}, with the same candidate blocking as a run."""
+    choices, index, fn = lookups[f"{kind}_choices"], lookups[f"{kind}_index"], getattr(fuzz, scorer)
+    out = {}
+    for q in queries:
+        t0 = time.perf_counter()
+        best = engine.fuzzy_best_from_text(q, choices, index, fn)
+        out[q] = (best[0], best[1], time.perf_counter() - t0) if best else (None, 0.0, time.perf_counter() - t0)
+    return out
+
+def best_semantic(queries: List[str], kind: str, lookups: Dict[str, object]) -> Dict[str, Tuple[Optional[str], float, float]]:
+    """{query: (best choice, cosine similarity, seconds per query)}; {} without a semantic backend."""
+    choices = lookups[f"{kind}_choices"]
+    index = engine.get_vector_index(choices, lookups.get(f"{kind}_vector_dir"))
+    if not queries or index is None:
+        return {}
+    t0 = time.perf_counter()
+    emb = engine.embed_texts_normalized(queries)
+    if emb is None:
+        return {}
+    best, score = index.search(emb, k=1, nprobe=engine.VECTOR_INDEX_NPROBE)
+    per_query = (time.perf_counter() - t0) / len(queries)
+    return {q: (choices[b] if b >= 0 else None, sc, per_query) for q, b, sc in zip(queries, best[:, 0].tolist(), score[:, 0].tolist())}
+
+def candidate_scores(kind: str, rows: List[Tuple], norm_fn, lookups: Dict[str, object], scorers: List[str]) -> Dict[str, object]:
+    """rows: (idx, name, combined_norm) still missing an Id after the exact pre-pass, as in name_tier_chains."""
+    norm_map = lookups[f"{kind}_norm_map"]
+    exact = [bool(name) and bool(n := norm_fn(name)) and n in norm_map for _, name, _ in rows]
+    names = list(dict.fromkeys(name for (_, name, _), ex in zip(rows, exact) if name and not ex))
+    texts = list(dict.fromkeys(text for _, _, text in rows if text))
+    t0 = time.perf_counter()
+    data = {
+        "rows": rows, "exact": exact, "norm_map": norm_map,
+        "name": {s: best_fuzzy(names, kind, lookups, s) for s in scorers},
+        "text": {s: best_fuzzy(texts, kind, lookups, s) for s in scorers},
+        "semantic": best_semantic(list(dict.fromkeys(names + texts)), kind, lookups) if engine.USE_EMBEDDINGS else {},
+    }
+    print(f"{kind}: {len(names)} names and {len(texts)} case texts scored with {len(scorers)} scorer(s) "
+          f"in {time.perf_counter() - t0:.1f}s")
+    return data
+
+def resolve(data: Dict[str, object], name_scorer: str, text_scorer: str, name_thr: float, text_thr: float,
+            semantic_thr: float) -> Tuple[Dict[object, str], float]:
+    """({idx: matched choice}, matching seconds) for one configuration, through name_tier_chain / resolve_tier_chains."""
+    rows, exact, norm_map = data["rows"], data["exact"], data["norm_map"]
+    by_name, by_text, semantic = data["name"][name_scorer], data["text"][text_scorer], data["semantic"]
+    fuzzy_name = {q: c if c is not None and sc >= name_thr else None for q, (c, sc, _) in by_name.items()}
+    seconds = sum(sec for _, _, sec in by_name.values())
+
+    def settled(name: str, ex: bool) -> bool:
+        hit = None if ex else fuzzy_name.get(name)
+        return bool(hit and norm_map[hit][0][0])
+
+    text_queries = dict.fromkeys(text for (_, name, text), ex in zip(rows, exact) if text and not settled(name, ex))
+    seconds += sum(by_text[t][2] for t in text_queries)
+    fuzzy_text = {t: by_text[t][0] if by_text[t][0] is not None and by_text[t][1] >= text_thr else None for t in text_queries}
+    chains = {idx: engine.name_tier_chain(name, ex, text, fuzzy_name, fuzzy_text, norm_map, bool(semantic))
+              for (idx, name, text), ex in zip(rows, exact)}
+    asked = set()
+
+    def semantic_batch(queries: List[str]) -> Dict[str, Optional[str]]:
+        asked.update(queries)
+        return {q: hit[0] if (hit := semantic.get(q)) and hit[1] >= semantic_thr else None for q in queries}
+
+    resolved = engine.resolve_tier_chains({idx: ch for idx, ch in chains.items() if ch}, semantic_batch,
+                                          accept=lambda choice: bool(norm_map[choice][0][0]))
+    seconds += sum(semantic[q][2] for q in asked if q in semantic)
+    return {idx: choice for idx, (_tier, choice) in resolved.items()}, seconds
+
+
+# ---------------- Sweep ----------------
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precision / recall / time of MUSTAAAARD.py's matching thresholds and scorers on a golden set.")
+    parser.add_argument("--input", required=True, help="golden cases (.csv / .xlsx) with the correct AccountId / ContactId / Type filled in")
+    parser.add_argument("--accounts", default=str(engine.ACCOUNTS_CSV))
+    parser.add_argument("--contacts", default=str(engine.CONTACTS_CSV))
+    parser.add_argument("--output", default=str(OUTPUT_CSV))
+    parser.add_argument("--scorers", default=",".join(SCORERS), help="RapidFuzz fuzz scorers to try for the name and case-text tiers")
+    parser.add_argument("--name-thresholds", default=NAME_THRESHOLDS, help="NAME_FUZZY_STRICT values")
+    parser.add_argument("--text-thresholds", default=TEXT_THRESHOLDS, help="NAME_FUZZY_FROM_TEXT values")
+    parser.add_argument("--semantic-thresholds", default=SEMANTIC_THRESHOLDS, help="SIMILARITY_THRESHOLD_ACCOUNT_CONTACT values (with sentence-transformers)")
+    parser.add_argument("--label-thresholds", default=LABEL_THRESHOLDS, help="FUZZY_THRESHOLD_LABEL values")
+    parser.add_argument("--text-preps", default=TEXT_PREPS,
+                        help='STRIP_EMAIL_TEXT / TEXT_WINDOW_CHARS settings: "full" (neither), "strip", "strip:<chars>" or "<chars>" (window only)')
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    parser.add_argument("--min-recall", type=float, default=0.80)
+    parser.add_argument("--top", type=int, default=10, help="configurations to print")
+    parser.add_argument("--workers", type=int, default=engine.WORKERS,
+                        help="processes for the keyword rule pass (the candidate scoring always runs serially, to time each query)")
+    args = parser.parse_args(argv)
+
+    scorers = [s.strip() for s in args.scorers.split(",") if s.strip()]
+    unknown = [s for s in scorers if not callable(getattr(fuzz, s, None))]
+    if unknown:
+        parser.error(f"not a rapidfuzz.fuzz scorer: {', '.join(unknown)}")
+    try:
+        text_preps = list(dict.fromkeys(text_prep_list(args.text_preps)))
+    except ValueError:
+        parser.error(f"bad --text-preps: {args.text_preps}")
+    semantic_grid = number_list(args.semantic_thresholds) if engine.USE_EMBEDDINGS else [engine.SIMILARITY_THRESHOLD_ACCOUNT_CONTACT]
+
+    df = read_sheet(Path(args.input))
+    cols = df.columns.tolist()
+    acct_name_col = engine.find_first_col(cols, ["Account Name","AccountName","Account","_Account_Name__c","Account_Name__c"])
+    contact_name_col = engine.find_first_col(cols, ["Contact Name","ContactName","Contact","Contact FullName","_Contact_Name__c"])
+    summary_col = engine.find_first_col(cols, ["Email Summary","_Email_Summary__c","Email_Summary__c","Summary","Email Subject"])
+    subject_col = engine.find_first_col(cols, ["Subject","Case Subject","Email_Subject__c"])
+    desc_col = engine.find_first_col(cols, ["Description","_Description","Description__c","Body","Email Body"])
+    acct_id_col = engine.find_first_col(cols, ["AccountId","Account Id","Account_Id"])
+    con_id_col = engine.find_first_col(cols, ["ContactId","Contact Id","Contact_Id"])
+
+    def column(col: Optional[str]) -> pd.Series:
+        return df[col].astype(str).str.strip() if col else pd.Series("", index=df.index)
+
+    truth = {"account": column(acct_id_col), "contact": column(con_id_col), "type": column("Type" if "Type" in cols else None)}
+    print(f"Golden set: {len(df)} cases; known AccountId {int((truth['account'] != '').sum())}, "
+          f"ContactId {int((truth['contact'] != '').sum())}, Type {int((truth['type'] != '').sum())}")
+
+    lookups = engine.load_lookups(Path(args.accounts), Path(args.contacts))
+    account_norm_map, contact_norm_map = lookups["account_norm_map"], lookups["contact_norm_map"]
+    exact = engine.exact_match_prepass(df, acct_name_col, contact_name_col, account_norm_map, contact_norm_map)
+
+    current_prep = (engine.STRIP_EMAIL_TEXT, engine.TEXT_WINDOW_CHARS)
+    name_results, label_results = [], []
+    for strip, window in text_preps:
+        # keyword rules / label model once per text preparation; only the fuzzy label threshold varies below
+        engine.STRIP_EMAIL_TEXT, engine.TEXT_WINDOW_CHARS = strip, window
+        print(f"Text preparation: STRIP_EMAIL_TEXT = {strip}, TEXT_WINDOW_CHARS = {window}")
+        rows = list(zip(df.index, engine.matching_texts(column(summary_col).tolist()), column(subject_col).tolist(),
+                        engine.matching_texts(column(desc_col).tolist())))
+        results = engine.run_match_chunks(rows, args.workers)
+        engine.add_model_label_tiers(rows, results)
+        combined = {idx: text for idx, text, _ in results}
+        type_chains = {idx: chains[0] for idx, _, chains in results if chains}
+        fallthrough = list(dict.fromkeys(ch[0][1] for ch in type_chains.values() if ch[0][0] == "semantic"))
+        semantic_types: Dict[str, Optional[str]] = {}
+        if engine.USE_EMBEDDINGS and fallthrough:
+            semantic_types = engine.semantic_label_batch(
+                fallthrough, [(engine.ALLOWED_TYPES, engine.embed_texts_normalized(engine.ALLOWED_TYPES))],
+                engine.SIMILARITY_THRESHOLD_LABEL)[0]
+        fuzzy_types = {t: process.extractOne(t, engine.ALLOWED_TYPES, scorer=fuzz.token_sort_ratio) if t else None for t in fallthrough}
+        default_type = engine.fallback_label("", engine.ALLOWED_TYPES)[1]
+
+        def name_rows(name_col: Optional[str], done: pd.Series) -> List[Tuple]:
+            return [(idx, name, combined[idx]) for idx, name in column(name_col).items() if not done[idx]]
+
+        acc_data = candidate_scores("account", name_rows(acct_name_col, exact["acc_id"] != ""), engine.normalize_company, lookups, scorers)
+        con_data = candidate_scores("contact", name_rows(contact_name_col, exact["con_id"] != ""), engine.normalize_person, lookups, scorers)
+
+        # ---------- AccountId / ContactId per name configuration ----------
+        for ns, ts, nt, tt, st in itertools.product(scorers, scorers, number_list(args.name_thresholds),
+                                                    number_list(args.text_thresholds), semantic_grid):
+            acc_hit, acc_sec = resolve(acc_data, ns, ts, nt, tt, st)
+            con_hit, con_sec = resolve(con_data, ns, ts, nt, tt, st)
+            con_pred = exact["con_id"].copy()
+            backfill = exact["con_acc"].copy()
+            for idx, choice in con_hit.items():
+                con_pred.at[idx], _raw, backfill.at[idx] = contact_norm_map[choice][0]
+            acc_pred = exact["acc_id"].copy()
+            for idx, choice in acc_hit.items():
+                acc_pred.at[idx] = account_norm_map[choice][0][0]
+            acc_pred = acc_pred.where(acc_pred != "", backfill)
+            name_results.append({
+                "STRIP_EMAIL_TEXT": strip, "TEXT_WINDOW_CHARS": window, "name_scorer": ns, "text_scorer": ts, "NAME_FUZZY_STRICT": nt, "NAME_FUZZY_FROM_TEXT": tt,
+                "SIMILARITY_THRESHOLD_ACCOUNT_CONTACT": st,
+                **dict(zip(["account_precision", "account_recall"], precision_recall(acc_pred, truth["account"]))),
+                **dict(zip(["contact_precision", "contact_recall"], precision_recall(con_pred, truth["contact"]))),
+                "seconds": round(acc_sec + con_sec, 3),
+            })
+
+        # ---------- Type per label threshold ----------
+        for lt in number_list(args.label_thresholds):
+            pred = pd.Series("", index=df.index)
+            for idx, chain in type_chains.items():
+                tier, value = chain[0]
+                if tier == "semantic":
+                    fuzzy = fuzzy_types.get(value)
+                    value = semantic_types.get(value) or (fuzzy[0] if fuzzy and fuzzy[1] >= lt else default_type)
+                pred.at[idx] = value
+            label_results.append({"STRIP_EMAIL_TEXT": strip, "TEXT_WINDOW_CHARS": window, "FUZZY_THRESHOLD_LABEL": lt,
+                                  **dict(zip(["type_precision", "type_recall"], precision_recall(pred, truth["type"])))})
+
+    engine.STRIP_EMAIL_TEXT, engine.TEXT_WINDOW_CHARS = current_prep
+
+    names = pd.DataFrame(name_results)
+    is_current_prep = lambda t: (t["STRIP_EMAIL_TEXT"] == current_prep[0]) & (t["TEXT_WINDOW_CHARS"] == current_prep[1])
+    names["current"] = (is_current_prep(names) & (names["name_scorer"] == engine.NAME_FUZZY_SCORER) & (names["text_scorer"] == engine.TEXT_FUZZY_SCORER)
+                        & (names["NAME_FUZZY_STRICT"] == engine.NAME_FUZZY_STRICT)
+                        & (names["NAME_FUZZY_FROM_TEXT"] == engine.NAME_FUZZY_FROM_TEXT)
+                        & (names["SIMILARITY_THRESHOLD_ACCOUNT_CONTACT"] == (engine.SIMILARITY_THRESHOLD_ACCOUNT_CONTACT if engine.USE_EMBEDDINGS else semantic_grid[0])))
+    names = names.sort_values(["seconds", "account_recall", "contact_recall", "account_precision", "contact_precision"],
+                              ascending=[True, False, False, False, False], kind="stable", na_position="last")
+    names.to_csv(args.output, index=False)
+    labels = pd.DataFrame(label_results)
+    labels["current"] = is_current_prep(labels) & (labels["FUZZY_THRESHOLD_LABEL"] == engine.FUZZY_THRESHOLD_LABEL)
+    labels = labels.sort_values(["type_precision", "type_recall"], ascending=False, kind="stable", na_position="last")
+    labels_path = Path(args.output).with_name(Path(args.output).stem + "_labels.csv")
+    labels.to_csv(labels_path, index=False)
+    print(f"{len(names)} name configurations written to: {args.output}")
+    print(f"{len(labels)} label thresholds written to: {labels_path}")
+
+    def meets(table: pd.DataFrame, fields: Tuple[str, ...]) -> pd.Series:
+        ok = pd.Series(True, index=table.index)
+        for field in fields:
+            # a field without known values in the golden set does not constrain the choice
+            ok &= table[f"{field}_precision"].fillna(1.0).ge(args.min_precision) & table[f"{field}_recall"].fillna(1.0).ge(args.min_recall)
+        return ok
+
+    show = ["STRIP_EMAIL_TEXT", "TEXT_WINDOW_CHARS", "name_scorer", "text_scorer", "NAME_FUZZY_STRICT", "NAME_FUZZY_FROM_TEXT"]
+    if engine.USE_EMBEDDINGS:
+        show.append("SIMILARITY_THRESHOLD_ACCOUNT_CONTACT")
+    show += ["account_precision", "account_recall", "contact_precision", "contact_recall", "seconds"]
+    label_show = ["STRIP_EMAIL_TEXT", "TEXT_WINDOW_CHARS", "FUZZY_THRESHOLD_LABEL", "type_precision", "type_recall"]
+    bar = f"precision >= {args.min_precision:.2f} and recall >= {args.min_recall:.2f}"
+    with pd.option_context("display.width", 250, "display.max_columns", None):
+        if names["current"].any():
+            print("\nCurrent name configuration:")
+            print(names.loc[names["current"], show].to_string(index=False))
+        ok = meets(names, ("account", "contact"))
+        print(f"\nFastest name configurations with {bar} on AccountId and ContactId:")
+        if ok.any():
+            print(names.loc[ok, show].head(args.top).to_string(index=False))
+        else:
+            print("  none; lower the bar or widen the grid. Most accurate ones:")
+            score = sum(names[f"{f}_recall"].fillna(0) + names[f"{f}_precision"].fillna(0) for f in ("account", "contact"))
+            print(names.loc[score.sort_values(ascending=False, kind="stable").index, show].head(args.top).to_string(index=False))
+
+        if labels["current"].any():
+            print("\nCurrent label threshold:")
+            print(labels.loc[labels["current"], label_show].to_string(index=False))
+        ok = meets(labels, ("type",))
+        print(f"\nLabel thresholds with {bar} on Type, most accurate first:")
+        print(labels.loc[ok, label_show].to_string(index=False) if ok.any() else
+              "  none; most accurate ones:\n" + labels[label_show].head(args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
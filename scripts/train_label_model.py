@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+train_label_model.py
+
+Trains the Type / Sub-Type / Category model used by MUSTAAAARD.py (see label_model.py) on cases
+whose labels were set by hand, e.g. the caseInfoQuery.txt export, and scores sheets with it.
+
+Examples:
+  python scripts/train_label_model.py train --input CaseInfo.csv
+  python scripts/train_label_model.py predict --input TESTME.xlsx --output label_predictions.csv
+
+train writes label_model.npz next to MUSTAAAARD.py (picked up automatically on the next run) and
+prints the accuracy on a held-out share of the labelled rows. Labels that are not in the
+ALLOWED_* lists of MUSTAAAARD.py are ignored.
+predict writes Id plus label and confidence per field for every row of the sheet.
+"""
+from pathlib import Path
+from typing import List, Tuple
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import MUSTAAAARD as engine  # noqa: E402
+import label_model  # noqa: E402
+import excel_io  # noqa: E402
+
+LABEL_FIELDS = [
+    ("Type", ["Type"], engine.ALLOWED_TYPES),
+    ("Sub_Type__c", ["Sub_Type__c", "Sub-Type", "Sub Type"], engine.ALLOWED_SUBTYPES),
+    ("Category__c", ["Category__c", "Category"], engine.ALLOWED_CATEGORIES),
+]
+
+
+def read_sheet(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".csv":
+        return engine.load_table(path)
+    return excel_io.read_sheet(path)[1]
+
+def case_texts(df: pd.DataFrame) -> List[Tuple[str, str, str]]:
+    """Normalized (summary, subject, description) per row, with the same column detection and email text preparation
+    (engine.matching_texts on summary / description) as process_cases."""
+    cols = df.columns.tolist()
+    picked = [engine.find_first_col(cols, ["Email Summary","_Email_Summary__c","Email_Summary__c","Summary","Email Subject"]),
+              engine.find_first_col(cols, ["Subject","Case Subject","Email_Subject__c"]),
+              engine.find_first_col(cols, ["Description","_Description","Description__c","Body","Email Body"])]
+    values = [df[c].fillna("").astype(str).tolist() if c else [""] * len(df) for c in picked]
+    values[0], values[2] = engine.matching_texts(values[0]), engine.matching_texts(values[2])
+    parts = [engine.normalize_text_series(pd.Series(v, dtype=str)).tolist() for v in values]
+    return list(zip(*parts))
+
+def take_rows(X: label_model.SparseRows, rows: np.ndarray) -> label_model.SparseRows:
+    """CSR sub-matrix of the given rows."""
+    indptr, indices, data = X
+    starts, lens = indptr[rows], indptr[rows + 1] - indptr[rows]
+    new_ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lens, out=new_ptr[1:])
+    sel = np.repeat(starts - new_ptr[:-1], lens) + np.arange(new_ptr[-1])
+    return new_ptr, indices[sel], data[sel]
+
+def train(args) -> None:
+    df = read_sheet(Path(args.input))
+    cols = df.columns.tolist()
+    fields, targets = [], []
+    for field, candidates, allowed in LABEL_FIELDS:
+        col = engine.find_first_col(cols, candidates)
+        if not col:
+            print(f"Warning: no {field} column in {args.input}; skipped")
+            continue
+        allowed_set = set(allowed)
+        vals = df[col].astype(str).str.strip()
+        ignored = int(((vals != "") & ~vals.isin(allowed_set)).sum())
+        if ignored:
+            print(f"{field}: {ignored} labels not in the allowed list ignored")
+        fields.append(field)
+        targets.append(vals.where(vals.isin(allowed_set), "").tolist())
+    if not fields:
+        print("ERROR: no label columns to train on")
+        sys.exit(1)
+
+    X = label_model.featurize(case_texts(df), args.bits)
+    order = np.random.RandomState(0).permutation(len(df))
+    n_test = int(len(df) * args.holdout)
+    test, fit_rows = np.sort(order[:n_test]), np.sort(order[n_test:])
+    if n_test:
+        model = label_model.LabelModel.fit(take_rows(X, fit_rows), [[t[i] for i in fit_rows] for t in targets], fields, args.alpha, args.bits)
+        for (labels, conf), field, t in zip(model.predict(take_rows(X, test)), fields, targets):
+            gold = np.array([t[i] for i in test])
+            has = gold != ""
+            pred = np.array(labels)
+            sure = has & (conf >= engine.LABEL_MODEL_MIN_CONFIDENCE)
+            print(f"{field}: held-out accuracy {np.mean(pred[has] == gold[has]):.3f} on {int(has.sum())} rows; "
+                  f"{np.mean(pred[sure] == gold[sure]) if sure.any() else 0:.3f} on the {int(sure.sum())} "
+                  f"at >= {engine.LABEL_MODEL_MIN_CONFIDENCE:.2f} confidence")
+    # the saved model is fitted on every labelled row
+    model = label_model.LabelModel.fit(X, targets, fields, args.alpha, args.bits)
+    out = Path(args.output)
+    model.save(out)
+    print(f"Model for {', '.join(f'{f} ({len(l)} labels)' for f, l in zip(model.fields, model.labels))} "
+          f"on {len(df)} rows, {len(model.feature_ids)} features -> {out}")
+
+def predict(args) -> None:
+    model = label_model.load_model(Path(args.model))
+    if model is None:
+        print(f"ERROR: no label model at {args.model}; run the train command first")
+        sys.exit(1)
+    df = read_sheet(Path(args.input))
+    id_col = engine.find_first_col(df.columns.tolist(), ["Id", "Case Id", "CaseId"])
+    out = pd.DataFrame({"Id": df[id_col] if id_col else ""})
+    for field, (labels, conf) in zip(model.fields, model.predict(label_model.featurize(case_texts(df), model.bits))):
+        out[field] = labels
+        out[f"{field}_confidence"] = np.round(conf, 4)
+    out.to_csv(args.output, index=False, encoding="utf-8")
+    print(f"{len(out)} rows scored -> {args.output}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train / apply the Type / Sub-Type / Category label model.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("train", help="fit the model on hand-labelled cases")
+    p.add_argument("--input", required=True, help="labelled cases (CSV or Excel) with Type / Sub_Type__c / Category__c")
+    p.add_argument("--output", default=str(engine.LABEL_MODEL_PATH), help=f"model file (default {engine.LABEL_MODEL_PATH.name} next to MUSTAAAARD.py)")
+    p.add_argument("--holdout", type=float, default=0.1, help="share of rows held out to report accuracy (default 0.1; 0 = none)")
+    p.add_argument("--alpha", type=float, default=1.0, help="Naive Bayes smoothing (default 1.0)")
+    p.add_argument("--bits", type=int, default=label_model.FEATURE_BITS, help=f"hash buckets = 2**bits (default {label_model.FEATURE_BITS})")
+    p = sub.add_parser("predict", help="score every row of a sheet")
+    p.add_argument("--input", required=True, help="cases (CSV or Excel)")
+    p.add_argument("--output", default="label_predictions.csv")
+    p.add_argument("--model", default=str(engine.LABEL_MODEL_PATH))
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        train(args)
+    else:
+        predict(args)
+
+if __name__ == "__main__":
+    main()
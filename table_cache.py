@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+table_cache.py
+
+Columnar cache of parsed input tables (the Accounts / Contacts exports and the case sheet), so
+re-runs on unchanged files skip CSV / Excel parsing.
+
+Entries are content addressed: <sha1 of the source file>-<variant>.feather when pyarrow is
+installed (pip install pyarrow), else .pkl (pandas pickle), where variant says how the file was
+read (e.g. which sheet). index.json remembers each source path's size / mtime / sha1, so an
+unchanged file is not re-hashed; when a file changes it gets a new hash, its old entries are
+deleted and the table is parsed again.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+import json
+import os
+import re
+
+import pandas as pd
+
+from lookup_index import file_fingerprint, file_sha1
+
+try:
+    import pyarrow  # noqa: F401  (DataFrame.to_feather / read_feather backend)
+    FORMAT = "feather"
+except Exception:
+    FORMAT = "pkl"
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+
+class TableCache:
+    def __init__(self, cache_dir: Path):
+        self.dir = Path(cache_dir)
+        self.sources: Dict[str, Dict[str, object]] = {}   # abs path -> {size, mtime_ns, sha1, entries: {file: meta}}
+        self.hits = self.misses = 0
+        index_path = self.dir / INDEX_FILE
+        if index_path.exists():
+            try:
+                meta = json.loads(index_path.read_text(encoding="utf-8"))
+                if meta.get("version") == FORMAT_VERSION:
+                    self.sources = meta["sources"]
+            except Exception as e:
+                print(f"Warning: table cache index at {index_path} is unreadable ({e}); starting empty.")
+
+    def _save_index(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.dir / (INDEX_FILE + ".tmp")
+        tmp.write_text(json.dumps({"version": FORMAT_VERSION, "sources": self.sources}), encoding="utf-8")
+        os.replace(tmp, self.dir / INDEX_FILE)
+
+    def _source_hash(self, path: Path) -> str:
+        """sha1 of path, re-hashed only when its size / mtime moved; entries of an older content are dropped."""
+        key = str(path.resolve())
+        fp = file_fingerprint(path, with_hash=False)
+        src = self.sources.get(key)
+        if src and src["size"] == fp["size"] and src["mtime_ns"] == fp["mtime_ns"]:
+            return src["sha1"]
+        sha1 = file_sha1(path)
+        if src and src["sha1"] != sha1:
+            for name in src.get("entries", {}):
+                (self.dir / name).unlink(missing_ok=True)
+        entries = src.get("entries", {}) if src and src["sha1"] == sha1 else {}
+        self.sources[key] = dict(fp, sha1=sha1, entries=entries)
+        return sha1
+
+    def get(self, path: Path, variant: str, loader: Callable[[], Tuple[pd.DataFrame, Dict[str, object]]]) -> Tuple[pd.DataFrame, Dict[str, object]]:
+        """
+        (table, meta) for path read the way variant names. loader() parses the file and returns
+        (DataFrame, small JSON-able meta such as the sheet name); it only runs on a cache miss.
+        """
+        path = Path(path)
+        sha1 = self._source_hash(path)
+        src = self.sources[str(path.resolve())]
+        name = f"{sha1}-{re.sub(r'[^A-Za-z0-9_.-]', '_', variant)}.{FORMAT}"
+        entry_path = self.dir / name
+        if name in src["entries"] and entry_path.exists():
+            try:
+                df = pd.read_feather(entry_path) if FORMAT == "feather" else pd.read_pickle(entry_path)
+                self.hits += 1
+                return df, src["entries"][name]
+            except Exception as e:
+                print(f"Warning: table cache entry {entry_path} is unreadable ({e}); re-reading {path.name}.")
+        df, meta = loader()
+        self.misses += 1
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.dir / (name + ".tmp")
+            if FORMAT == "feather":
+                df.reset_index(drop=True).to_feather(tmp)
+            else:
+                df.to_pickle(tmp)
+            os.replace(tmp, entry_path)
+            src["entries"][name] = meta
+            self._save_index()
+        except Exception as e:
+            print(f"Warning: could not write table cache entry {entry_path}: {e}")
+        return df, meta
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the engine and its helper modules live at the repository root, next to MUSTAAAARD.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,44 @@
+import pytest
+
+import auto_case_filter
+
+QUERY = """SELECT Id FROM Case
+WHERE (Subject LIKE 'Your Daily Digest%' OR Subject LIKE '%Missed Call%' OR Subject LIKE 'IME _cheduled'
+       OR SuppliedEmail = 'events@send.zapier.com')
+AND (NOT Subject LIKE 'RE:%')
+AND Id != '500EXCLUDED'
+ORDER BY CreatedDate DESC"""
+
+
+@pytest.fixture
+def query():
+    return auto_case_filter.parse_query(QUERY, "q.txt")
+
+def test_like_to_regex():
+    assert auto_case_filter.like_to_regex("a%b_c") == "a.*b.c"
+    assert auto_case_filter.like_to_regex(r"100\%") == "100%"
+
+def test_prefix_contains_and_single_char_wildcards(query):
+    assert query.match({"subject": "your daily digest for monday"}, "1") == "subject"
+    assert query.match({"subject": "fwd: missed call from 555"}, "1") == "subject"
+    assert query.match({"subject": "ime scheduled"}, "1") == "subject"
+    assert query.match({"subject": "ime rescheduled"}, "1") is None
+
+def test_equals_on_another_field(query):
+    assert query.match({"subject": "hello", "suppliedemail": "events@send.zapier.com"}, "1") == "suppliedemail"
+
+def test_exclusions_rescue_a_case(query):
+    assert query.match({"subject": "re: your daily digest"}, "1") is None
+    assert query.match({"subject": "your daily digest"}, "500EXCLUDED") is None
+
+def test_missing_field_is_null(query):
+    assert query.match({}, "1") is None
+
+def test_scan_is_case_insensitive_and_names_the_rule(query):
+    reasons = auto_case_filter.scan([query], {"subject": ["YOUR DAILY DIGEST", "Question about invoice"]}, ["1", "2"])
+    assert reasons[0] == "q.txt: subject LIKE 'Your Daily Digest%'"
+    assert reasons[1] == ""
+
+def test_query_without_where_is_rejected():
+    with pytest.raises(ValueError):
+        auto_case_filter.parse_query("SELECT Id FROM Case")
@@ -0,0 +1,32 @@
+from case_state import CaseStateStore, config_hash, row_hashes
+
+COLUMNS = ["Id", "Subject"]
+CONFIG = {"thresholds": [85, 90], "labels": ["Billing"]}
+
+
+def stored(tmp_path):
+    store = CaseStateStore(tmp_path / "state.sqlite")
+    hashes = row_hashes(COLUMNS, [["500A", "refund"], ["500B", "login"]])
+    store.store(["500A", "500B"], hashes, config_hash(CONFIG), [{"Type": "Billing"}, {"Type": ""}])
+    return store, hashes
+
+def test_unchanged_cases_are_reused_across_runs(tmp_path):
+    store, hashes = stored(tmp_path)
+    store.close()
+    store = CaseStateStore(tmp_path / "state.sqlite")
+    assert store.lookup(["500A", "500B", "500C"], hashes + ["x"], config_hash(dict(CONFIG))) == [
+        {"Type": "Billing"}, {"Type": ""}, None]
+    assert len(store) == 2
+    store.close()
+
+def test_changed_input_is_reprocessed(tmp_path):
+    store, hashes = stored(tmp_path)
+    edited = row_hashes(COLUMNS, [["500A", "refund please"]])
+    assert store.lookup(["500A", "500B"], edited + hashes[1:], config_hash(CONFIG)) == [None, {"Type": ""}]
+    assert row_hashes(["Id", "Summary"], [["500B", "login"]]) != hashes[1:]
+    store.close()
+
+def test_changed_config_is_reprocessed(tmp_path):
+    store, hashes = stored(tmp_path)
+    assert store.lookup(["500A", "500B"], hashes, config_hash({**CONFIG, "thresholds": [80, 90]})) == [None, None]
+    store.close()
@@ -0,0 +1,52 @@
+import email_text
+
+REPLY = """Hi team,
+
+Please update the billing address for Acme Widgets.
+
+Thanks,
+Jane Doe
+Acme Widgets
+555-0100
+www.acme.example
+
+From: Support <support@example.com>
+Sent: Monday, January 1, 2024 9:00 AM
+To: Jane Doe
+Subject: RE: Billing
+
+Earlier message about Summit Motors."""
+
+
+def test_reply_keeps_the_newest_message_and_the_name_lines():
+    out = email_text.strip_email(REPLY)
+    assert out.startswith("Hi team,")
+    assert "Acme Widgets" in out and "Jane Doe" in out
+    assert "555-0100" not in out
+    assert "Summit Motors" not in out
+
+def test_quoted_lines_mobile_signature_and_footer_are_dropped():
+    text = ("Can you reset my password?\n"
+            "> old quoted text\n"
+            "Sent from my iPhone\n"
+            "CONFIDENTIALITY NOTICE: this message is private.")
+    assert email_text.strip_email(text) == "Can you reset my password?"
+
+def test_gmail_history_and_sig_delimiter():
+    assert email_text.strip_email("Invoice attached.\n-- \nJane\nOn Mon, Jan 1, 2024 Bob wrote:\n> hi") == "Invoice attached."
+    assert email_text.strip_email("New request.\nOn Mon, Jan 1, 2024 at 9:00 AM Bob <b@x.com> wrote:\nold") == "New request."
+
+def test_a_bare_forward_keeps_the_forwarded_message():
+    text = "---------- Forwarded message ---------\nFrom: Bob <b@x.com>\nDate: Mon\n\nThe forwarded request."
+    assert "The forwarded request." in email_text.strip_email(text)
+
+def test_plain_text_is_unchanged_and_crlf_is_normalized():
+    assert email_text.strip_email("Printer is jammed") == "Printer is jammed"
+    assert email_text.strip_email("line one_x000D_\r\nline two") == "line one\nline two"
+
+def test_window_cuts_back_to_a_word_boundary():
+    text = "word " * 300
+    out = email_text.window(text, 1000)
+    assert len(out) <= 1000 and out.endswith("word")
+    assert email_text.window(text, 0) == text
+    assert email_text.matching_text(text, strip=False, max_chars=10) == "word word"
@@ -0,0 +1,54 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+VECTORS = {t: np.eye(DIM, dtype=np.float32)[i] for i, t in enumerate("abcd")}
+VECTORS["e"] = np.full(DIM, 0.5, dtype=np.float32)
+
+
+class Encoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([VECTORS[t] for t in texts])
+
+def small_cache(path, rows=3):
+    return EmbeddingCache(path, "model", max_bytes=rows * DIM * 4)
+
+def assert_rows(out, texts):
+    for row, t in zip(out, texts):
+        assert (row == VECTORS[t]).all(), t
+
+def test_only_missing_texts_are_encoded_once(tmp_path):
+    cache, encode = small_cache(tmp_path, rows=8), Encoder()
+    assert_rows(cache.get_or_encode(["a", "b", "a"], encode), ["a", "b", "a"])
+    assert_rows(cache.get_or_encode(["b", "c"], encode), ["b", "c"])
+    assert encode.calls == [["a", "b"], ["c"]]
+
+def test_eviction_does_not_overwrite_vectors_of_the_current_batch(tmp_path):
+    cache, encode = small_cache(tmp_path), Encoder()
+    cache.get_or_encode(["a", "b", "c"], encode)
+    # a full cache: storing d / e must not reuse the rows a and b were just read from
+    assert_rows(cache.get_or_encode(["a", "b", "d", "e"], encode), ["a", "b", "d", "e"])
+    assert_rows(cache.get_or_encode(["a", "b"], encode), ["a", "b"])
+    assert cache.stats()["entries"] <= 3
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache, encode = small_cache(tmp_path), Encoder()
+    cache.get_or_encode(["a", "b", "c"], encode)
+    cache.get_or_encode(["a"], encode)
+    cache.get_or_encode(["d"], encode)
+    encode.calls.clear()
+    cache.get_or_encode(["a", "c", "d"], encode)
+    assert encode.calls == []
+
+def test_saved_cache_is_reloaded(tmp_path):
+    cache, encode = small_cache(tmp_path, rows=8), Encoder()
+    cache.get_or_encode(["a", "b"], encode)
+    cache.save()
+    reloaded, encode2 = small_cache(tmp_path, rows=8), Encoder()
+    assert_rows(reloaded.get_or_encode(["b", "a"], encode2), ["b", "a"])
+    assert encode2.calls == []
@@ -0,0 +1,52 @@
+import pandas as pd
+from openpyxl import Workbook
+
+import excel_io
+
+
+def write_xlsx(path, rows, sheet="Full Acc and Contact"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+def test_na_placeholders_blank_like_read_excel(tmp_path):
+    rows = [["Account Name", "NA", "Subject"],
+            ["NA", "x", "N/A"], ["null", "x", "None"], [" NA", "x", "n/a please"], ["#N/A", "x", "Acme"]]
+    path = write_xlsx(tmp_path / "cases.xlsx", rows)
+    _, df = excel_io.read_sheet(path)
+    expected = pd.read_excel(path, dtype=str).fillna("")
+    assert list(df.columns) == list(expected.columns) == ["Account Name", "NA", "Subject"]
+    assert df.values.tolist() == expected.values.tolist()
+    assert df["Account Name"].tolist() == ["", "", " NA", ""]
+
+def test_header_gaps_and_repeats_are_named_like_pandas(tmp_path):
+    path = write_xlsx(tmp_path / "cases.xlsx", [["Subject", None, "Subject", "Subject"], ["a", "b", "c", "d"]])
+    _, df = excel_io.read_sheet(path)
+    assert list(df.columns) == list(pd.read_excel(path, dtype=str).columns) == ["Subject", "Unnamed: 1", "Subject.1", "Subject.2"]
+
+def test_numbers_errors_and_trailing_rows(tmp_path):
+    rows = [["Id", "Count", "Score", "Formula"], ["500A", 3, 2.5, "#DIV/0!"], ["500B", 4.0, None, "#N/A"], [None] * 4, [None] * 4]
+    path = write_xlsx(tmp_path / "cases.xlsx", rows)
+    _, df = excel_io.read_sheet(path)
+    assert df.values.tolist() == [["500A", "3", "2.5", ""], ["500B", "4", "", ""]]
+    assert df.values.tolist() == pd.read_excel(path, dtype=str).fillna("").values.tolist()
+
+def test_chunks_continue_the_index(tmp_path):
+    path = write_xlsx(tmp_path / "cases.xlsx", [["Id"]] + [[f"500{i}"] for i in range(5)])
+    chunks = list(excel_io.iter_sheet_chunks(path, chunk_rows=2))
+    assert [list(c.index) for c in chunks] == [[0, 1], [2, 3], [4]]
+
+def test_write_workbook_replaces_only_the_sheet(tmp_path):
+    source = tmp_path / "cases.xlsx"
+    wb = Workbook()
+    wb.active.title = "Full Acc and Contact"
+    wb.active.append(["Id"])
+    wb.create_sheet("Notes").append(["keep", 1])
+    wb.save(source)
+    excel_io.write_workbook(tmp_path / "out.xlsx", source, "Full Acc and Contact", pd.DataFrame({"Id": ["500A"], "AccountId": ["001A"]}))
+    assert pd.read_excel(tmp_path / "out.xlsx", sheet_name=None, dtype=str, header=None)["Notes"].values.tolist() == [["keep", "1"]]
+    assert excel_io.read_sheet(tmp_path / "out.xlsx")[1].values.tolist() == [["500A", "001A"]]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from label_model import LabelModel, featurize, load_model
+
+FIELDS = ["Type", "Category"]
+ROWS = [("refund invoice", "billing question", ""), ("invoice overcharged", "refund", ""),
+        ("password reset", "cannot login", ""), ("login locked", "password", "")]
+TARGETS = [["Billing", "Billing", "Access", "Access"], ["Money", "", "Account", "Account"]]
+
+
+def fitted():
+    return LabelModel.fit(featurize(ROWS, bits=12), TARGETS, FIELDS, bits=12)
+
+def test_fit_predicts_training_labels():
+    (types, type_conf), (cats, _) = fitted().predict(featurize(ROWS, bits=12))
+    assert types == TARGETS[0]
+    assert cats[2:] == ["Account", "Account"]
+    assert ((type_conf > 0.5) & (type_conf <= 1.0)).all()
+
+def test_unseen_text_still_scores():
+    (types, conf), _ = fitted().predict(featurize([("refund", "", ""), ("", "", "")], bits=12))
+    assert types[0] == "Billing"
+    assert np.isfinite(conf).all()
+
+def test_save_load_round_trip(tmp_path):
+    model = fitted()
+    model.save(tmp_path / "label_model.npz")
+    loaded = load_model(tmp_path / "label_model.npz")
+    assert loaded.fields == FIELDS and loaded.labels == model.labels and loaded.bits == 12
+    X = featurize(ROWS, bits=12)
+    assert np.allclose(loaded.decision_scores(X), model.decision_scores(X))
+
+def test_missing_or_broken_model_is_none(tmp_path, capsys):
+    assert load_model(tmp_path / "none.npz") is None
+    (tmp_path / "bad.npz").write_bytes(b"not a model")
+    assert load_model(tmp_path / "bad.npz") is None
+    assert "unreadable" in capsys.readouterr().out
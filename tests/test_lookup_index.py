@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+import lookup_index
+
+NORM_MAP = {
+    "acme widgets": [("001A", "ACME Widgets Inc", "")],
+    "summit motors": [("001B", "Summit Motors", ""), ("001C", "Summit Motors LLC", "")],
+    "zoë café": [("001D", "Zoë Café", "")],
+}
+CHOICES = list(NORM_MAP)
+
+
+def candidate_index(choices):
+    tokens, grams = {}, {}
+    for i, c in enumerate(choices):
+        for tok in set(c.split()):
+            tokens.setdefault(tok, []).append(i)
+        for g in {c[j:j + 3] for j in range(len(c) - 2)}:
+            grams.setdefault(g, []).append(i)
+    as_arrays = lambda post: {k: np.asarray(v, dtype=np.int32) for k, v in post.items()}
+    return {"tokens": as_arrays(tokens), "grams": as_arrays(grams)}
+
+def write_source(tmp_path, text="Id,Name\n001A,ACME Widgets Inc\n"):
+    source = tmp_path / "Accounts.csv"
+    source.write_text(text, encoding="utf-8")
+    return source
+
+def test_round_trip(tmp_path):
+    source = write_source(tmp_path)
+    index = candidate_index(CHOICES)
+    lookup_index.save(tmp_path / "idx", source, NORM_MAP, CHOICES, index)
+    norm_map, choices, loaded = lookup_index.load(tmp_path / "idx", source)
+    assert list(choices) == CHOICES
+    assert dict(norm_map.items()) == NORM_MAP
+    assert "missing" not in norm_map
+    assert loaded["size"] == len(CHOICES)
+    assert loaded["tokens"].get("summit").tolist() == [1]
+    assert loaded["grams"].get("caf").tolist() == [2]
+    assert loaded["tokens"].get("nope") is None
+
+def test_changed_source_invalidates_and_touched_source_does_not(tmp_path):
+    source = write_source(tmp_path)
+    lookup_index.save(tmp_path / "idx", source, NORM_MAP, CHOICES, candidate_index(CHOICES))
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert lookup_index.load(tmp_path / "idx", source) is not None
+    source.write_text("Id,Name\n001A,ACME Widgets Ltd\n", encoding="utf-8")
+    assert lookup_index.load(tmp_path / "idx", source) is None
+
+def test_missing_index_loads_nothing(tmp_path):
+    assert lookup_index.load(tmp_path / "idx", write_source(tmp_path)) is None
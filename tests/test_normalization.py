@@ -0,0 +1,24 @@
+import pandas as pd
+
+import MUSTAAAARD as engine
+
+
+def test_normalize_company_drops_punctuation_case_and_suffixes():
+    assert engine.normalize_company("ACME Widgets, Inc.") == "acme widgets"
+    assert engine.normalize_company("  Summit   Motors LLC ") == "summit motors"
+
+def test_normalize_person_flips_last_first():
+    assert engine.normalize_person("Doe, Jane") == "jane doe"
+    assert engine.normalize_person("Jane  Doe!") == "jane doe"
+
+def test_series_normalizers_match_the_scalar_ones():
+    names = ["ACME Widgets, Inc.", "Summit Motors LLC", "", "O'Brien & Sons Co", "x_x000D_y\r\nz"]
+    people = ["Doe, Jane", "Jane Doe", "", "Smith,John"]
+    assert engine.normalize_company_series(pd.Series(names)).tolist() == [engine.normalize_company(n) for n in names]
+    assert engine.normalize_person_series(pd.Series(people)).tolist() == [engine.normalize_person(p) for p in people]
+    assert engine.normalize_text_series(pd.Series(names)).tolist() == [engine.normalize_text(n) for n in names]
+
+def test_candidate_shortlist_normalizes_the_query():
+    choices = [f"company {i} x" for i in range(200)] + ["acme widgets"]
+    index = engine.build_candidate_index(choices)
+    assert len(choices) - 1 in engine.candidate_shortlist("ACME, Widgets!", index, 5)
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from upsert_export import changed_cells, upsert_frame, write_upsert_files
+
+
+def frame():
+    before = pd.Series(["001A", "001B", "", "001D"])
+    after = pd.Series(["001A", "001X", "", " 001D "])
+    ids = pd.Series(["500A", "500B", "500C", ""])
+    return ids, before, after
+
+def test_changed_cells_keeps_only_new_values():
+    _, before, after = frame()
+    assert changed_cells(before, after).tolist() == ["", "001X", "", ""]
+
+def test_empty_cell_is_no_change():
+    cells = changed_cells(pd.Series(["001A", "Billing"]), pd.Series(["", ""]))
+    assert cells.tolist() == ["", ""]
+
+def test_upsert_frame_drops_unchanged_rows_and_fields():
+    ids, before, after = frame()
+    out = upsert_frame(ids, {"AccountId": changed_cells(before, after), "Type": pd.Series([""] * 4)})
+    assert list(out.columns) == ["Id", "AccountId"]
+    assert out.values.tolist() == [["500B", "001X"]]
+    no_id = upsert_frame(ids, {"Type": pd.Series(["", "", "", "Billing"])})
+    assert no_id.empty
+    kept = upsert_frame(ids, {"AccountId": changed_cells(before, after), "Type": pd.Series([""] * 4)}, keep_all_fields=True)
+    assert list(kept.columns) == ["Id", "AccountId", "Type"]
+
+def read_files(paths):
+    return [p.read_text(encoding="utf-8").splitlines() for p in paths]
+
+def test_files_roll_over_on_rows_and_size(tmp_path):
+    df = pd.DataFrame({"Id": [f"500{i}" for i in range(5)], "Type": ["Billing"] * 5})
+    by_rows = write_upsert_files(df, tmp_path / "rows", max_rows=2)
+    assert [p.name for p in by_rows] == ["Case_upsert_001.csv", "Case_upsert_002.csv", "Case_upsert_003.csv"]
+    assert [len(lines) for lines in read_files(by_rows)] == [3, 3, 2]
+    assert all(lines[0] == "Id,Type" for lines in read_files(by_rows))
+    line = len("5000,Billing\n")
+    by_size = write_upsert_files(df, tmp_path / "size", max_bytes=len("Id,Type\n") + 2 * line)
+    assert [len(lines) - 1 for lines in read_files(by_size)] == [2, 2, 1]
+
+def test_old_files_are_removed_and_nothing_written_without_changes(tmp_path):
+    df = pd.DataFrame({"Id": ["500A", "500B", "500C"], "Type": ["Billing"] * 3})
+    assert len(write_upsert_files(df, tmp_path, max_rows=1)) == 3
+    assert write_upsert_files(df.iloc[:0], tmp_path) == []
+    assert list(tmp_path.glob("Case_upsert_*.csv")) == []
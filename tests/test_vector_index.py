@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+def unit_rows(n, dim=32, seed=0):
+    v = np.random.RandomState(seed).randn(n, dim).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+@pytest.fixture
+def data():
+    return unit_rows(500), unit_rows(40, seed=1)
+
+def brute_force(vectors, queries, k):
+    sims = queries @ vectors.T
+    return np.argsort(-sims, axis=1, kind="stable")[:, :k], np.sort(sims, axis=1)[:, ::-1][:, :k]
+
+def test_exact_search_matches_brute_force(data):
+    vectors, queries = data
+    ids, scores = VectorIndex.build(vectors).search(queries, k=5)
+    want_ids, want_scores = brute_force(vectors, queries, 5)
+    assert (ids == want_ids).all()
+    assert np.allclose(scores, want_scores, atol=1e-5)
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scores_stay_close(data, dtype):
+    vectors, queries = data
+    _, scores = VectorIndex.build(vectors, dtype).search(queries, k=1)
+    assert np.allclose(scores[:, 0], brute_force(vectors, queries, 1)[1][:, 0], atol=2e-2)
+
+def test_ivf_probing_every_list_is_exact(data):
+    vectors, queries = data
+    index = VectorIndex.build(vectors, ivf=True)
+    ids, _ = index.search(queries, k=3, nprobe=len(index.centroids))
+    assert (ids == brute_force(vectors, queries, 3)[0]).all()
+
+def test_fewer_vectors_than_k_are_padded():
+    ids, scores = VectorIndex.build(unit_rows(2)).search(unit_rows(1, seed=3), k=4)
+    assert ids[0, 2:].tolist() == [-1, -1] and np.isneginf(scores[0, 2:]).all()
+
+def test_save_and_load(tmp_path, data):
+    vectors, queries = data
+    index = VectorIndex.build(vectors, "int8", key="model|abc")
+    index.save(tmp_path)
+    assert VectorIndex.load(tmp_path, "other key") is None
+    loaded = VectorIndex.load(tmp_path, "model|abc")
+    assert (loaded.search(queries, k=2)[0] == index.search(queries, k=2)[0]).all()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+upsert_export.py
+
+Case upsert files for Salesforce Bulk API 2.0 (also fine for Data Loader / the Inspector's Data
+Import): only the cases whose fields actually changed, with Id plus those fields under their API
+names, split into CSV files of bounded size.
+
+Bulk API 2.0 CSV: UTF-8, comma separated, LF line endings, API field names in the header. An empty
+cell leaves the field as it is in Salesforce, so a row only carries the fields that changed for
+that case. Every file repeats the header and can be uploaded as its own job.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+import csv
+import io
+
+import pandas as pd
+
+BULK_API_MAX_BYTES = 100 * 1024 * 1024     # per job upload: 150 MB hard limit, 100 MB recommended (base64 overhead)
+FILE_PREFIX = "Case_upsert"
+
+
+def changed_cells(before: pd.Series, after: pd.Series) -> pd.Series:
+    """after where it is non-empty and differs from before, else "" (left as is by the upsert)."""
+    b = before.astype(str).str.strip()
+    a = after.astype(str).str.strip()
+    return a.where((a != "") & (a != b), "")
+
+def upsert_frame(ids: pd.Series, fields: Dict[str, pd.Series], keep_all_fields: bool = False) -> pd.DataFrame:
+    """
+    Id + changed_cells per API field for the rows with at least one change and an Id. fields maps
+    the API name to its changed_cells series; fields nothing changed in are left out unless
+    keep_all_fields (a streamed export needs the same header in every chunk).
+    """
+    out = pd.DataFrame({"Id": ids.astype(str).str.strip()})
+    for api, cells in fields.items():
+        if keep_all_fields or (cells != "").any():
+            out[api] = cells
+    value_cols = [c for c in out.columns if c != "Id"]
+    changed = (out[value_cols] != "").any(axis=1) if value_cols else pd.Series(False, index=out.index)
+    return out[changed & (out["Id"] != "")]
+
+
+class UpsertWriter:
+    """Rows into <prefix>_001.csv, <prefix>_002.csv, ... each at most max_bytes (and max_rows when > 0) with the header."""
+
+    def __init__(self, out_dir: Path, header: Sequence[str], max_bytes: int = BULK_API_MAX_BYTES, max_rows: int = 0,
+                 prefix: str = FILE_PREFIX):
+        self.dir = Path(out_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for old in self.dir.glob(f"{prefix}_*.csv"):      # files of an earlier run would be uploaded again
+            old.unlink()
+        self.header = list(header)
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.prefix = prefix
+        self.files: List[Path] = []
+        self.rows = 0
+        self._fh = None
+        self._buf = io.StringIO()
+        self._csv = csv.writer(self._buf, lineterminator="\n")
+        self._header_line = self._line(self.header)
+
+    def _line(self, row: Sequence[object]) -> bytes:
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._csv.writerow(row)
+        return self._buf.getvalue().encode("utf-8")
+
+    def _next_file(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        path = self.dir / f"{self.prefix}_{len(self.files) + 1:03d}.csv"
+        self._fh = open(path, "wb")
+        self._fh.write(self._header_line)
+        self.files.append(path)
+        self._file_bytes, self._file_rows = len(self._header_line), 0
+
+    def write_rows(self, rows: Iterable[Sequence[object]]) -> None:
+        for row in rows:
+            line = self._line(row)
+            if (self._fh is None or (self._file_rows and self._file_bytes + len(line) > self.max_bytes)
+                    or (self.max_rows and self._file_rows >= self.max_rows)):
+                self._next_file()
+            self._fh.write(line)
+            self._file_bytes += len(line)
+            self._file_rows += 1
+            self.rows += 1
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        self.write_rows(df.reindex(columns=self.header, fill_value="").itertuples(index=False, name=None))
+
+    def close(self) -> List[Path]:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        return self.files
+
+def write_upsert_files(df: pd.DataFrame, out_dir: Path, max_bytes: int = BULK_API_MAX_BYTES, max_rows: int = 0) -> List[Path]:
+    """upsert_frame output as size-bounded CSV files; no file when nothing changed."""
+    writer = UpsertWriter(out_dir, df.columns, max_bytes, max_rows)
+    writer.write_frame(df)
+    return writer.close()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+vector_index.py
+
+Nearest-neighbour index over L2-normalized embeddings (the account / contact names of the semantic
+tier in MUSTAAAARD.py), so a batch of queries is answered with NumPy matrix products instead of one
+torch cos_sim call per text.
+
+ - exact search: queries x vectors scored in blocks (block_rows queries against block_cols vectors),
+   the k best of each block kept with argpartition and merged, so no full similarity matrix is held.
+ - storage dtype: float32, float16 (half the memory) or int8 (a quarter; each vector is scaled by its
+   largest component / 127). Blocks are widened to float32 for the product; quantized scores are
+   within about 1e-2 of the float32 ones.
+ - IVF (optional, for very large contact sets): vectors are grouped under sqrt(n) spherical k-means
+   centroids and stored list by list; a query only scores the lists of its nprobe closest centroids.
+   Much faster, but no longer exact: a neighbour in an unprobed list is missed.
+
+Layout on disk (one folder): meta.json {"version", "count", "dim", "dtype", "nlist", "key"},
+vectors.npy (+ scales.npy for int8), ids.npy / list_start.npy / centroids.npy for IVF. Arrays are
+memory-mapped on load; meta.json is written last, so a half-written folder is never loaded. key is
+whatever the caller uses to tell the index still matches its inputs (model, choice list hash).
+"""
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+DTYPES = ("float32", "float16", "int8")
+BLOCK_ROWS = 1024         # queries per block
+BLOCK_COLS = 16384        # vectors per block (widened to float32 one block at a time)
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+
+# ---------------- helpers ----------------
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    if dtype == "float32":
+        return np.ascontiguousarray(vectors, dtype=np.float32), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1).astype(np.float32) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales
+    raise ValueError(f"unknown vector dtype {dtype!r}; use one of {DTYPES}")
+
+def _merge_topk(best_s: np.ndarray, best_i: np.ndarray, s: np.ndarray, i: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row, the k highest of the current (best_s, best_i) and the new candidates (s, i)."""
+    all_s = np.concatenate([best_s, s], axis=1)
+    all_i = np.concatenate([best_i, i], axis=1)
+    if all_s.shape[1] <= k:
+        return all_s, all_i
+    # k == 1: argmax keeps the earlier candidate on ties (lower id in the exact scan, like a plain argmax)
+    part = all_s.argmax(axis=1)[:, None] if k == 1 else np.argpartition(-all_s, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(all_s, part, axis=1), np.take_along_axis(all_i, part, axis=1)
+
+def _block_topk(sims: np.ndarray, offset: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(scores, column indices + offset) of the k best columns per row of one similarity block."""
+    if k == 1:
+        best = sims.argmax(axis=1)[:, None]
+    elif sims.shape[1] > k:
+        best = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        best = np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+    return np.take_along_axis(sims, best, axis=1), best + offset
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST), replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.concatenate([(sample[s:s + BLOCK_COLS] @ centroids.T).argmax(axis=1)
+                                 for s in range(0, len(sample), BLOCK_COLS)])
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        norms = np.linalg.norm(sums, axis=1)
+        filled = norms > 0
+        centroids[filled] = sums[filled] / norms[filled, None]     # empty lists keep their old centroid
+    return centroids
+
+
+# ---------------- index ----------------
+class VectorIndex:
+    def __init__(self, vectors: np.ndarray, scales: Optional[np.ndarray] = None, centroids: Optional[np.ndarray] = None,
+                 list_start: Optional[np.ndarray] = None, ids: Optional[np.ndarray] = None, key: str = ""):
+        self.vectors = vectors          # stored dtype, list by list when IVF
+        self.scales = scales            # int8 only: per-vector scale
+        self.centroids = centroids      # IVF only
+        self.list_start = list_start    # IVF only: vectors[list_start[l]:list_start[l + 1]] belong to list l
+        self.ids = ids                  # IVF only: original row of each stored vector
+        self.key = key
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, dtype: str = "float32", ivf: bool = False, key: str = "") -> "VectorIndex":
+        """Index of L2-normalized vectors (row i answers as id i); ivf adds the coarse tier (sqrt(n) lists)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not ivf or len(vectors) < 4:
+            return cls(*_quantize(vectors, dtype), key=key)
+        nlist = max(1, int(np.sqrt(len(vectors))))
+        centroids = _spherical_kmeans(vectors, nlist)
+        assign = np.concatenate([(vectors[s:s + BLOCK_COLS] @ centroids.T).argmax(axis=1)
+                                 for s in range(0, len(vectors), BLOCK_COLS)])
+        ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_start = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=list_start[1:])
+        stored, scales = _quantize(vectors[ids], dtype)
+        return cls(stored, scales, centroids, list_start, ids, key)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def dtype(self) -> str:
+        return str(self.vectors.dtype)
+
+    def _scores(self, queries: np.ndarray, start: int, stop: int) -> np.ndarray:
+        block = np.asarray(self.vectors[start:stop], dtype=np.float32)
+        sims = queries @ block.T
+        if self.scales is not None:
+            sims *= self.scales[start:stop]
+        return sims
+
+    def search(self, queries: np.ndarray, k: int = 1, nprobe: int = 16) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, scores) of the k nearest vectors per query (rows = queries, best first; ids -1 / scores
+        -inf where fewer than k exist). queries must be L2-normalized. nprobe only matters with IVF.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        n = len(queries)
+        if self.centroids is None:
+            kk = min(k, len(self.vectors))
+            best_s = np.full((n, kk), -np.inf, dtype=np.float32)
+            best_i = np.full((n, kk), -1, dtype=np.int64)
+            for q0 in range(0, n, BLOCK_ROWS):
+                q = queries[q0:q0 + BLOCK_ROWS]
+                s_blk = np.empty((len(q), 0), dtype=np.float32)
+                i_blk = np.empty((len(q), 0), dtype=np.int64)
+                for c0 in range(0, len(self.vectors), BLOCK_COLS):
+                    s_blk, i_blk = _merge_topk(s_blk, i_blk, *_block_topk(self._scores(q, c0, c0 + BLOCK_COLS), c0, k), k)
+                best_s[q0:q0 + len(q)], best_i[q0:q0 + len(q)] = s_blk, i_blk
+        else:
+            best_s, best_i = self._search_ivf(queries, k, nprobe)
+        return self._finish(best_s, best_i, k)
+
+    def _search_ivf(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        n, nlist = len(queries), len(self.centroids)
+        nprobe = min(nprobe, nlist)
+        probes = np.empty((n, nprobe), dtype=np.int64)
+        for q0 in range(0, n, BLOCK_ROWS):
+            _, probes[q0:q0 + BLOCK_ROWS] = _block_topk(queries[q0:q0 + BLOCK_ROWS] @ self.centroids.T, 0, nprobe)
+        best_s = np.full((n, k), -np.inf, dtype=np.float32)
+        best_i = np.full((n, k), -1, dtype=np.int64)
+        # list by list: one product per probed list for all the queries that probe it
+        flat = probes.ravel()
+        order = np.argsort(flat, kind="stable")
+        bounds = np.searchsorted(flat[order], np.arange(nlist + 1))
+        for lst in np.flatnonzero(np.diff(bounds)):
+            start, stop = self.list_start[lst], self.list_start[lst + 1]
+            if start == stop:
+                continue
+            qs = order[bounds[lst]:bounds[lst + 1]] // nprobe
+            s, i = _block_topk(self._scores(queries[qs], start, stop), start, k)
+            best_s[qs], best_i[qs] = _merge_topk(best_s[qs], best_i[qs], s, i, k)
+        found = best_i >= 0
+        best_i[found] = self.ids[best_i[found]]
+        return best_s, best_i
+
+    @staticmethod
+    def _finish(best_s: np.ndarray, best_i: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sort each row best first (ties: lower id first) and pad to k columns."""
+        if best_s.shape[1] < k:
+            pad = k - best_s.shape[1]
+            best_s = np.hstack([best_s, np.full((len(best_s), pad), -np.inf, dtype=np.float32)])
+            best_i = np.hstack([best_i, np.full((len(best_i), pad), -1, dtype=np.int64)])
+        order = np.lexsort((best_i, -best_s), axis=1)
+        return np.take_along_axis(best_i, order, axis=1), np.take_along_axis(best_s, order, axis=1)
+
+    # ---------------- persistence ----------------
+    def save(self, store_dir: Path) -> None:
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        meta_path = store_dir / META_FILE
+        if meta_path.exists():
+            meta_path.unlink()
+        arrays: Dict[str, Optional[np.ndarray]] = {"vectors": self.vectors, "scales": self.scales, "centroids": self.centroids,
+                                                   "list_start": self.list_start, "ids": self.ids}
+        for name, arr in arrays.items():
+            if arr is not None:
+                np.save(store_dir / f"{name}.npy", arr)
+            elif (store_dir / f"{name}.npy").exists():
+                (store_dir / f"{name}.npy").unlink()
+        meta = {"version": FORMAT_VERSION, "count": len(self.vectors), "dim": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+                "dtype": self.dtype, "nlist": 0 if self.centroids is None else len(self.centroids), "key": self.key}
+        tmp = store_dir / (META_FILE + ".tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+
+    @classmethod
+    def load(cls, store_dir: Path, key: str = "") -> Optional["VectorIndex"]:
+        """The index in store_dir (memory-mapped), or None if there is none or it was built for another key / format."""
+        store_dir = Path(store_dir)
+        try:
+            meta = json.loads((store_dir / META_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != FORMAT_VERSION or meta.get("key") != key:
+            return None
+        arrays = {}
+        for name in ("vectors", "scales", "centroids", "list_start", "ids"):
+            path = store_dir / f"{name}.npy"
+            arrays[name] = np.load(path, mmap_mode="r") if path.exists() else None
+        if arrays["vectors"] is None or len(arrays["vectors"]) != meta["count"]:
+            return None
+        if arrays["centroids"] is not None:
+            arrays["centroids"] = np.asarray(arrays["centroids"])
+        return cls(key=key, **arrays)